@@ -109,4 +109,41 @@ CREATE TABLE IF NOT EXISTS company_reports (
     benefits_grade report_grade NOT NULL,
     comment TEXT NOT NULL,
     PRIMARY KEY (student_id, offer_id)
-);
\ No newline at end of file
+);
+
+-- Add table for background jobs (see source/jobs.py)
+
+CREATE DOMAIN job_status TEXT
+CHECK (VALUE IN ('PENDING', 'RUNNING', 'FAILED'));
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id BIGSERIAL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    args JSONB NOT NULL DEFAULT '[]',
+    status job_status NOT NULL DEFAULT 'PENDING',
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 5,
+    run_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    locked_until TIMESTAMPTZ,
+    last_error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS jobs_run_at_idx
+ON jobs (run_at)
+WHERE status IN ('PENDING', 'RUNNING');
+
+
+-- Add table for applicant events, sent to companies as digests
+
+CREATE TABLE IF NOT EXISTS applicant_events (
+    id BIGSERIAL PRIMARY KEY,
+    company_id INT NOT NULL,
+    offer_id INT NOT NULL REFERENCES offers(id) ON DELETE CASCADE,
+    is_new_applicant BOOLEAN NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    sent_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS applicant_events_company_id_idx
+ON applicant_events (company_id, created_at);
@@ -0,0 +1,68 @@
+-- Secondary indexes, derived from the query shapes in source/queries.py.
+-- Built with CONCURRENTLY, so that writes are not blocked while building.
+-- CONCURRENTLY cannot run inside a transaction block - run this file
+-- with autocommit (e.g. psql -f SQL/indexes.sql), one version at a time.
+
+
+-- Version 1: foreign key and filter access paths
+
+-- select_offers_query: salary and num_weeks range filters
+CREATE INDEX CONCURRENTLY IF NOT EXISTS offers_salary_num_weeks_idx
+ON offers (salary, num_weeks);
+
+-- select_offers_query: region filter
+CREATE INDEX CONCURRENTLY IF NOT EXISTS offers_region_id_idx
+ON offers (region_id);
+
+-- select_company_offers_query, select_company_reports_query
+CREATE INDEX CONCURRENTLY IF NOT EXISTS offers_company_id_idx
+ON offers (company_id);
+
+-- select_applicants_query, reject_students_query, update_applications_waiting_query
+-- (lookups by student_id are served by the primary key)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS applications_offer_id_idx
+ON applications (offer_id, student_id);
+
+-- select_student_profile_query, guarded experience writes
+CREATE INDEX CONCURRENTLY IF NOT EXISTS experiences_student_id_idx
+ON experiences (student_id);
+
+-- Reports are looked up by student_id through the primary key,
+-- these cover the joins and deletes that start from the offer
+CREATE INDEX CONCURRENTLY IF NOT EXISTS student_reports_offer_id_idx
+ON student_reports (offer_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS company_reports_offer_id_idx
+ON company_reports (offer_id);
+
+
+-- Version 2: offer search
+
+-- select_offers_query: case-insensitive 'field' substring filter (ILIKE '%...%')
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS offers_field_trgm_idx
+ON offers USING gin (field gin_trgm_ops);
+
+-- select_offers_query: full-text 'search' parameter.
+-- The expression must match OFFER_SEARCH_DOCUMENT in source/queries.py
+CREATE INDEX CONCURRENTLY IF NOT EXISTS offers_search_idx
+ON offers USING gin (to_tsvector('simple', field || ' ' || requirements || ' ' || responsibilities));
+
+
+-- Version 3: keyset pagination
+
+-- select_company_offers_query: ORDER BY id DESC within a company.
+-- Supersedes offers_company_id_idx
+CREATE INDEX CONCURRENTLY IF NOT EXISTS offers_company_id_id_idx
+ON offers (company_id, id);
+
+DROP INDEX CONCURRENTLY IF EXISTS offers_company_id_idx;
+
+
+-- Version 4: subject filter
+
+-- select_applicants_query: 'subjects' filter. The primary key serves the
+-- per-applicant probe, this index serves plans that start from a subject
+CREATE INDEX CONCURRENTLY IF NOT EXISTS subjects_name_grade_student_id_idx
+ON subjects (name, grade, student_id);
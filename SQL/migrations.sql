@@ -119,4 +119,24 @@ ADD COLUMN profile_picture_path VARCHAR(255) DEFAULT NULL;
 -- Add description to companies
 
 ALTER TABLE companies
-ADD COLUMN description TEXT DEFAULT NULL;
\ No newline at end of file
+ADD COLUMN description TEXT DEFAULT NULL;
+
+-- Add deduplication keys to jobs. At most one pending job per key
+
+ALTER TABLE jobs
+ADD COLUMN dedupe_key VARCHAR(255) DEFAULT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_dedupe_key_idx
+ON jobs (dedupe_key)
+WHERE status = 'PENDING';
+
+
+-- Add resized variants of profile pictures, generated in the background
+
+ALTER TABLE students
+ADD COLUMN profile_picture_thumbnail_path VARCHAR(255) DEFAULT NULL,
+ADD COLUMN profile_picture_medium_path VARCHAR(255) DEFAULT NULL;
+
+ALTER TABLE companies
+ADD COLUMN profile_picture_thumbnail_path VARCHAR(255) DEFAULT NULL,
+ADD COLUMN profile_picture_medium_path VARCHAR(255) DEFAULT NULL;
@@ -0,0 +1,46 @@
+-- Cache invalidation notifications. Every write to a table with
+-- cached data sends a notification on the 'cache_invalidation'
+-- channel, which every application worker listens to (see
+-- source/invalidation.py). Notifications are delivered on commit.
+
+
+CREATE OR REPLACE FUNCTION notify_cache_invalidation() RETURNS TRIGGER AS $$
+DECLARE
+    -- The column that the cached entries are keyed on, if any
+    key_column TEXT := TG_ARGV[0];
+    row_key TEXT;
+BEGIN
+    IF key_column IS NOT NULL THEN
+        -- The old key for updates and deletes, the new key for inserts
+        IF TG_OP = 'INSERT' THEN
+            row_key := to_jsonb(NEW) ->> key_column;
+        ELSE
+            row_key := to_jsonb(OLD) ->> key_column;
+        END IF;
+    END IF;
+
+    PERFORM pg_notify(
+        'cache_invalidation',
+        json_build_object('topic', TG_TABLE_NAME, 'key', row_key)::TEXT
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE TRIGGER offers_cache_invalidation
+AFTER INSERT OR UPDATE OR DELETE ON offers
+FOR EACH ROW EXECUTE FUNCTION notify_cache_invalidation('id');
+
+CREATE OR REPLACE TRIGGER students_cache_invalidation
+AFTER UPDATE OR DELETE ON students
+FOR EACH ROW EXECUTE FUNCTION notify_cache_invalidation('email');
+
+CREATE OR REPLACE TRIGGER companies_cache_invalidation
+AFTER UPDATE OR DELETE ON companies
+FOR EACH ROW EXECUTE FUNCTION notify_cache_invalidation('email');
+
+-- Applications are not keyed on a single column - one notification per statement
+CREATE OR REPLACE TRIGGER applications_cache_invalidation
+AFTER INSERT OR UPDATE OR DELETE ON applications
+FOR EACH STATEMENT EXECUTE FUNCTION notify_cache_invalidation();
@@ -0,0 +1,169 @@
+"""
+Compares the plans of the subject filter in 'select_applicants_query'
+with the previous version, which aggregated the subjects of all students.
+
+Seeds a large dataset inside a transaction that is rolled back at the end.
+Run against an empty database (e.g. the testing one) with the indexes from
+SQL/indexes.sql created:
+
+    DB_NAME=diplomska-db-testing py -m benchmarks.applicants_subjects
+"""
+import argparse
+import statistics
+import psycopg as pg
+from typing import LiteralString, Optional
+from source.database import get_connection_string
+from source.enums import Region, Status
+from source.queries import select_applicants_query
+
+
+NUM_COMPANIES = 100
+NUM_OFFERS = 5_000
+SUBJECT_NAMES = 40
+SUBJECTS_PER_STUDENT = 8
+APPLICATIONS_PER_STUDENT = 3
+OFFER_ID = 1
+REQUIRED_SUBJECTS = [("Subject 1", 7), ("Subject 2", 6)]
+
+
+def old_select_applicants_query(
+    offer_id: int,
+    university: Optional[str],
+    min_gpa: float,
+    max_gpa: float,
+    min_credits: int,
+    max_credits: int,
+    subjects: list[tuple[str, int]],
+) -> tuple[LiteralString, list]:
+    """ The applicants query before the rewrite, without pagination """
+    query = (
+        "SELECT "
+            "s.id, s.email, s.name, s.date_of_birth, "
+            "s.university, s.major, s.credits, s.gpa, "
+            "s.region_id, a.status "
+        "FROM students s "
+        "JOIN applications a ON s.id = a.student_id "
+        "WHERE a.offer_id = %s "
+        "AND s.gpa >= %s AND s.gpa <= %s "
+        "AND s.credits >= %s AND s.credits <= %s "
+    )
+    params: list = [offer_id, min_gpa, max_gpa, min_credits, max_credits]
+
+    if university is not None:
+        query += " AND s.university LIKE %s"
+        params.append(f"%{university}%")
+
+    if not subjects:
+        return query, params
+
+    subjects_query = "SELECT DISTINCT(student_id) FROM subjects GROUP BY student_id HAVING "
+    for index, subject in enumerate(subjects):
+        subjects_query += "COUNT(DISTINCT CASE WHEN name = %s AND grade >= %s THEN 1 END) > 0"
+        if index != len(subjects) - 1:
+            subjects_query += " AND "
+        params.extend(subject)
+
+    query += f" AND s.id IN ({subjects_query})"
+    return query, params
+
+
+def seed(conn: pg.Connection, num_students: int) -> None:
+    conn.execute(
+        "INSERT INTO regions (id, name) VALUES (%s, 'Global'), (%s, 'Europe') "
+        "ON CONFLICT DO NOTHING",
+        [Region.GLOBAL.value, Region.EUROPE.value],
+    )
+    conn.execute(
+        "INSERT INTO companies "
+        "(id, email, hashed_password, name, field, num_employees, year_founded, website) "
+        "SELECT i, 'company_' || i || '@test.com', 'hash', 'Company ' || i, 'Field', 10, 2000, 'www.test.com' "
+        "FROM generate_series(1, %s) AS i",
+        [NUM_COMPANIES],
+    )
+    conn.execute(
+        "INSERT INTO offers "
+        "(id, salary, num_weeks, field, deadline, requirements, responsibilities, company_id, region_id) "
+        "SELECT i, 1000, 10, 'Field ' || i, '2024-10-01', 'Requirements', 'Responsibilities', "
+        "1 + (i %% %s), %s "
+        "FROM generate_series(1, %s) AS i",
+        [NUM_COMPANIES, Region.EUROPE.value, NUM_OFFERS],
+    )
+    conn.execute(
+        "INSERT INTO students "
+        "(id, email, hashed_password, name, university, major, credits, gpa, date_of_birth, region_id) "
+        "SELECT i, 'student_' || i || '@test.com', 'hash', 'Student ' || i, 'University', 'Major', "
+        "i %% 300, (i %% 100) / 10.0, '2000-01-01', %s "
+        "FROM generate_series(1, %s) AS i",
+        [Region.EUROPE.value, num_students],
+    )
+    conn.execute(
+        "INSERT INTO applications (student_id, offer_id, status) "
+        "SELECT s, 1 + ((s * 7 + k * 1999) %% %s), %s "
+        "FROM generate_series(1, %s) AS s, generate_series(1, %s) AS k",
+        [NUM_OFFERS, Status.WAITING.value, num_students, APPLICATIONS_PER_STUDENT],
+    )
+    conn.execute(
+        "INSERT INTO subjects (student_id, name, grade) "
+        "SELECT s, 'Subject ' || (1 + (s + k * 5) %% %s), 5 + ((s * k) %% 6) "
+        "FROM generate_series(1, %s) AS s, generate_series(1, %s) AS k",
+        [SUBJECT_NAMES, num_students, SUBJECTS_PER_STUDENT],
+    )
+    for table in ("companies", "offers", "students", "applications", "subjects"):
+        conn.execute(f"ANALYZE {table}")
+
+
+def explain(conn: pg.Connection, query: str, params: list, runs: int) -> dict:
+    times = []
+    for _ in range(runs):
+        record = conn.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", params).fetchone()
+        result = record[0][0]
+        times.append(result["Execution Time"])
+
+    plan = result["Plan"]
+    return {
+        "median_ms": statistics.median(times),
+        "shared_buffers": plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0),
+        "plan": plan,
+    }
+
+
+def plan_nodes(plan: dict, depth: int = 0) -> list[str]:
+    relation = plan.get("Index Name") or plan.get("Relation Name") or ""
+    lines = [f"{'  ' * depth}{plan['Node Type']} {relation}".rstrip()]
+    for child in plan.get("Plans", []):
+        lines.extend(plan_nodes(child, depth + 1))
+    return lines
+
+
+def run(num_students: int, runs: int) -> None:
+    filters = dict(
+        offer_id=OFFER_ID, university=None, min_gpa=0, max_gpa=10,
+        min_credits=0, max_credits=300, subjects=REQUIRED_SUBJECTS,
+    )
+    old_query, old_params = old_select_applicants_query(**filters)
+    new_query, new_params = select_applicants_query(**filters, after_student_id=None, limit=num_students)
+
+    with pg.connect(get_connection_string()) as conn:
+        try:
+            seed(conn, num_students)
+
+            old_ids = sorted(row[0] for row in conn.execute(old_query, old_params))
+            new_ids = sorted(row[0] for row in conn.execute(new_query, new_params))
+            assert old_ids == new_ids, "The old and new queries return different applicants"
+
+            print(f"{num_students} students, {len(new_ids)} matching applicants of offer {OFFER_ID}")
+            for name, query, params in (("old", old_query, old_params), ("new", new_query, new_params)):
+                result = explain(conn, query, params, runs)
+                print(f"\n{name}: {result['median_ms']:.2f} ms (median of {runs}), {result['shared_buffers']} buffers")
+                print("\n".join(plan_nodes(result["plan"])))
+        finally:
+            conn.rollback()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the applicants subject filter.")
+    parser.add_argument("--students", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    run(args.students, args.runs)
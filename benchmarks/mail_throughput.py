@@ -0,0 +1,73 @@
+"""
+Measures email throughput (messages per second) against a local stand-in
+SMTP server: one connection and login per message, as notifications used
+to send, versus the pooled MailTransport. The server's connect delay
+stands in for the TLS handshake and login of a real SMTP server.
+
+    py -m benchmarks.mail_throughput --messages 200 --connect-delay 0.05
+"""
+import argparse
+import asyncio as aio
+import smtplib
+import time
+from source.mail import MailTransport
+from tests.smtp_server import StandInSMTPServer
+
+
+SENDER = "sender@test.com"
+
+
+def send_with_new_connection(server: StandInSMTPServer, index: int) -> None:
+    with smtplib.SMTP(server.host, server.port) as smtp:
+        smtp.login(SENDER, "password")
+        smtp.sendmail(SENDER, f"student{index}@test.com", f"Subject: Benchmark\n\nMessage {index}")
+
+
+def benchmark_new_connections(server: StandInSMTPServer, num_messages: int) -> float:
+    start = time.perf_counter()
+    for index in range(num_messages):
+        send_with_new_connection(server, index)
+    return num_messages / (time.perf_counter() - start)
+
+
+async def benchmark_transport(server: StandInSMTPServer, num_messages: int, max_connections: int) -> float:
+    transport = MailTransport(
+        host=server.host,
+        port=server.port,
+        use_ssl=False,
+        username=SENDER,
+        password="password",
+        max_connections=max_connections,
+        max_rate=None,
+    )
+    start = time.perf_counter()
+    await aio.gather(*[
+        transport.send(f"student{index}@test.com", "Benchmark", f"Message {index}")
+        for index in range(num_messages)
+    ])
+    elapsed = time.perf_counter() - start
+    await transport.close()
+    return num_messages / elapsed
+
+
+def run(num_messages: int, connect_delay: float, max_connections: int) -> None:
+    server = StandInSMTPServer(connect_delay=connect_delay)
+    server.start()
+    try:
+        rate = benchmark_new_connections(server, num_messages)
+        print(f"new connection per message: {rate:.1f} messages/s")
+
+        rate = aio.run(benchmark_transport(server, num_messages, max_connections))
+        print(f"pooled transport ({max_connections} connections): {rate:.1f} messages/s")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark email throughput.")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--connect-delay", type=float, default=0.05)
+    parser.add_argument("--connections", type=int, default=2)
+    args = parser.parse_args()
+
+    run(args.messages, args.connect_delay, args.connections)
@@ -0,0 +1,54 @@
+"""
+Compares reading the text of every page of an offer PDF (joined with
++=, as the offer files used to be read) with the incremental reader,
+which stops after the page with the end of the offer.
+
+    py -m benchmarks.offer_pdf_extraction --pages 200 --repeat 5
+"""
+import argparse
+import time
+from io import BytesIO
+from pypdf import PdfReader
+from source.files import extract_text_offer_info, iter_page_texts, read_offer_text
+from tests.offer_pdfs import build_offer_pdf
+
+
+def extract_all_pages(offer_file_bytes: bytes) -> dict:
+    file_reader = PdfReader(BytesIO(offer_file_bytes))
+    text = ""
+    for page in file_reader.pages:
+        text += page.extract_text()
+    return extract_text_offer_info(text)
+
+
+def extract_incrementally(offer_file_bytes: bytes) -> dict:
+    file_reader = PdfReader(BytesIO(offer_file_bytes))
+    text = read_offer_text(iter_page_texts(file_reader))
+    return extract_text_offer_info(text)
+
+
+def benchmark(function, offer_file_bytes: bytes, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(offer_file_bytes)
+    return (time.perf_counter() - start) / repeat
+
+
+def run(num_pages: int, repeat: int) -> None:
+    offer_file_bytes = build_offer_pdf(num_appendix_pages=num_pages - 1)
+    assert extract_all_pages(offer_file_bytes)["field"] == extract_incrementally(offer_file_bytes)["field"]
+
+    print(f"{num_pages} pages, {len(offer_file_bytes)} bytes")
+    all_pages = benchmark(extract_all_pages, offer_file_bytes, repeat)
+    print(f"all pages:   {all_pages * 1000:.1f} ms per file")
+    incremental = benchmark(extract_incrementally, offer_file_bytes, repeat)
+    print(f"incremental: {incremental * 1000:.1f} ms per file")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark offer PDF text extraction.")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    run(args.pages, args.repeat)
@@ -0,0 +1,61 @@
+"""
+Micro-benchmark of extract_text_offer_info: a search of the whole text
+per field (as the offer texts used to be parsed), versus the single
+scan over the labels.
+
+    py -m benchmarks.offer_text_parser --number 2000
+"""
+import argparse
+import re
+import timeit
+from source.files import convert_to_region_id, extract_text_offer_info
+
+
+def extract_with_searches(text: str) -> dict:
+    salary_match = re.search(r"Salary:\s*(\d+)", text)
+    weeks_match = re.search(r"Weeks:\s*(\d+)", text)
+    field_match = re.search(r"Field:\s*([A-Za-z\s]+)\n", text)
+    deadline_match = re.search(r"Deadline:\s*(\d{4}-\d{2}-\d{2})", text)
+    region_match = re.search(r"Region:\s*([A-Za-z]+)", text)
+    requirements_match = re.search(r"Requirements:\s+([\s\S]+?)\nResponsibilities", text)
+    responsibilities_match = re.search(r"Responsibilities:\s+([\s\S]+)$", text)
+    return {
+        "salary": int(salary_match.group(1)),
+        "num_weeks": int(weeks_match.group(1)),
+        "field": field_match.group(1),
+        "deadline": deadline_match.group(1),
+        "requirements": requirements_match.group(1),
+        "responsibilities": responsibilities_match.group(1),
+        "region_id": convert_to_region_id(region_match.group(1)),
+    }
+
+
+def offer_text(section_length: int) -> str:
+    with open("files/Offer - Test.txt", "r", encoding="utf-8") as reader:
+        text = reader.read()
+    filler = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. "
+    section = (filler * (section_length // len(filler) + 1))[:section_length]
+    return text.replace("Requirements:\n", f"Requirements:\n{section}\n").replace(
+        "Responsibilities:\n", f"Responsibilities:\n{section}\n"
+    )
+
+
+def run(number: int) -> None:
+    for section_length in [0, 2_000, 20_000]:
+        text = offer_text(section_length)
+        assert extract_with_searches(text) == extract_text_offer_info(text)
+
+        searches = timeit.timeit(lambda: extract_with_searches(text), number=number) / number
+        single_scan = timeit.timeit(lambda: extract_text_offer_info(text), number=number) / number
+        print(
+            f"{len(text):>6} characters: "
+            f"searches {searches * 1e6:.1f} us, single scan {single_scan * 1e6:.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the offer text parser.")
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    run(args.number)
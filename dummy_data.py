@@ -3,7 +3,7 @@ import psycopg as pg
 from dataclasses import asdict, fields
 from source.database import get_connection_string
 from source.enums import Region, Status, Tables
-from source.security import pwd_context
+from source.utils import pwd_context
 from tests.classes import (
     CompanyTest,
     OfferTest,
@@ -2,6 +2,7 @@
 
 export DB_NAME="diplomska-db-testing"
 export TESTING="TRUE"
+export METRICS="TRUE"
 
 echo "Starting FastAPI server..."
 py -m source.main & SERVER_PID=$!
@@ -12,6 +13,17 @@ pytest tests/test_companies.py
 pytest tests/test_experiences.py
 pytest tests/test_offers.py
 pytest tests/test_applications.py
+pytest tests/test_jobs.py
+pytest tests/test_mail.py
+pytest tests/test_digests.py
+pytest tests/test_files.py
+pytest tests/test_thumbnails.py
+pytest tests/test_executors.py
+pytest tests/test_indexes.py
+pytest tests/test_security.py
+pytest tests/test_invalidation.py
+pytest tests/test_profile_pictures.py
+pytest tests/test_statements.py
 echo "All tests have completed"
 
 echo "Stopping FastAPI server..."
@@ -0,0 +1,196 @@
+from collections import OrderedDict
+from typing import Any, Hashable
+import json
+import logging
+import os
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+""" All caches created in the application, by name. Used for reporting metrics. """
+_caches: dict[str, "LRUCache | DiskCache"] = {}
+
+
+class LRUCache:
+    """
+    In-process cache with a size limit (least recently
+    used entries are evicted first) and an optional
+    time-to-live for every entry. Keeps hit/miss counters.
+    """
+
+    persistent = False
+
+    def __init__(self, name: str, max_size: int, ttl: float | None = None) -> None:
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        _caches[name] = self
+
+    def get(self, key: Hashable) -> Any | None:
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class DiskCache:
+    """
+    Cache of JSON-serializable values, stored as files in a directory
+    so that they outlive the process. The total size of the files is
+    limited - the least recently used files are evicted first.
+    Keys must be safe file names (e.g. hex digests).
+    The methods block on file IO - call them from a thread.
+    """
+
+    # Keyed by content, so entries never go stale - 'clear_caches' skips it
+    persistent = True
+
+    def __init__(self, name: str, directory: str, max_bytes: int) -> None:
+        self.name = name
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _caches[name] = self
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Any | None:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as reader:
+                value = json.load(reader)
+            # The modification time orders the files for eviction
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        path = self._path(key)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temporary_path, "w", encoding="utf-8") as writer:
+                json.dump(value, writer)
+            # Readers never see a partially written file
+            os.replace(temporary_path, path)
+            self._evict()
+        except OSError as e:
+            # The cache is an optimization, a failed write is not an error
+            logger.warning("Could not write to the %s cache: %s", self.name, e)
+
+    def _evict(self) -> None:
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_bytes = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+            self.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> None:
+        if not os.path.isdir(self.directory):
+            return
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json"):
+                    os.remove(entry.path)
+
+    def stats(self) -> dict:
+        return {
+            "directory": self.directory,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class VersionCounter:
+    """
+    Version number of a group of cached results. Must be
+    bumped on every write to the underlying rows - entries
+    keyed on an older version are never read again and
+    are eventually evicted as least recently used.
+    """
+
+    def __init__(self) -> None:
+        self.value = 0
+
+    def bump(self) -> None:
+        self.value += 1
+
+
+def caches_stats() -> dict[str, dict]:
+    return {name: cache.stats() for name, cache in _caches.items()}
+
+
+def clear_caches() -> None:
+    """ Clears the in-memory caches. Persistent caches are kept. """
+    for cache in _caches.values():
+        if not cache.persistent:
+            cache.clear()
@@ -11,7 +11,6 @@ from .schemas import (
     StudentUpdate, 
     StudentInDB, 
     StudentProfileRead, 
-    StudentRead,
     CompanyCreate,
     CompanyRead,
     CompanyUpdate,
@@ -20,6 +19,8 @@ from .schemas import (
     OfferCreate,
     OfferBriefRead,
     OfferApplication,
+    OfferImportResult,
+    Page,
     Subject,
     MotivationalLetter,
     StudentReport,
@@ -30,7 +31,8 @@ from .profile_pictures import (
     save_profile_picture,
     save_profile_picture_path,
 )
-from .files import extract_file_offer
+from .files import extract_bulk_offers, extract_file_offer, OfferFileError
+from .pagination import decode_cursor, page_limit, paginate
 from .utils import (
     extract_subjects_from,
     extract_user_type,
@@ -63,17 +65,12 @@ from .queries import (
     select_company_query,
     select_company_report_query,
     select_company_reports_query,
-    select_experience_student_id_query,
     select_motivational_letter_student_id_query,
     select_offer_company_id_query,
     select_offer_query,
     select_offers_query,
-    select_student_experiences_query,
+    select_student_profile_query,
     select_student_report_query,
-    select_student_reports_query,
-    select_student_with_motivational_letter_query,
-    select_student_subjects_query,
-    select_subject_student_id_query,
     update_application_status_query,
     update_applications_waiting_query,
     update_company_query,
@@ -86,13 +83,63 @@ from .queries import (
     update_student_report_query,
     update_subject_query
 )
-from .enums import Status, UserType
-from .security import Token, get_token, pwd_context, authorize_user
+from .enums import Status, Tables, UserType
+from .security import (
+    Token,
+    get_token,
+    authorize_user,
+    authorize_owned_write,
+    owner_id_of,
+    invalidate_cached_user,
+)
+from .passwords import hash_password
+from .jobs import enqueue
+from .notifications import (
+    record_applicant_event,
+    notify_student_application_status_change,
+    notify_students_application_status_change,
+    send_email_profile_created,
+)
+from .cache import LRUCache, VersionCounter
+from .invalidation import register_invalidator
 from .database import async_pool
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi import HTTPException, status, UploadFile
 from psycopg.rows import dict_row, class_row
 from psycopg import IntegrityError, AsyncCursor, AsyncConnection
+from pydantic import ValidationError
+
+
+""" Offers are viewed far more often than they change. Cached by offer id. """
+OFFER_CACHE_SIZE = 1024
+offer_cache = LRUCache("offers", OFFER_CACHE_SIZE)
+
+"""
+Offer listings are cached by their normalized filters. Entries are
+keyed on the offers version, which every offer write bumps. The TTL
+bounds how long results can stay stale for any write that is missed.
+"""
+OFFER_SEARCH_CACHE_SIZE = 512
+OFFER_SEARCH_CACHE_TTL_SECONDS = 30
+offer_search_cache = LRUCache("offer_searches", OFFER_SEARCH_CACHE_SIZE, OFFER_SEARCH_CACHE_TTL_SECONDS)
+offers_version = VersionCounter()
+
+
+def invalidate_offer(offer_id: Optional[int]) -> None:
+    """
+    Must be called after every offer write. A None
+    offer id invalidates all the cached offers.
+    """
+    if offer_id is None:
+        offer_cache.clear()
+    else:
+        offer_cache.invalidate(offer_id)
+    offers_version.bump()
+
+
+""" Offers and companies written by other workers, notified by offer id and company email """
+register_invalidator(Tables.OFFERS, lambda offer_id: invalidate_offer(int(offer_id) if offer_id else None))
+register_invalidator(Tables.COMPANIES, lambda email: offers_version.bump())
 
 
 # Token controllers
@@ -109,7 +156,7 @@ async def token_controller(user_type_param: str, form_data: OAuth2PasswordReques
 
 
 async def student_post_controller(s: StudentCreate) -> None:
-    hashed_password = pwd_context.hash(s.password)
+    hashed_password = await hash_password(s.password)
     
     async with async_pool().connection() as conn:
         sql = insert_student_query()
@@ -124,6 +171,7 @@ async def student_post_controller(s: StudentCreate) -> None:
             s.gpa,
             s.region_id,
         ])
+        await enqueue(conn, send_email_profile_created, s.email, s.name)
 
 
 async def student_put_controller(student_id: int, s: StudentUpdate, current_user) -> None:
@@ -142,6 +190,8 @@ async def student_put_controller(student_id: int, s: StudentUpdate, current_user
                 s.region_id,
                 student_id,
             ])
+
+    invalidate_cached_user(current_user.email, UserType.STUDENT)
         
 
 async def student_delete_controller(student_id: int, current_user) -> None:
@@ -151,51 +201,29 @@ async def student_delete_controller(student_id: int, current_user) -> None:
         sql = delete_student_query()
         await conn.execute(sql, [student_id])
 
+    invalidate_cached_user(current_user.email, UserType.STUDENT)
+
 
 async def student_profile_get_controller(student_id: int) -> StudentProfileRead:
-    async with async_pool().connection() as conn:
-        cur: AsyncCursor = conn.cursor(row_factory=dict_row)
-        
-        sql = select_student_with_motivational_letter_query()
+    async with async_pool().connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+        # Fetch the student with the letter, experiences, subjects and reports
+        sql = select_student_profile_query()
         await cur.execute(sql, [student_id])
-        student = await cur.fetchone()
-        
-        if student is None:
-            raise HTTPException(status.HTTP_404_NOT_FOUND)
+        record = await cur.fetchone()
         
-        letter = MotivationalLetterRead(**student)
-        student = StudentRead(**student, motivational_letter=letter)
-
-        # Fetch student experiences
-        sql = select_student_experiences_query()
-        await cur.execute(sql, [student_id])
-        experiences: list = await cur.fetchall()
-
-        # Fetch student subjects
-        sql = select_student_subjects_query()
-        await cur.execute(sql, [student_id])
-        subjects: list = await cur.fetchall()
-
-        # Fetch student reports
-        sql = select_student_reports_query()
-        await cur.execute(sql, [student_id])
-        reports: list = await cur.fetchall()
-
-        student_profile = StudentProfileRead(
-            subjects=subjects,
-            experiences=experiences, 
-            reports=reports,
-            **student.model_dump(),
-        )
-
-        return student_profile
+    if record is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+    
+    letter = MotivationalLetterRead(**record)
+    student_profile = StudentProfileRead(**record, motivational_letter=letter)
+    return student_profile
     
 
 # Company controllers
 
 
 async def company_post_controller(c: CompanyCreate) -> None:
-    hashed_password = pwd_context.hash(c.password)
+    hashed_password = await hash_password(c.password)
     async with async_pool().connection() as conn:
         sql = insert_company_query()
         await conn.execute(sql, params=[
@@ -207,6 +235,7 @@ async def company_post_controller(c: CompanyCreate) -> None:
                 c.year_founded,
                 c.website,
             ])
+        await enqueue(conn, send_email_profile_created, c.email, c.name)
         
 
 async def company_get_controller(company_id: int) -> CompanyRead:
@@ -246,14 +275,22 @@ async def company_profile_get_controller(company_id: int) -> CompanyProfile:
         return company_profile
     
 
-async def company_offers_get_controller(company_id: int) -> list[OfferRead]:
+async def company_offers_get_controller(
+    company_id: int,
+    after: Optional[str],
+    limit: int,
+) -> Page[OfferRead]:
+    cursor_values = decode_cursor(after, 1)
+    after_id = cursor_values[0] if cursor_values else None
+    limit = page_limit(limit)
+
     async with async_pool().connection() as conn, conn.cursor(
         row_factory=class_row(OfferRead)
     ) as cur:
-        sql = select_company_offers_query()
-        await cur.execute(sql, [company_id])
+        sql, parameters = select_company_offers_query(company_id, after_id, limit + 1)
+        await cur.execute(sql, parameters)
         records = await cur.fetchall()
-        return records
+        return paginate(records, limit, lambda offer: (offer.id,))
     
 
 async def company_put_controller(company_id: int, c: CompanyUpdate, current_user) -> None:
@@ -271,6 +308,10 @@ async def company_put_controller(company_id: int, c: CompanyUpdate, current_user
             c.description,
             company_id,
         ])
+
+    invalidate_cached_user(current_user.email, UserType.COMPANY)
+    # Offer listings show the company name
+    offers_version.bump()
         
 
 async def company_delete_controller(company_id: int, current_user) -> None:
@@ -280,6 +321,10 @@ async def company_delete_controller(company_id: int, current_user) -> None:
         sql = delete_company_query()
         await conn.execute(sql, [company_id])
 
+    invalidate_cached_user(current_user.email, UserType.COMPANY)
+    # The company id of its offers is reset by the foreign key
+    invalidate_offer(None)
+
 
 # Offer controllers
 
@@ -289,7 +334,7 @@ async def offer_post_controller(offer: OfferCreate, current_user) -> None:
 
     async with async_pool().connection() as conn:
         sql = insert_offer_query()
-        await conn.execute(sql, params=[
+        cur = await conn.execute(sql, params=[
             offer.salary,
             offer.num_weeks,
             offer.field,
@@ -299,17 +344,26 @@ async def offer_post_controller(offer: OfferCreate, current_user) -> None:
             offer.company_id,
             offer.region_id,
         ])
+        offer_id, = await cur.fetchone()
+
+    # Ids are not guaranteed to be new, e.g. after rows were inserted with explicit ids
+    invalidate_offer(offer_id)
         
 
-async def offer_file_post_controller(offer_file_bytes: bytes, company_id: int, current_user) -> None:
+async def offer_file_post_controller(offer_file: UploadFile, company_id: int, current_user) -> None:
     authorize_user(company_id, current_user, CompanyInDB)
     
-    file_offer_info = extract_file_offer(offer_file_bytes)
+    try:
+        offer_file_bytes = await offer_file.read()
+        file_offer_info = await extract_file_offer(offer_file_bytes, offer_file.content_type, offer_file.filename)
+    except OfferFileError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+
     offer = OfferCreate(company_id=company_id, **file_offer_info)
 
     async with async_pool().connection() as conn:
         sql = insert_offer_query()
-        await conn.execute(sql, params=[
+        cur = await conn.execute(sql, params=[
             offer.salary,
             offer.num_weeks,
             offer.field,
@@ -319,34 +373,137 @@ async def offer_file_post_controller(offer_file_bytes: bytes, company_id: int, c
             offer.company_id,
             offer.region_id,
         ])
+        offer_id, = await cur.fetchone()
+
+    invalidate_offer(offer_id)
         
 
+async def offers_bulk_post_controller(bulk_file_bytes: bytes, company_id: int, current_user) -> list[OfferImportResult]:
+    authorize_user(company_id, current_user, CompanyInDB)
+
+    try:
+        extracted_offers = await extract_bulk_offers(bulk_file_bytes)
+    except OfferFileError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+
+    results: list[OfferImportResult] = []
+    valid_offers: list[tuple[OfferImportResult, OfferCreate]] = []
+    for name, offer_info in extracted_offers:
+        result = OfferImportResult(file=name)
+        results.append(result)
+        if isinstance(offer_info, OfferFileError):
+            result.error = offer_info.message
+            continue
+        try:
+            valid_offers.append((result, OfferCreate(company_id=company_id, **offer_info)))
+        except ValidationError as e:
+            result.error = "; ".join(
+                f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}"
+                for error in e.errors()
+            )
+
+    if not valid_offers:
+        return results
+
+    # All the valid offers are inserted together, or none of them
+    async with async_pool().connection() as conn, conn.cursor() as cur:
+        sql = insert_offer_query()
+        await cur.executemany(sql, [
+            [
+                offer.salary,
+                offer.num_weeks,
+                offer.field,
+                offer.deadline,
+                offer.requirements,
+                offer.responsibilities,
+                offer.company_id,
+                offer.region_id,
+            ]
+            for _, offer in valid_offers
+        ], returning=True)
+
+        for result, _ in valid_offers:
+            result.offer_id, = await cur.fetchone()
+            cur.nextset()
+
+    for result, _ in valid_offers:
+        invalidate_offer(result.offer_id)
+
+    return results
+
+
 async def offers_get_controller(
     field: str | None,
+    search: str | None,
     min_num_weeks: int,
     max_num_weeks: int,
     min_salary: int,
     max_salary: int,
+    after: Optional[str],
+    limit: int,
     current_user: StudentInDB,
-) -> list[OfferBriefRead]:
+) -> Page[OfferBriefRead]:
     authorize_user(current_user.id, current_user, StudentInDB)
 
+    # 'field' is matched case-insensitively, an empty one matches everything
+    field = field.lower() if field else None
+    search = " ".join(search.split()) if search is not None else None
+
+    # Search results are ordered by (rank, id), other results by id
+    cursor_values = decode_cursor(after, 1 if search is None else 2)
+    limit = page_limit(limit)
+
+    cache_key = (
+        offers_version.value,
+        field,
+        search,
+        min_num_weeks,
+        max_num_weeks,
+        min_salary,
+        max_salary,
+        current_user.region_id,
+        tuple(cursor_values) if cursor_values else None,
+        limit,
+    )
+    cached_page = offer_search_cache.get(cache_key)
+    if cached_page is not None:
+        return cached_page
+
+    if search is None:
+        sort_key = lambda offer: (offer.id,)
+    else:
+        sort_key = lambda offer: (offer.rank, offer.id)
+
     async with async_pool().connection() as conn, conn.cursor(
         row_factory=class_row(OfferBriefRead)
     ) as cur:
-        sql = select_offers_query(field)
-        parameters: list = [min_num_weeks, max_num_weeks, min_salary, max_salary, current_user.region_id]
-
-        if field is not None:
-            # Add percent signs for SQL string comparison
-            parameters.append(f"%{field}%")
-
+        sql, parameters = select_offers_query(
+            field,
+            search,
+            min_num_weeks,
+            max_num_weeks,
+            min_salary,
+            max_salary,
+            current_user.region_id,
+            cursor_values,
+            limit + 1,
+        )
         await cur.execute(sql, parameters)
         records = await cur.fetchall()
-        return records
+
+    page = paginate(records, limit, sort_key)
+    offer_search_cache.set(cache_key, page)
+    return page
     
 
 async def offer_get_controller(offer_id: int) -> OfferRead:
+    cached_offer = offer_cache.get(offer_id)
+    if cached_offer is not None:
+        return cached_offer
+
+    # An offer write during the query bumps the version - the row
+    # read may be older than the write, so it is not cached
+    version = offers_version.value
     async with async_pool().connection() as conn, conn.cursor(
         row_factory=class_row(OfferRead)
     ) as cur:
@@ -355,22 +512,19 @@ async def offer_get_controller(offer_id: int) -> OfferRead:
         record = await cur.fetchone()
         if record is None:
             raise HTTPException(status.HTTP_404_NOT_FOUND)
-        return record
+
+    if offers_version.value == version:
+        offer_cache.set(offer_id, record)
+    return record
     
 
 async def offer_put_controller(offer_id: int, o: OfferUpdate, current_user) -> None:
-    async with async_pool().connection() as conn, conn.cursor(row_factory=dict_row) as cur:
-        sql = select_offer_company_id_query()
-        await cur.execute(sql, [offer_id])
-        record = await cur.fetchone()
-        
-        if record is None:
-            raise HTTPException(status.HTTP_404_NOT_FOUND)
+    owner_id = owner_id_of(current_user, CompanyInDB)
 
-        authorize_user(record["company_id"], current_user, CompanyInDB)
-        
+    async with async_pool().connection() as conn, conn.cursor(row_factory=dict_row) as cur:
         sql = update_offer_query()
-        await conn.execute(sql, [
+        await cur.execute(sql, [
+                offer_id,
                 o.salary,
                 o.num_weeks,
                 o.field,
@@ -379,22 +533,25 @@ async def offer_put_controller(offer_id: int, o: OfferUpdate, current_user) -> N
                 o.responsibilities,
                 o.region_id,
                 offer_id,
+                owner_id,
+                owner_id,
             ])
+        record = await cur.fetchone()
+        authorize_owned_write(record)
+
+    invalidate_offer(offer_id)
         
 
 async def offer_delete_controller(offer_id: int, current_user) ->None:
+    owner_id = owner_id_of(current_user, CompanyInDB)
+
     async with async_pool().connection() as conn, conn.cursor(row_factory=dict_row) as cur:
-        sql = select_offer_company_id_query()
-        await cur.execute(sql, [offer_id])
+        sql = update_offer_company_id_null_query()
+        await cur.execute(sql, [offer_id, offer_id, owner_id, owner_id])
         record = await cur.fetchone()
+        authorize_owned_write(record)
 
-        if record is None:
-            raise HTTPException(status.HTTP_404_NOT_FOUND)
-        
-        authorize_user(record["company_id"], current_user, CompanyInDB)
-        
-        sql = update_offer_company_id_null_query()
-        await conn.execute(sql, [offer_id])
+    invalidate_offer(offer_id)
 
 
 # Experience controllers
@@ -420,40 +577,33 @@ async def experience_patch_controller(
         s: ExperienceUpdate, 
         current_user
 ) -> None:
-    async with async_pool().connection() as conn, conn.cursor(row_factory=dict_row) as cur:
-        sql = select_experience_student_id_query()
-        await cur.execute(sql, [experience_id])
-        record = await cur.fetchone()
-
-        if record is None:
-            raise HTTPException(status.HTTP_404_NOT_FOUND)
-        
-        authorize_user(record["student_id"], current_user, StudentInDB)
+    owner_id = owner_id_of(current_user, StudentInDB)
 
+    async with async_pool().connection() as conn, conn.cursor(row_factory=dict_row) as cur:
         sql = update_experience_query()
-        await conn.execute(sql, [
+        await cur.execute(sql, [
+                experience_id,
                 s.from_date,
                 s.to_date,
                 s.company,
                 s.position,
                 s.description,
                 experience_id,
+                owner_id,
+                owner_id,
             ])
+        record = await cur.fetchone()
+        authorize_owned_write(record)
 
 
 async def experience_delete_controller(experience_id: int, current_user) -> None:
-    async with async_pool().connection() as conn, conn.cursor(row_factory=dict_row) as cur:
-        sql = select_experience_student_id_query()
-        await cur.execute(sql, [experience_id])
-        record = await cur.fetchone()
-        
-        if record is None:
-            raise HTTPException(status.HTTP_404_NOT_FOUND)
-        
-        authorize_user(record["student_id"], current_user, StudentInDB)
+    owner_id = owner_id_of(current_user, StudentInDB)
 
+    async with async_pool().connection() as conn, conn.cursor(row_factory=dict_row) as cur:
         sql = delete_experience_query()
-        await conn.execute(sql, [experience_id])
+        await cur.execute(sql, [experience_id, experience_id, owner_id, owner_id])
+        record = await cur.fetchone()
+        authorize_owned_write(record)
 
 
 # Subject controllers
@@ -472,40 +622,31 @@ async def subject_post_controller(subject: Subject, current_user) -> None:
 
 
 async def subject_patch_controller(student_id: int, name: str, subject: Subject, current_user) -> None:
+    owner_id = owner_id_of(current_user, StudentInDB)
     pool = async_pool()
-    async with pool.connection() as conn:
-        cursor: AsyncCursor = conn.cursor(row_factory=dict_row)
-        sql = select_subject_student_id_query()
-        await cursor.execute(sql, [student_id, name])
-        record = await cursor.fetchone()
-
-        if record is None:
-            raise HTTPException(status.HTTP_404_NOT_FOUND)
-        
-        authorize_user(record["student_id"], current_user, StudentInDB)
-
+    async with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
         sql = update_subject_query()
-        await conn.execute(sql, [
+        await cur.execute(sql, [
+            student_id,
+            name,
             subject.grade, 
             subject.student_id, 
             subject.name,
+            owner_id,
+            owner_id,
         ])
+        record = await cur.fetchone()
+        authorize_owned_write(record)
 
 
 async def subject_delete_controller(student_id: int, name: str, current_user) -> None:
+    owner_id = owner_id_of(current_user, StudentInDB)
     pool = async_pool()
     async with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
-        sql = select_subject_student_id_query()
-        await cur.execute(sql, [student_id, name])
-        record = await cur.fetchone()
-
-        if record is None:
-            raise HTTPException(status.HTTP_404_NOT_FOUND)
-        
-        authorize_user(record["student_id"], current_user, StudentInDB)
-
         sql = delete_subject_query()
-        await conn.execute(sql, [student_id, name])
+        await cur.execute(sql, [student_id, name, student_id, name, owner_id, owner_id])
+        record = await cur.fetchone()
+        authorize_owned_write(record)
 
 
 # Application controllers
@@ -524,18 +665,30 @@ async def application_post_controller(
             await conn.execute(sql, [student_id, offer_id, Status.WAITING.value])
         except IntegrityError as e:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+        is_new_applicant = True
+        await record_applicant_event(conn, offer_id, is_new_applicant)
         
 
-async def applications_get_controller(student_id: int, current_user) -> list[OfferApplication]:
+async def applications_get_controller(
+    student_id: int,
+    after: Optional[str],
+    limit: int,
+    current_user,
+) -> Page[OfferApplication]:
     authorize_user(student_id, current_user, StudentInDB)
 
+    cursor_values = decode_cursor(after, 1)
+    after_offer_id = cursor_values[0] if cursor_values else None
+    limit = page_limit(limit)
+
     async with async_pool().connection() as conn, conn.cursor(
         row_factory=class_row(OfferApplication)
     ) as cur:
-        sql = select_applications_query()
-        await cur.execute(sql, [student_id])
+        sql, parameters = select_applications_query(student_id, after_offer_id, limit + 1)
+        await cur.execute(sql, parameters)
         records = await cur.fetchall()
-        return records
+        return paginate(records, limit, lambda application: (application.offer_id,))
     
 
 async def application_accept_controller(student_id: int, offer_id: int, current_user) -> dict:
@@ -546,13 +699,18 @@ async def application_accept_controller(student_id: int, offer_id: int, current_
         async with conn.transaction():
             sql = accept_student_query()
             await cur.execute(sql, [student_id, offer_id])
-            company_id = await cur.fetchone()
-            accepted_student_id = company_id["student_id"]
+            accepted = await cur.fetchone()
+            accepted_student_id = accepted["student_id"]
 
             sql = reject_students_query()
             await cur.execute(sql, [student_id, offer_id])
             records = await cur.fetchall()
             rejected_student_ids = [item["student_id"] for item in records]
+            rejected_emails = [item["email"] for item in records]
+
+            await enqueue(conn, notify_student_application_status_change, accepted["email"], accepted["field"], Status.ACCEPTED)
+            if rejected_emails:
+                await enqueue(conn, notify_students_application_status_change, rejected_emails, accepted["field"], Status.REJECTED)
         
     return {
         "accepted_student_id": accepted_student_id, 
@@ -600,6 +758,11 @@ async def application_cancel_controller(student_id: int, offer_id: int, current_
                 await cur.execute(sql, [student_id, offer_id])
                 records = await cur.fetchall()
                 updated_student_ids = [item["student_id"] for item in records]
+                updated_emails = [item["email"] for item in records]
+
+                if updated_emails:
+                    offer_field = records[0]["field"]
+                    await enqueue(conn, notify_students_application_status_change, updated_emails, offer_field, Status.WAITING)
                 
         # If the applicant is still waiting, 
         # just delete the application
@@ -607,6 +770,9 @@ async def application_cancel_controller(student_id: int, offer_id: int, current_
         elif application_status == Status.WAITING.value:
             sql = delete_application_query()
             await cur.execute(sql, [student_id, offer_id])
+
+        is_new_applicant = False
+        await record_applicant_event(conn, offer_id, is_new_applicant)
         
     return updated_student_ids
 
@@ -619,8 +785,13 @@ async def applicants_get_controller(
     min_credits: int,
     max_credits: int,
     subjects_string: Optional[str],
+    after: Optional[str],
+    limit: int,
     current_user,
-) -> list[ApplicantRead]:
+) -> Page[ApplicantRead]:
+    cursor_values = decode_cursor(after, 1)
+    after_student_id = cursor_values[0] if cursor_values else None
+    limit = page_limit(limit)
     
     async with async_pool().connection() as conn:
         applicant_cur = conn.cursor(row_factory=class_row(ApplicantRead))
@@ -651,11 +822,13 @@ async def applicants_get_controller(
             min_credits,
             max_credits,
             subjects_list,
+            after_student_id,
+            limit + 1,
         )
         await applicant_cur.execute(query, params)
         records = await applicant_cur.fetchall()
 
-        return records
+        return paginate(records, limit, lambda applicant: (applicant.id,))
     
 
 async def start_offer_controller(student_id: int, offer_id: int, current_user) -> None:
@@ -692,25 +865,20 @@ async def update_application_status(
 ) -> None:
     """
     Generic function for updating the status of an application.
+    The offer ownership and the current status of the application
+    are checked in the same statement that updates the status.
     """
+    owner_id = owner_id_of(current_user, CompanyInDB)
     cur = connection.cursor(row_factory=dict_row)
-    # Check that the offer exists in the system
-    query = select_offer_company_id_query()
-    await cur.execute(query, [offer_id])
+    query = update_application_status_query(required_status, new_status)
+    await cur.execute(query, [student_id, offer_id, student_id, offer_id, owner_id, owner_id])
     record = await cur.fetchone()
 
-    if record is None:
-        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Offer not found.")
-    
-    # Check if the offer is owned by the logged in user
-    company_id = record["company_id"]
-    authorize_user(company_id, current_user, CompanyInDB)
+    # Check that the offer exists and is owned by the logged in user
+    authorize_owned_write(record, not_found_detail="Offer not found.")
 
-    # Check that the application has the correct current status
-    query = select_application_status_query()
-    await cur.execute(query, [student_id, offer_id])
-    record = await cur.fetchone()
-    current_status = record["status"] if record else None
+    # Check that the application had the correct status
+    current_status = record["status"]
 
     if current_status != required_status.value:
         raise HTTPException(
@@ -718,10 +886,6 @@ async def update_application_status(
             detail=f"Cannot update offer with status {current_status}."
         )
     
-    # Update the status of the application
-    query = update_application_status_query(new_status)
-    await connection.execute(query, [student_id, offer_id])
-    
 
 # Motivational Letter controllers
 
@@ -784,33 +948,31 @@ async def motivational_letter_delete_controller(student_id: int, current_user) -
 # Student Report controllers
 
 async def upsert_student_report(student_report: StudentReport, current_user, is_update: bool) -> None:
+    owner_id = owner_id_of(current_user, CompanyInDB)
+
+    if is_update:
+        query = update_student_report_query()
+    else:
+        query = insert_student_report_query()
+
     pool = async_pool()
     async with (
         pool.connection() as connection,
         connection.cursor(row_factory=dict_row) as cur
     ):
-        query = select_offer_company_id_query()
-        await cur.execute(query, [student_report.offer_id])
-        record = await cur.fetchone()
-        if record is None:
-            raise HTTPException(status.HTTP_404_NOT_FOUND)
-        
-        company_id = record["company_id"]
-        authorize_user(company_id, current_user, CompanyInDB)
-
-        if is_update:
-            query = update_student_report_query()
-        else:
-            query = insert_student_report_query()
-        
-        await connection.execute(query, [
+        await cur.execute(query, [
+            student_report.offer_id,
             student_report.overall_grade,
             student_report.technical_grade,
             student_report.communication_grade,
             student_report.comment,
             student_report.student_id,
             student_report.offer_id,
+            owner_id,
+            owner_id,
         ])
+        record = await cur.fetchone()
+        authorize_owned_write(record)
 
 
 async def student_report_post_controller(student_report: StudentReport, current_user) -> None:
@@ -822,22 +984,16 @@ async def student_report_put_controller(student_report: StudentReport, current_u
 
 
 async def student_report_delete_controller(student_id: int, offer_id: int, current_user):
+    owner_id = owner_id_of(current_user, CompanyInDB)
     pool = async_pool()
     async with (
         pool.connection() as connection,
         connection.cursor(row_factory=dict_row) as cur
     ):
-        query = select_offer_company_id_query()
-        await cur.execute(query, [offer_id])
-        record = await cur.fetchone()
-        if record is None:
-            raise HTTPException(status.HTTP_404_NOT_FOUND)
-        
-        company_id = record["company_id"]
-        authorize_user(company_id, current_user, CompanyInDB)
-
         query = delete_student_report_query()
-        await connection.execute(query, [student_id, offer_id])
+        await cur.execute(query, [offer_id, student_id, offer_id, owner_id, owner_id])
+        record = await cur.fetchone()
+        authorize_owned_write(record)
 
 
 async def student_report_get_controller(student_id: int, offer_id: int) -> Optional[StudentReport]:
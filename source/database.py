@@ -2,6 +2,7 @@ from os import getenv
 from dotenv import load_dotenv
 from functools import lru_cache
 from psycopg_pool import AsyncConnectionPool
+from .statements import configure_connection
 
 
 def get_connection_string() -> str:
@@ -22,4 +23,7 @@ def get_connection_string() -> str:
 
 @lru_cache()
 def async_pool() -> AsyncConnectionPool:
-    return AsyncConnectionPool(conninfo=get_connection_string())
+    return AsyncConnectionPool(
+        conninfo=get_connection_string(),
+        configure=configure_connection,
+    )
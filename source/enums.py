@@ -21,6 +21,12 @@ class Region(Enum):
     AMERICAS = 3
 
 
+class OfferFileType(Enum):
+    PDF = "pdf"
+    TEXT = "text"
+    MARKDOWN = "markdown"
+
+
 MIN_GPA = 0.00
 MAX_GPA = 10.00
 MIN_CREDITS = 0
@@ -29,8 +35,39 @@ MAX_CREDITS = 300
 
 class Environment:
     TESTING = "TESTING"
+    METRICS = "METRICS"
     EMAIL_ADDRESS = "EMAIL_ADDRESS"
     EMAIL_PASSWORD = "EMAIL_PASSWORD"
+    SMTP_HOST = "SMTP_HOST"
+    SMTP_PORT = "SMTP_PORT"
+    SMTP_SSL = "SMTP_SSL"
+    SMTP_CONNECTIONS = "SMTP_CONNECTIONS"
+    SMTP_MAX_RATE = "SMTP_MAX_RATE"
+    PASSWORD_EXECUTOR = "PASSWORD_EXECUTOR"
+    PASSWORD_WORKERS = "PASSWORD_WORKERS"
+    PASSWORD_MAX_QUEUED = "PASSWORD_MAX_QUEUED"
+    SELF_CONTAINED_TOKENS = "SELF_CONTAINED_TOKENS"
+    JOB_BATCH_SIZE = "JOB_BATCH_SIZE"
+    JOB_POLL_SECONDS = "JOB_POLL_SECONDS"
+    DIGEST_WINDOW_SECONDS = "DIGEST_WINDOW_SECONDS"
+    DIGEST_BATCH_SIZE = "DIGEST_BATCH_SIZE"
+    DIGEST_IMMEDIATE_THRESHOLD = "DIGEST_IMMEDIATE_THRESHOLD"
+    OFFER_FILE_EXECUTOR = "OFFER_FILE_EXECUTOR"
+    OFFER_FILE_WORKERS = "OFFER_FILE_WORKERS"
+    OFFER_FILE_MAX_QUEUED = "OFFER_FILE_MAX_QUEUED"
+    OFFER_FILE_MAX_BYTES = "OFFER_FILE_MAX_BYTES"
+    OFFER_FILE_MAX_PAGES = "OFFER_FILE_MAX_PAGES"
+    OFFER_FILE_CPU_SECONDS = "OFFER_FILE_CPU_SECONDS"
+    OFFER_FILE_TIMEOUT_SECONDS = "OFFER_FILE_TIMEOUT_SECONDS"
+    OFFER_TEXT_MAX_BYTES = "OFFER_TEXT_MAX_BYTES"
+    OFFER_BULK_MAX_BYTES = "OFFER_BULK_MAX_BYTES"
+    OFFER_FILE_CACHE_DIR = "OFFER_FILE_CACHE_DIR"
+    OFFER_FILE_CACHE_MAX_BYTES = "OFFER_FILE_CACHE_MAX_BYTES"
+    OFFER_BULK_MAX_OFFERS = "OFFER_BULK_MAX_OFFERS"
+    PROFILE_PICTURE_MAX_BYTES = "PROFILE_PICTURE_MAX_BYTES"
+    PICTURE_EXECUTOR = "PICTURE_EXECUTOR"
+    PICTURE_WORKERS = "PICTURE_WORKERS"
+    PICTURE_MAX_QUEUED = "PICTURE_MAX_QUEUED"
     TRUE = "TRUE"
     FALSE = "FALSE"
 
@@ -45,4 +82,6 @@ class Tables:
     SUBJECTS = "subjects"
     MOTIVATIONAL_LETTERS = "motivational_letters"
     STUDENT_REPORTS = "student_reports"
-    COMPANY_REPORTS = "company_reports"
\ No newline at end of file
+    COMPANY_REPORTS = "company_reports"
+    JOBS = "jobs"
+    APPLICANT_EVENTS = "applicant_events"
\ No newline at end of file
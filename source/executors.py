@@ -0,0 +1,104 @@
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import HTTPException, status
+import asyncio
+import threading
+
+
+PROCESS = "process"
+THREAD = "thread"
+
+
+class BoundedExecutor:
+    """
+    Runs blocking (CPU-heavy) functions outside of the event loop,
+    in a process or thread pool with a limited number of workers.
+    At most 'max_queued' calls may wait for a free worker - any
+    further calls are rejected with a 503 instead of piling up.
+    """
+
+    def __init__(self, name: str, kind: str, max_workers: int, max_queued: int) -> None:
+        if kind not in (PROCESS, THREAD):
+            raise ValueError(f"Executor kind must be '{PROCESS}' or '{THREAD}'. Got: {kind}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.in_flight = 0
+        self.rejected = 0
+        self.restarts = 0
+        self._executor: Executor | None = None
+        # Slots are released from the pool's threads
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Executor:
+        # Created lazily, so that importing the module does not spawn processes
+        if self._executor is None:
+            if self.kind == PROCESS:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        return self._executor
+
+    async def run(self, function, *args):
+        with self._lock:
+            is_full = self.in_flight >= self.max_workers + self.max_queued
+            if is_full:
+                self.rejected += 1
+            else:
+                self.in_flight += 1
+
+        if is_full:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please try again later.",
+                headers={"Retry-After": "1"},
+            )
+
+        executor = self._get_executor()
+        try:
+            future = executor.submit(function, *args)
+        except BrokenProcessPool:
+            self._release_slot()
+            self._replace_broken(executor)
+            raise
+
+        # The slot is held until the call finishes in the pool. A cancelled
+        # caller only cancels calls that have not started yet - a running
+        # call keeps its worker busy, so it keeps counting towards the bound.
+        future.add_done_callback(self._release_slot)
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for its memory use). The pool
+            # cannot run any further calls, so it is replaced for the next ones.
+            self._replace_broken(executor)
+            raise
+
+    def _release_slot(self, future: Future | None = None) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def _replace_broken(self, executor: Executor) -> None:
+        # Concurrent calls see the same broken pool, only the first replaces it
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self.restarts += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_queued": self.max_queued,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+        }
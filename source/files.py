@@ -1,56 +1,470 @@
-from io import BytesIO
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO, StringIO
 from pypdf import PdfReader
+from pypdf.errors import PyPdfError
+import csv
+import hashlib
 import re
-from .enums import Region
+import signal
+import zipfile
+import threading
+import asyncio as aio
+from .enums import Region, Environment, OfferFileType
+from .executors import BoundedExecutor, PROCESS
+from .cache import LRUCache, DiskCache
+from fastapi import status
+from functools import lru_cache
+from typing import Iterable, Iterator
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from os import getenv
 
 
-def extract_file_offer(offer_file_bytes: bytes) -> dict:
-    offer_bytes_obj = BytesIO(offer_file_bytes)
-    file_reader = PdfReader(offer_bytes_obj)
+"""
+Offer files are parsed in a separate process pool, so that large
+or malicious PDFs cannot block the event loop. Each file is limited
+in size, number of pages, CPU time (where the platform supports
+CPU timers) and wall-clock time.
+"""
+load_dotenv()
+OFFER_FILE_MAX_BYTES = int(getenv(Environment.OFFER_FILE_MAX_BYTES, str(5 * 1024 * 1024)))
+OFFER_FILE_MAX_PAGES = int(getenv(Environment.OFFER_FILE_MAX_PAGES, "20"))
+OFFER_FILE_CPU_SECONDS = float(getenv(Environment.OFFER_FILE_CPU_SECONDS, "5"))
+OFFER_FILE_TIMEOUT_SECONDS = float(getenv(Environment.OFFER_FILE_TIMEOUT_SECONDS, "10"))
 
-    text = ""
-    for page in file_reader.pages:
-        text += page.extract_text()
+"""
+Parsed offer files are cached by the hash of their content, in memory
+and on disk, so that uploading the same file again skips the parsing.
+The parser version is part of the key - bump it when the parsing changes.
+"""
+OFFER_PARSER_VERSION = 2
+OFFER_FILE_CACHE_SIZE = 256
+OFFER_FILE_CACHE_DIR = getenv(Environment.OFFER_FILE_CACHE_DIR, "cache/offer_files")
+OFFER_FILE_CACHE_MAX_BYTES = int(getenv(Environment.OFFER_FILE_CACHE_MAX_BYTES, str(50 * 1024 * 1024)))
+offer_file_cache = LRUCache("offer_files", OFFER_FILE_CACHE_SIZE)
+offer_file_disk_cache = DiskCache("offer_files_disk", OFFER_FILE_CACHE_DIR, OFFER_FILE_CACHE_MAX_BYTES)
+
+""" Text and Markdown offer files are parsed directly - they are limited to a smaller size """
+OFFER_TEXT_MAX_BYTES = int(getenv(Environment.OFFER_TEXT_MAX_BYTES, str(64 * 1024)))
+PDF_MAGIC_BYTES = b"%PDF-"
+MARKDOWN_CONTENT_TYPES = ("text/markdown", "text/x-markdown")
+MARKDOWN_EXTENSIONS = (".md", ".markdown")
+OFFER_FILE_EXTENSIONS = (".pdf", ".txt") + MARKDOWN_EXTENSIONS
+
+""" Limits of a bulk import - a ZIP archive of offer files, or a CSV file """
+OFFER_BULK_MAX_BYTES = int(getenv(Environment.OFFER_BULK_MAX_BYTES, str(50 * 1024 * 1024)))
+OFFER_BULK_MAX_OFFERS = int(getenv(Environment.OFFER_BULK_MAX_OFFERS, "100"))
+OFFER_CSV_COLUMNS = ["salary", "num_weeks", "field", "deadline", "region", "requirements", "responsibilities"]
+
+OFFER_FIELD_PATTERNS = {
+    "salary": r"Salary:\s*(\d+)",
+    "num_weeks": r"Weeks:\s*(\d+)",
+    "field": r"Field:\s*([A-Za-z\s]+)\n",
+    "deadline": r"Deadline:\s*(\d{4}-\d{2}-\d{2})",
+    "region": r"Region:\s*([A-Za-z]+)",
+    "requirements": r"Requirements:\s+([\s\S]+?)\nResponsibilities",
+    "responsibilities": r"Responsibilities:\s+([\s\S]+)$",
+}
+OFFER_FIELD_REGEXES = {name: re.compile(pattern) for name, pattern in OFFER_FIELD_PATTERNS.items()}
+""" Every field pattern starts with its label, so the labels are found in one scan """
+OFFER_LABELS = {
+    "Salary": "salary",
+    "Weeks": "num_weeks",
+    "Field": "field",
+    "Deadline": "deadline",
+    "Region": "region",
+    "Requirements": "requirements",
+    "Responsibilities": "responsibilities",
+}
+OFFER_LABEL_REGEX = re.compile("(" + "|".join(OFFER_LABELS) + "):")
+WHITESPACE_REGEX = re.compile(r"\s+")
+REQUIREMENTS_END = "\nResponsibilities"
+
+
+class OfferFileError(Exception):
+    """ An offer file that could not be turned into an offer """
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def __init__(self, message: str) -> None:
+        super().__init__(message)
+        self.message = message
+
+
+class OfferFileTooLargeError(OfferFileError):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+class OfferFileUnreadableError(OfferFileError):
+    status_code = status.HTTP_400_BAD_REQUEST
+
+
+class OfferFileTimeoutError(OfferFileError):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+class OfferFileFieldError(OfferFileError):
+    """ A value is missing from the file, or is invalid """
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@lru_cache()
+def offer_file_executor() -> BoundedExecutor:
+    return BoundedExecutor(
+        name="offer-files",
+        kind=getenv(Environment.OFFER_FILE_EXECUTOR, PROCESS),
+        max_workers=int(getenv(Environment.OFFER_FILE_WORKERS, "2")),
+        max_queued=int(getenv(Environment.OFFER_FILE_MAX_QUEUED, "8")),
+    )
+
+
+def offer_file_cache_key(offer_file_bytes: bytes) -> str:
+    digest = hashlib.sha256(offer_file_bytes).hexdigest()
+    return f"v{OFFER_PARSER_VERSION}-{digest}"
+
+
+def detect_offer_file_type(
+    offer_file_bytes: bytes,
+    content_type: str | None = None,
+    file_name: str | None = None,
+) -> OfferFileType:
+    """
+    PDFs are detected by their magic bytes. Any other file must be
+    UTF-8 text - Markdown if its content type or extension says so.
+    """
+    if offer_file_bytes.startswith(PDF_MAGIC_BYTES):
+        return OfferFileType.PDF
+
+    if content_type == "application/pdf" or (file_name or "").lower().endswith(".pdf"):
+        raise OfferFileUnreadableError("Could not read offer file: not a valid PDF file.")
+
+    try:
+        offer_file_bytes.decode("utf-8")
+    except UnicodeDecodeError:
+        raise OfferFileUnreadableError("Offer file must be a PDF, text or Markdown file.")
+
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in MARKDOWN_CONTENT_TYPES or (file_name or "").lower().endswith(MARKDOWN_EXTENSIONS):
+        return OfferFileType.MARKDOWN
+    return OfferFileType.TEXT
+
+
+def markdown_to_text(markdown: str) -> str:
+    """ Removes the markup around the labels, e.g. '## Requirements' or '- **Salary:** 1000' """
+    text = re.sub(r"^[ \t]{0,3}#{1,6}[ \t]*", "", markdown, flags=re.MULTILINE)
+    text = re.sub(r"^[ \t]*[-*+][ \t]+", "", text, flags=re.MULTILINE)
+    return text.replace("**", "").replace("__", "").replace("`", "")
+
+
+def extract_text_file_offer(offer_file_bytes: bytes, file_type: OfferFileType) -> dict:
+    if len(offer_file_bytes) > OFFER_TEXT_MAX_BYTES:
+        raise OfferFileTooLargeError(f"Offer text file is larger than {OFFER_TEXT_MAX_BYTES} bytes.")
+
+    text = offer_file_bytes.decode("utf-8-sig").replace("\r\n", "\n")
+    if file_type == OfferFileType.MARKDOWN:
+        text = markdown_to_text(text)
+    return extract_text_offer_info(text)
+
+
+async def extract_file_offer(
+    offer_file_bytes: bytes,
+    content_type: str | None = None,
+    file_name: str | None = None,
+) -> dict:
+    if len(offer_file_bytes) > OFFER_FILE_MAX_BYTES:
+        raise OfferFileTooLargeError(f"Offer file is larger than {OFFER_FILE_MAX_BYTES} bytes.")
+
+    file_type = detect_offer_file_type(offer_file_bytes, content_type, file_name)
+    if file_type != OfferFileType.PDF:
+        # Small enough to parse on the event loop
+        return extract_text_file_offer(offer_file_bytes, file_type)
+
+    key = await aio.to_thread(offer_file_cache_key, offer_file_bytes)
+    offer_info = offer_file_cache.get(key)
+
+    if offer_info is None:
+        offer_info = await aio.to_thread(offer_file_disk_cache.get, key)
+        if offer_info is None:
+            offer_info = await parse_file_offer(offer_file_bytes)
+            await aio.to_thread(offer_file_disk_cache.set, key, offer_info)
+        offer_file_cache.set(key, offer_info)
+
+    # The cached dict is shared, callers get their own copy
+    return dict(offer_info)
+
+
+async def parse_file_offer(offer_file_bytes: bytes) -> dict:
+    try:
+        # On timeout the call is cancelled if it has not started yet,
+        # otherwise the CPU limit stops it in the worker process
+        return await aio.wait_for(
+            offer_file_executor().run(
+                extract_pdf_offer,
+                offer_file_bytes,
+                OFFER_FILE_MAX_PAGES,
+                OFFER_FILE_CPU_SECONDS,
+            ),
+            OFFER_FILE_TIMEOUT_SECONDS,
+        )
+    except aio.TimeoutError:
+        raise OfferFileTimeoutError("Offer file took too long to process.")
+    except BrokenProcessPool:
+        # The worker died while parsing - the pool is replaced for the next files
+        raise OfferFileUnreadableError("Could not read offer file: the file could not be processed.")
+
+
+async def extract_bulk_offers(bulk_file_bytes: bytes) -> list[tuple[str, dict | OfferFileError]]:
+    """
+    Extracts the offers of a ZIP archive of offer files (PDF, text or
+    Markdown), or of a CSV file
+    with a row per offer. Returns the offer info, or the error, per file
+    (or row). Errors that concern the whole upload are raised.
+    """
+    if len(bulk_file_bytes) > OFFER_BULK_MAX_BYTES:
+        raise OfferFileTooLargeError(f"Upload is larger than {OFFER_BULK_MAX_BYTES} bytes.")
+
+    if not zipfile.is_zipfile(BytesIO(bulk_file_bytes)):
+        return extract_csv_offers(bulk_file_bytes)
+
+    archive_files = await aio.to_thread(read_offer_archive, bulk_file_bytes)
+
+    # Leave the queue of the executor to the other uploads
+    semaphore = aio.Semaphore(offer_file_executor().max_workers)
 
-    offer_info = extract_text_offer_info(text)
+    async def extract(name: str, content: bytes | OfferFileError) -> tuple[str, dict | OfferFileError]:
+        if isinstance(content, OfferFileError):
+            return name, content
+        async with semaphore:
+            try:
+                return name, await extract_file_offer(content, file_name=name)
+            except OfferFileError as e:
+                return name, e
+
+    return await aio.gather(*[extract(name, content) for name, content in archive_files])
+
+
+def read_offer_archive(archive_bytes: bytes) -> list[tuple[str, bytes | OfferFileError]]:
+    try:
+        with zipfile.ZipFile(BytesIO(archive_bytes)) as archive:
+            infos = [info for info in archive.infolist() if not info.is_dir()]
+            if len(infos) > OFFER_BULK_MAX_OFFERS:
+                raise OfferFileTooLargeError(f"Archive has more than {OFFER_BULK_MAX_OFFERS} files.")
+
+            files = []
+            for info in infos:
+                if not info.filename.lower().endswith(OFFER_FILE_EXTENSIONS):
+                    files.append((info.filename, OfferFileUnreadableError("Offer file is not a PDF, text or Markdown file.")))
+                # The declared size is checked before decompressing
+                elif info.file_size > OFFER_FILE_MAX_BYTES:
+                    files.append((info.filename, OfferFileTooLargeError(f"Offer file is larger than {OFFER_FILE_MAX_BYTES} bytes.")))
+                else:
+                    files.append((info.filename, archive.read(info)))
+            return files
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, NotImplementedError) as e:
+        raise OfferFileUnreadableError(f"Could not read archive: {e}")
+
+
+def extract_csv_offers(csv_bytes: bytes) -> list[tuple[str, dict | OfferFileError]]:
+    try:
+        csv_text = csv_bytes.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise OfferFileUnreadableError("Upload is neither a ZIP archive nor a UTF-8 CSV file.")
+
+    reader = csv.DictReader(StringIO(csv_text))
+    missing_columns = [column for column in OFFER_CSV_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing_columns:
+        raise OfferFileFieldError(f"CSV file is missing the columns: {', '.join(missing_columns)}")
+
+    offers = []
+    for row in reader:
+        if len(offers) >= OFFER_BULK_MAX_OFFERS:
+            raise OfferFileTooLargeError(f"CSV file has more than {OFFER_BULK_MAX_OFFERS} rows.")
+        name = f"row {reader.line_num}"
+        try:
+            offers.append((name, extract_csv_offer_info(row)))
+        except OfferFileError as e:
+            offers.append((name, e))
+    return offers
+
+
+def extract_csv_offer_info(row: dict) -> dict:
+    try:
+        salary = int(row["salary"])
+        num_weeks = int(row["num_weeks"])
+    except (TypeError, ValueError):
+        raise OfferFileFieldError("Salary and weeks must be whole numbers.")
+
+    return {
+        "salary": salary,
+        "num_weeks": num_weeks,
+        "field": row["field"],
+        "deadline": row["deadline"],
+        "requirements": row["requirements"],
+        "responsibilities": row["responsibilities"],
+        "region_id": convert_to_region_id(row["region"]),
+    }
+
+
+def extract_pdf_offer(offer_file_bytes: bytes, max_pages: int, cpu_seconds: float) -> dict:
+    """ Runs in the worker process """
+    with cpu_time_limit(cpu_seconds):
+        try:
+            offer_bytes_obj = BytesIO(offer_file_bytes)
+            file_reader = PdfReader(offer_bytes_obj)
+
+            if len(file_reader.pages) > max_pages:
+                raise OfferFileTooLargeError(f"Offer file has more than {max_pages} pages.")
+
+            text = read_offer_text(iter_page_texts(file_reader))
+        except OfferFileError:
+            raise
+        except (PyPdfError, ValueError, KeyError, TypeError) as e:
+            # Malformed files fail in many ways inside pypdf
+            raise OfferFileUnreadableError(f"Could not read offer file: {e}")
+
+        offer_info = extract_text_offer_info(text)
     
     return offer_info
 
 
+@contextmanager
+def cpu_time_limit(seconds: float):
+    """
+    Raises OfferFileTimeoutError in the block once the process has
+    used 'seconds' of CPU time in it. Does nothing on platforms
+    without CPU timers, or outside of the main thread (thread pools).
+    """
+    if not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def on_expired(signum, frame):
+        raise OfferFileTimeoutError("Offer file took too long to process.")
+
+    previous_handler = signal.signal(signal.SIGPROF, on_expired)
+    signal.setitimer(signal.ITIMER_PROF, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, previous_handler)
+
+
+def iter_page_texts(file_reader: PdfReader) -> Iterator[str]:
+    """ Extracts the text of each page only when it is needed """
+    for page in file_reader.pages:
+        yield page.extract_text()
+
+
+def read_offer_text(page_texts: Iterable[str]) -> str:
+    """
+    Joins the page texts until the offer is complete - usually
+    after the first page - or until there are no more pages.
+    """
+    parts: list[str] = []
+    seen_responsibilities = False
+    for page_text in page_texts:
+        parts.append(page_text)
+        # The offer cannot be complete before its last section
+        seen_responsibilities = seen_responsibilities or "Responsibilities" in page_text
+        if seen_responsibilities:
+            text = "".join(parts)
+            if is_offer_text_complete(text):
+                return text
+    return "".join(parts)
+
+
+def is_offer_text_complete(text: str) -> bool:
+    """
+    The responsibilities are the last section of an offer (as in the
+    offer template) and end with the page they are on. Further pages
+    cannot change the offer once every field is found and no other
+    match reaches the end of the text, where the next page could
+    extend it.
+    """
+    for name, regex in OFFER_FIELD_REGEXES.items():
+        match = regex.search(text)
+        if match is None:
+            return False
+        if name != "responsibilities" and match.end() == len(text):
+            return False
+    return True
+
+
+def find_offer_fields(text: str) -> dict[str, str]:
+    """
+    Finds the values of the fields in a single scan over the labels.
+    The value of a field is the one at the first occurrence of its
+    label where its pattern matches - the same as searching the text
+    with the pattern.
+    """
+    values: dict[str, str] = {}
+    for label_match in OFFER_LABEL_REGEX.finditer(text):
+        name = OFFER_LABELS[label_match.group(1)]
+        if name in values:
+            continue
+
+        value = match_offer_field(name, text, label_match.start(), label_match.end())
+        if value is not None:
+            values[name] = value
+            if len(values) == len(OFFER_LABELS):
+                break
+
+    return values
+
+
+def match_offer_field(name: str, text: str, label_start: int, label_end: int) -> str | None:
+    # The requirements end at the next label, found with a plain
+    # string search instead of a lazy pattern. The responsibilities
+    # run to the end of the text.
+    if name in ("requirements", "responsibilities"):
+        whitespace_match = WHITESPACE_REGEX.match(text, label_end)
+        if whitespace_match is None:
+            return None
+
+        value_start = whitespace_match.end()
+        if name == "requirements":
+            value_end = text.find(REQUIREMENTS_END, value_start + 1)
+        else:
+            value_end = len(text)
+
+        if value_start < value_end:
+            return text[value_start:value_end]
+
+        # Not found after all the whitespace, the pattern may still
+        # match by backtracking into the whitespace - rare
+
+    match = OFFER_FIELD_REGEXES[name].match(text, label_start)
+    return match.group(1) if match else None
+
+
 def extract_text_offer_info(text: str) -> dict:
     # search for the values
-    salary_match = re.search(r"Salary:\s*(\d+)", text)
-    weeks_match = re.search(r"Weeks:\s*(\d+)", text)
-    field_match = re.search(r"Field:\s*([A-Za-z\s]+)\n", text)
-    deadline_match = re.search(r"Deadline:\s*(\d{4}-\d{2}-\d{2})", text)
-    region_match = re.search(r"Region:\s*([A-Za-z]+)", text)
-    requirements_match = re.search(r"Requirements:\s+([\s\S]+?)\nResponsibilities", text)
-    responsibilities_match = re.search(r"Responsibilities:\s+([\s\S]+)$", text)
+    values = find_offer_fields(text)
     
     # check for missing values
-    if not salary_match:
-        raise Exception("Could not extract salary from file")
-    if not weeks_match:
-        raise Exception("Could not extract weeks from file text.")
-    if not field_match:
-        raise Exception("Could not extract field from file text.")
-    if not deadline_match:
-        raise Exception("Could not extract deadline from file text.")
-    if not region_match:
-        raise Exception("Could not extract region from file text.")
-    if not requirements_match:
-        raise Exception("Could not extract requirements from file text.")
-    if not responsibilities_match:
-        raise Exception("Could not extract responsibilities from file text.")
+    if "salary" not in values:
+        raise OfferFileFieldError("Could not extract salary from file")
+    if "num_weeks" not in values:
+        raise OfferFileFieldError("Could not extract weeks from file text.")
+    if "field" not in values:
+        raise OfferFileFieldError("Could not extract field from file text.")
+    if "deadline" not in values:
+        raise OfferFileFieldError("Could not extract deadline from file text.")
+    if "region" not in values:
+        raise OfferFileFieldError("Could not extract region from file text.")
+    if "requirements" not in values:
+        raise OfferFileFieldError("Could not extract requirements from file text.")
+    if "responsibilities" not in values:
+        raise OfferFileFieldError("Could not extract responsibilities from file text.")
     
     # extract values
-    salary = salary_match.group(1)
-    num_weeks = weeks_match.group(1)
-    field = field_match.group(1)
-    deadline = deadline_match.group(1)
-    region = region_match.group(1)
-    requirements = requirements_match.group(1)
-    responsibilities = responsibilities_match.group(1)
+    salary = values["salary"]
+    num_weeks = values["num_weeks"]
+    field = values["field"]
+    deadline = values["deadline"]
+    region = values["region"]
+    requirements = values["requirements"]
+    responsibilities = values["responsibilities"]
 
     # post-process values
     salary = int(salary)
@@ -78,4 +492,4 @@ def convert_to_region_id(region: str) -> int:
     elif region == "Americas":
         return Region.AMERICAS.value
     else:
-        raise Exception(f"Invalid region provided: {region}")
\ No newline at end of file
+        raise OfferFileFieldError(f"Invalid region provided: {region}")
\ No newline at end of file
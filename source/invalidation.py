@@ -0,0 +1,76 @@
+from .cache import clear_caches
+from .database import async_pool
+from psycopg import AsyncConnection, OperationalError
+from typing import Callable, Optional
+import asyncio as aio
+import json
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+"""
+Channel of the notifications sent by the triggers in SQL/triggers.sql.
+Every notification carries the table ('topic') and, for tables with a
+cache key column, the key of the written row.
+"""
+CHANNEL = "cache_invalidation"
+RECONNECT_DELAY_SECONDS = 5
+
+""" Functions called with the row key when a topic is notified, by topic """
+_invalidators: dict[str, list[Callable[[Optional[str]], None]]] = {}
+
+
+def register_invalidator(topic: str, invalidator: Callable[[Optional[str]], None]) -> None:
+    """
+    Registers a function that invalidates cached entries
+    of the given topic (table). It is called with the key
+    of the written row, or None if the topic has no key.
+    """
+    _invalidators.setdefault(topic, []).append(invalidator)
+
+
+def dispatch(payload: str) -> None:
+    try:
+        notification = json.loads(payload)
+        topic, key = notification["topic"], notification["key"]
+    except (ValueError, KeyError, TypeError):
+        logger.warning("Ignoring invalid cache invalidation: %s", payload)
+        return
+
+    for invalidator in _invalidators.get(topic, []):
+        invalidator(key)
+
+
+async def listen_for_invalidations() -> None:
+    """
+    Runs for the lifetime of the worker. Keeps one dedicated
+    connection (outside of the pool, since it is never returned)
+    listening on the invalidation channel, and reconnects if the
+    connection is lost. Notifications sent while disconnected
+    are lost, so the in-memory caches are cleared on every (re)connect.
+    """
+    conninfo = async_pool().conninfo
+
+    while True:
+        try:
+            conn = await AsyncConnection.connect(conninfo, autocommit=True)
+            async with conn:
+                await conn.execute(f"LISTEN {CHANNEL}")
+                clear_caches()
+
+                async for notification in conn.notifies():
+                    try:
+                        dispatch(notification.payload)
+                    except Exception:
+                        # The cached entries of the topic may now be stale
+                        logger.exception("Could not apply cache invalidation %s, clearing the caches", notification.payload)
+                        clear_caches()
+        except OperationalError as e:
+            logger.warning("Cache invalidation listener disconnected: %s", e)
+        except Exception:
+            # The listener must outlive any error, or the caches are never invalidated again
+            logger.exception("Cache invalidation listener failed, reconnecting")
+
+        await aio.sleep(RECONNECT_DELAY_SECONDS)
@@ -0,0 +1,105 @@
+from .database import async_pool
+from .queries import (
+    claim_jobs_query,
+    delete_job_query,
+    fail_expired_jobs_query,
+    insert_job_query,
+    retry_job_query,
+)
+from psycopg import AsyncConnection
+from psycopg.rows import dict_row
+from psycopg.types.json import Jsonb
+from typing import Awaitable, Callable
+from enum import Enum
+import asyncio as aio
+import traceback
+
+
+"""
+A job must finish within its lock, after which another
+worker can claim it again. Jobs are cancelled when it expires.
+"""
+JOB_LOCK_SECONDS = 300
+""" Failed jobs are retried after 10s, 20s, 40s, ... at most an hour """
+RETRY_BASE_SECONDS = 10
+RETRY_MAX_SECONDS = 3600
+
+""" Functions that can run as jobs, by name """
+_handlers: dict[str, Callable[..., Awaitable]] = {}
+
+
+def job(function: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+    """
+    Registers an async function so that it can be enqueued.
+    Its arguments must be JSON-serializable (or enums, which
+    are passed by value).
+    """
+    _handlers[function.__name__] = function
+    return function
+
+
+def job_argument(value):
+    return value.value if isinstance(value, Enum) else value
+
+
+async def enqueue(
+    conn: AsyncConnection,
+    function: Callable[..., Awaitable],
+    *args,
+    delay_seconds: float = 0,
+    dedupe_key: str | None = None,
+) -> None:
+    """
+    Adds a job on the given connection. Called inside the
+    transaction of the write that the job follows, the job
+    is only visible to workers if that transaction commits.
+    At most one job per 'dedupe_key' is pending at a time.
+    """
+    if function.__name__ not in _handlers:
+        raise ValueError(f"{function.__name__} is not registered as a job")
+
+    sql = insert_job_query()
+    await conn.execute(sql, [
+        function.__name__,
+        Jsonb([job_argument(arg) for arg in args]),
+        delay_seconds,
+        dedupe_key,
+    ])
+
+
+def retry_delay_seconds(attempts: int) -> float:
+    return min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+
+
+async def run_job(record: dict) -> None:
+    handler = _handlers.get(record["name"])
+
+    try:
+        if handler is None:
+            raise LookupError(f"No job registered as {record['name']}")
+        await aio.wait_for(handler(*record["args"]), JOB_LOCK_SECONDS)
+    except Exception:
+        error = traceback.format_exc()
+        print(f"Job {record['id']} ({record['name']}) failed, attempt {record['attempts']}:\n{error}")
+        sql = retry_job_query()
+        parameters = [retry_delay_seconds(record["attempts"]), error, record["id"], record["attempts"]]
+    else:
+        sql = delete_job_query()
+        parameters = [record["id"], record["attempts"]]
+
+    async with async_pool().connection() as conn:
+        await conn.execute(sql, parameters)
+
+
+async def run_due_jobs(batch_size: int) -> int:
+    """
+    Claims up to 'batch_size' due jobs and runs them concurrently.
+    Returns the number of claimed jobs.
+    """
+    async with async_pool().connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+        await cur.execute(fail_expired_jobs_query())
+        await cur.execute(claim_jobs_query(), [JOB_LOCK_SECONDS, batch_size])
+        records = await cur.fetchall()
+
+    await aio.gather(*[run_job(record) for record in records])
+    return len(records)
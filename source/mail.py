@@ -0,0 +1,182 @@
+from .enums import Environment
+from functools import lru_cache
+from os import getenv
+import asyncio as aio
+import smtplib
+import time
+
+
+""" Idle connections are checked with a NOOP before being reused after this long """
+KEEPALIVE_SECONDS = 30
+""" Idle connections are closed instead of checked after this long """
+MAX_IDLE_SECONDS = 300
+SMTP_TIMEOUT_SECONDS = 30
+
+
+class RateLimiter:
+    """
+    Token bucket. Allows 'rate' acquisitions per second
+    on average, with bursts of up to 'burst' at once.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = aio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await aio.sleep((1 - self.tokens) / self.rate)
+
+
+def close_quietly(smtp: smtplib.SMTP) -> None:
+    try:
+        smtp.quit()
+    except (smtplib.SMTPException, OSError):
+        smtp.close()
+
+
+class MailTransport:
+    """
+    Sends emails over a small pool of authenticated SMTP connections,
+    which are kept open between messages (no TLS handshake and login
+    per message). smtplib is blocking, so every SMTP command runs in
+    a worker thread. A connection is used by one message at a time.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        use_ssl: bool,
+        username: str,
+        password: str,
+        max_connections: int,
+        max_rate: float | None,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.username = username
+        self.password = password
+        self.max_connections = max_connections
+        self.rate_limiter = RateLimiter(max_rate, max_connections) if max_rate else None
+        self.sent = 0
+        self.connects = 0
+        self._slots = aio.Semaphore(max_connections)
+        self._idle: list[tuple[float, smtplib.SMTP]] = []
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.use_ssl:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=SMTP_TIMEOUT_SECONDS)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT_SECONDS)
+
+        if self.username:
+            smtp.login(self.username, self.password)
+
+        self.connects += 1
+        return smtp
+
+    @staticmethod
+    def _is_alive(smtp: smtplib.SMTP) -> bool:
+        try:
+            code, _ = smtp.noop()
+            return code == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    async def _acquire(self) -> smtplib.SMTP:
+        """ Returns the most recently used live connection, or a new one """
+        while self._idle:
+            released_at, smtp = self._idle.pop()
+            idle_seconds = time.monotonic() - released_at
+
+            if idle_seconds < KEEPALIVE_SECONDS:
+                return smtp
+            if idle_seconds < MAX_IDLE_SECONDS and await aio.to_thread(self._is_alive, smtp):
+                return smtp
+
+            await aio.to_thread(close_quietly, smtp)
+
+        return await aio.to_thread(self._connect)
+
+    def _release(self, smtp: smtplib.SMTP) -> None:
+        self._idle.append((time.monotonic(), smtp))
+
+    async def send(self, to_address: str | list[str], subject: str, body: str) -> None:
+        message = f"Subject: {subject}\n\n{body}"
+
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+
+        async with self._slots:
+            smtp = await self._acquire()
+            try:
+                await self._send_on(smtp, to_address, message)
+            except (smtplib.SMTPServerDisconnected, OSError):
+                # The server closed the connection - retry once on a new one
+                smtp = await aio.to_thread(self._connect)
+                await self._send_on(smtp, to_address, message)
+            self.sent += 1
+
+    async def _send_on(self, smtp: smtplib.SMTP, to_address: str | list[str], message: str) -> None:
+        """
+        Returns the connection to the pool once the message is sent, or
+        rejected by the server. Any other failure (including a cancelled
+        send) leaves the connection in an unknown state, so it is closed.
+        """
+        is_reusable = False
+        try:
+            await aio.to_thread(smtp.sendmail, self.username, to_address, message)
+            is_reusable = True
+        except smtplib.SMTPServerDisconnected:
+            raise
+        except smtplib.SMTPException:
+            # The message was rejected, the connection can still be used
+            is_reusable = True
+            raise
+        finally:
+            if is_reusable:
+                self._release(smtp)
+            else:
+                # Only closes the socket, which also stops a send still running in its thread
+                smtp.close()
+
+    async def close(self) -> None:
+        while self._idle:
+            _, smtp = self._idle.pop()
+            await aio.to_thread(close_quietly, smtp)
+
+    def stats(self) -> dict:
+        return {
+            "max_connections": self.max_connections,
+            "idle_connections": len(self._idle),
+            "connects": self.connects,
+            "sent": self.sent,
+        }
+
+
+@lru_cache
+def mail_transport() -> MailTransport:
+    max_rate = getenv(Environment.SMTP_MAX_RATE)
+    return MailTransport(
+        host=getenv(Environment.SMTP_HOST, "smtp.gmail.com"),
+        port=int(getenv(Environment.SMTP_PORT, "465")),
+        use_ssl=getenv(Environment.SMTP_SSL, Environment.TRUE) == Environment.TRUE,
+        username=getenv(Environment.EMAIL_ADDRESS, ""),
+        password=getenv(Environment.EMAIL_PASSWORD, ""),
+        max_connections=int(getenv(Environment.SMTP_CONNECTIONS, "2")),
+        max_rate=float(max_rate) if max_rate else None,
+    )
@@ -4,7 +4,12 @@ import asyncio as aio
 from fastapi import FastAPI
 from .routes import router
 from .database import async_pool
-from contextlib import asynccontextmanager
+from .passwords import password_executor
+from .files import offer_file_executor
+from .profile_pictures import ProfilePictureSizeLimit
+from .mail import mail_transport
+from .invalidation import listen_for_invalidations
+from contextlib import asynccontextmanager, suppress
 from fastapi.staticfiles import StaticFiles
 from psycopg_pool import AsyncConnectionPool
 from dotenv import load_dotenv
@@ -25,15 +30,27 @@ async def lifespan(app: FastAPI):
     load_dotenv()
     db_pool = async_pool()
     aio.create_task(check_async_connections(db_pool))
+    invalidation_listener = aio.create_task(listen_for_invalidations())
     
     yield
 
+    invalidation_listener.cancel()
+    with suppress(aio.CancelledError):
+        await invalidation_listener
+
     await db_pool.close()
     async_pool.cache_clear()
+    password_executor().shutdown()
+    password_executor.cache_clear()
+    offer_file_executor().shutdown()
+    offer_file_executor.cache_clear()
+    await mail_transport().close()
+    mail_transport.cache_clear()
 
 
 app = FastAPI(lifespan=lifespan)
 app.include_router(router)
+app.add_middleware(ProfilePictureSizeLimit)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 
@@ -1,23 +1,37 @@
-from source.queries import select_application_email_and_field_query, select_applications_emails_and_fields_query, select_offer_email_and_field_query
+from source.queries import (
+    delete_sent_applicant_events_query,
+    flush_applicant_events_query,
+    insert_applicant_event_query,
+)
 from .enums import Status, Environment
 from .database import async_pool
+from .mail import mail_transport
+from .jobs import job, enqueue
+from psycopg import AsyncConnection
 from psycopg.rows import dict_row
+from dotenv import load_dotenv
 from os import getenv
-import smtplib
 
 
-def send_email(to_address: str | list[str], subject: str, body: str) -> None:
-    EMAIL_ADDRESS = getenv(Environment.EMAIL_ADDRESS, "")
-    EMAIL_PASSWORD = getenv(Environment.EMAIL_PASSWORD, "")
-    SMTP_SERVER = "smtp.gmail.com"
-    SMTP_PORT = 465
-    with smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT) as smtp:
-        smtp.login(EMAIL_ADDRESS, EMAIL_PASSWORD)        
-        message = f"Subject: {subject}\n\n{body}"
-        smtp.sendmail(EMAIL_ADDRESS, to_address, message)
+"""
+Applicant events (new applications and cancellations) are sent to
+companies as digests - at most one email per company per window,
+summarizing up to a batch of events. A company with at most the
+immediate threshold of events in the last window is emailed right
+away, and a full batch is sent without waiting for the window.
+"""
+load_dotenv()
+DIGEST_WINDOW_SECONDS = int(getenv(Environment.DIGEST_WINDOW_SECONDS, "600"))
+DIGEST_BATCH_SIZE = int(getenv(Environment.DIGEST_BATCH_SIZE, "100"))
+DIGEST_IMMEDIATE_THRESHOLD = int(getenv(Environment.DIGEST_IMMEDIATE_THRESHOLD, "1"))
 
 
-def send_email_profile_created(to_address: str, name: str) -> None:
+async def send_email(to_address: str | list[str], subject: str, body: str) -> None:
+    await mail_transport().send(to_address, subject, body)
+
+
+@job
+async def send_email_profile_created(to_address: str, name: str) -> None:
     subject = "Welcome - Profile Created"
     body = (
         f"Hello {name},\n\n"
@@ -26,63 +40,101 @@ def send_email_profile_created(to_address: str, name: str) -> None:
         "Sincerely,\n"
         "APLIPRAKSA Team"
     )
-    send_email(to_address, subject, body)
+    await send_email(to_address, subject, body)
 
 
-def send_email_new_applicant(to_address: str, offer_field: str) -> None:
+async def send_email_new_applicant(to_address: str, offer_field: str) -> None:
     subject = f"{offer_field} Offer - New Applicant"
     body = f"You have a new applicant for the '{offer_field}' offer."
-    send_email(to_address, subject, body)
+    await send_email(to_address, subject, body)
 
 
-def send_email_cancelled_applicant(to_address: str, offer_field: str) -> None:
+async def send_email_cancelled_applicant(to_address: str, offer_field: str) -> None:
     subject = f"{offer_field} Offer - Applicant Cancellation"
     body = f"One of your applicants for the '{offer_field}' has cancelled their application"
-    send_email(to_address, subject, body)
+    await send_email(to_address, subject, body)
+
+
+async def send_email_applicants_digest(to_address: str, offers: list[dict]) -> None:
+    subject = "Applicant Activity Summary"
+    lines = [
+        f"- '{offer['field']}': {offer['new_applicants']} new applicant(s), "
+        f"{offer['cancellations']} cancellation(s)"
+        for offer in offers
+    ]
+    body = "Applicant activity for your offers:\n\n" + "\n".join(lines)
+    await send_email(to_address, subject, body)
 
 
-def send_email_application_update(to_address: str | list[str], offer_field: str, new_status: Status) -> None:
+async def send_email_application_update(to_address: str | list[str], offer_field: str, new_status: Status) -> None:
     subject = f"Application Status Update - {new_status.value}"
     body = f"Your application for the '{offer_field}' has been updated to {new_status.value}"
-    send_email(to_address, subject, body)
+    await send_email(to_address, subject, body)
 
 
-async def notify_company_applicants_change(offer_id: int, is_new_applicant: bool):
-    pool = async_pool()
-    async with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
-        query = select_offer_email_and_field_query()
-        await cur.execute(query, [offer_id])
-        record = await cur.fetchone()
-    
-    company_email = record["email"]
-    offer_field = record["field"]
-    
-    if is_new_applicant:
-        send_email_new_applicant(company_email, offer_field)
-    else:
-        send_email_cancelled_applicant(company_email, offer_field)
+@job
+async def notify_student_application_status_change(student_email: str, offer_field: str, new_status: Status | str):
+    await send_email_application_update(student_email, offer_field, Status(new_status))
 
 
-async def notify_student_application_status_change(student_id: int, offer_id: int, new_status: Status):
-    pool = async_pool()
-    async with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
-        query = select_application_email_and_field_query()
-        await cur.execute(query, [student_id, offer_id])
+@job
+async def notify_students_application_status_change(student_emails: list[str], offer_field: str, new_status: Status | str):
+    await send_email_application_update(student_emails, offer_field, Status(new_status))
+
+
+async def record_applicant_event(conn: AsyncConnection, offer_id: int, is_new_applicant: bool) -> None:
+    """
+    Buffers the event for the company's next digest, and schedules it.
+    Called inside the transaction of the application write.
+    """
+    async with conn.cursor(row_factory=dict_row) as cur:
+        query = insert_applicant_event_query()
+        await cur.execute(query, [is_new_applicant, offer_id, DIGEST_WINDOW_SECONDS])
         record = await cur.fetchone()
-    
-    student_email = record["email"]
-    offer_field = record["field"]
-    send_email_application_update(student_email, offer_field, new_status)
+
+    if record is None:
+        return
+
+    # The counts do not include the event that was just inserted
+    is_low_volume = record["recent_events"] + 1 <= DIGEST_IMMEDIATE_THRESHOLD
+    is_full_batch = record["pending_events"] + 1 >= DIGEST_BATCH_SIZE
+    delay_seconds = 0 if is_low_volume or is_full_batch else DIGEST_WINDOW_SECONDS
+
+    company_id = record["company_id"]
+    await enqueue(
+        conn,
+        send_company_digest,
+        company_id,
+        delay_seconds=delay_seconds,
+        dedupe_key=f"digest:{company_id}",
+    )
 
 
-async def notify_students_application_status_change(student_ids: list[int], offer_id: int, new_status: Status):
+@job
+async def send_company_digest(company_id: int):
     pool = async_pool()
     async with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
-        async with conn.transaction():
-            query = select_applications_emails_and_fields_query()
-            await cur.execute(query, [student_ids, offer_id])
-            records = await cur.fetchall()
-    
-    student_emails = [item["email"] for item in records]
-    offer_field = records[0]["field"]
-    send_email_application_update(student_emails, offer_field, new_status)
\ No newline at end of file
+        # The events are marked as sent only if the email is sent
+        query = flush_applicant_events_query()
+        await cur.execute(query, [company_id, DIGEST_BATCH_SIZE])
+        offers = await cur.fetchall()
+
+        query = delete_sent_applicant_events_query()
+        await cur.execute(query, [company_id, DIGEST_WINDOW_SECONDS])
+
+        if not offers:
+            return
+
+        company_email = offers[0]["email"]
+        num_events = sum(offer["new_applicants"] + offer["cancellations"] for offer in offers)
+
+        if num_events == 1 and offers[0]["new_applicants"] == 1:
+            await send_email_new_applicant(company_email, offers[0]["field"])
+        elif num_events == 1:
+            await send_email_cancelled_applicant(company_email, offers[0]["field"])
+        else:
+            await send_email_applicants_digest(company_email, offers)
+
+        if num_events >= DIGEST_BATCH_SIZE:
+            # There may be more events than fit in a single digest
+            await enqueue(conn, send_company_digest, company_id, dedupe_key=f"digest:{company_id}")
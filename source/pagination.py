@@ -0,0 +1,66 @@
+from .schemas import Page
+from fastapi import HTTPException, status
+from typing import Any, Callable
+import base64
+import binascii
+import json
+
+
+""" Default number of rows per page, and the maximum a client can request """
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(*values) -> str:
+    """
+    Encodes the sort key of the last row in a page as an
+    opaque, URL-safe cursor. The next page starts after it.
+    """
+    data = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def decode_cursor(cursor: str | None, num_values: int) -> list | None:
+    """
+    Returns the sort key values stored in the cursor, or
+    None if no cursor was given. Raises a 400 exception
+    if the cursor was not created by 'encode_cursor'.
+    """
+    if cursor is None:
+        return None
+
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeError, ValueError):
+        values = None
+
+    # All sort keys are numeric (ids and search ranks)
+    is_valid = (
+        isinstance(values, list)
+        and len(values) == num_values
+        and all(type(value) in (int, float) for value in values)
+    )
+
+    if not is_valid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid page cursor.",
+        )
+
+    return values
+
+
+def page_limit(limit: int) -> int:
+    """ Clamps the requested page size between 1 and MAX_PAGE_SIZE. """
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def paginate(records: list, limit: int, sort_key: Callable[[Any], tuple]) -> Page:
+    """
+    Builds a page from records fetched with 'limit + 1' rows.
+    The extra row only signals that a next page exists.
+    """
+    has_next_page = len(records) > limit
+    items = records[:limit]
+    next_cursor = encode_cursor(*sort_key(items[-1])) if has_next_page else None
+    return Page(items=items, next_cursor=next_cursor)
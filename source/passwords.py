@@ -0,0 +1,35 @@
+from .enums import Environment
+from .executors import BoundedExecutor, PROCESS
+from .utils import pwd_context
+from functools import lru_cache
+from os import getenv
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(password, hashed_password)
+
+
+@lru_cache()
+def password_executor() -> BoundedExecutor:
+    """
+    Bcrypt is deliberately slow, so hashing and verifying
+    passwords is done outside of the event loop.
+    """
+    return BoundedExecutor(
+        name="passwords",
+        kind=getenv(Environment.PASSWORD_EXECUTOR, PROCESS),
+        max_workers=int(getenv(Environment.PASSWORD_WORKERS, "2")),
+        max_queued=int(getenv(Environment.PASSWORD_MAX_QUEUED, "32")),
+    )
+
+
+async def hash_password(password: str) -> str:
+    return await password_executor().run(_hash, password)
+
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    return await password_executor().run(_verify, password, hashed_password)
@@ -1,27 +1,40 @@
 import os
 import time
-import shutil
+import asyncio as aio
 from fastapi import UploadFile, HTTPException, status
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from psycopg import AsyncConnection
 from psycopg.rows import dict_row
-from .schemas import StudentInDB, CompanyInDB
+from .enums import Environment
 from .utils import extract_user_type
+from .jobs import enqueue
+from .thumbnails import delete_picture_variants, generate_profile_picture_variants
 from .queries import (
     select_user_profile_picture_query,
     update_profile_picture_path_query, 
 )
+from dotenv import load_dotenv
 
 
 PROFILE_IMAGES_FOLDER = "static/img"
 
+"""
+Uploads are copied in chunks, with the file IO in a thread, so that
+large uploads and slow disks do not block the event loop. Their size
+is limited while the request body is received, before it is parsed.
+"""
+load_dotenv()
+PROFILE_PICTURE_MAX_BYTES = int(os.getenv(Environment.PROFILE_PICTURE_MAX_BYTES, str(5 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 256 * 1024
+""" Room for the multipart headers and boundaries around the picture """
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
 
 def generate_profile_picture_file_name(current_user) -> str:
-    if isinstance(current_user, StudentInDB):
-        file_name = f"student_{current_user.id}"
-    elif isinstance(current_user, CompanyInDB):
-        file_name = f"company_{current_user.id}"
-    else:
-        raise TypeError(f"User must be of type student or company. Got: {type(current_user)}")
+    user_type = extract_user_type(current_user)
+    file_name = f"{user_type.value}_{current_user.id}"
     
     timestamp = time.time()
     timestamp = str(timestamp).replace(".", "")
@@ -35,13 +48,76 @@ def generate_profile_picture_file_path(current_user) -> str:
     return f"{PROFILE_IMAGES_FOLDER}/{file_name}"
 
 
+def picture_too_large_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Profile picture is larger than {PROFILE_PICTURE_MAX_BYTES} bytes.",
+    )
+
+
+class ProfilePictureSizeLimit:
+    """
+    ASGI middleware that limits the request body of profile picture
+    uploads. A declared length over the limit is rejected before the
+    body is read. Otherwise the body is counted as it is received, and
+    the upload is aborted once over the limit - with or without a
+    declared length (e.g. chunked uploads).
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] != "/profile-picture":
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = PROFILE_PICTURE_MAX_BYTES + MULTIPART_OVERHEAD_BYTES
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > max_bytes:
+            # Outside of the app's exception handlers, so the response is sent here
+            exception = picture_too_large_exception()
+            response = JSONResponse(status_code=exception.status_code, content={"detail": exception.detail})
+            await response(scope, receive, send)
+            return
+
+        num_bytes = 0
+
+        async def receive_limited() -> Message:
+            nonlocal num_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                num_bytes += len(message.get("body", b""))
+                # Raised while the form is parsed, and answered like any HTTPException
+                if num_bytes > max_bytes:
+                    raise picture_too_large_exception()
+            return message
+
+        await self.app(scope, receive_limited, send)
+
+
 async def save_profile_picture(picture: UploadFile, current_user) -> str:
     file_path = generate_profile_picture_file_path(current_user)
+    # Written next to the final file, and renamed once complete
+    temporary_path = f"{file_path}.tmp"
 
     try:
-        with open(file_path, "wb") as writer:
-            shutil.copyfileobj(picture.file, writer)
+        if picture.size is not None and picture.size > PROFILE_PICTURE_MAX_BYTES:
+            raise picture_too_large_exception()
+
+        writer = await aio.to_thread(open, temporary_path, "wb")
+        try:
+            while chunk := await picture.read(UPLOAD_CHUNK_BYTES):
+                await aio.to_thread(writer.write, chunk)
+        finally:
+            await aio.to_thread(writer.close)
+
+        await aio.to_thread(os.replace, temporary_path, file_path)
+    except HTTPException:
+        await aio.to_thread(remove_quietly, temporary_path)
+        raise
     except Exception as exception:
+        await aio.to_thread(remove_quietly, temporary_path)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Could not save file: {exception}",
@@ -52,6 +128,13 @@ async def save_profile_picture(picture: UploadFile, current_user) -> str:
     return file_path
 
 
+def remove_quietly(file_path: str) -> None:
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+
+
 def delete_profile_picture(file_path: str):
     if not os.path.isfile(file_path):
         raise HTTPException(
@@ -61,6 +144,7 @@ def delete_profile_picture(file_path: str):
     
     try:
         os.remove(file_path)
+        delete_picture_variants(file_path)
 
     except Exception as exception:
         raise HTTPException(
@@ -73,6 +157,7 @@ async def save_profile_picture_path(current_user, file_path: str, connection: As
     user_type = extract_user_type(current_user)
     query = update_profile_picture_path_query(user_type)
     await connection.execute(query, [file_path, current_user.id])
+    await enqueue(connection, generate_profile_picture_variants, user_type, current_user.id, file_path)
 
 
 async def old_profile_picture_path(current_user, connection: AsyncConnection) -> str:
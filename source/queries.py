@@ -1,37 +1,70 @@
 from typing import LiteralString, Optional
 from .enums import Status, UserType
+from .statements import prepared
 
 
 # SQL query functions
 
+""" Full-text search document of an offer. Must match the expression of the 'offers_search_idx' index. """
+OFFER_SEARCH_DOCUMENT = "to_tsvector('simple', o.field || ' ' || o.requirements || ' ' || o.responsibilities)"
 
+# Writes to rows owned by a user are guarded - the ownership check is part of 
+# the write itself. These statements return 'is_owner' for the target row,
+# or no row at all if the target does not exist.
+
+
+@prepared
 def accept_student_query() -> LiteralString:
+    # Returns the email and field for the notification
     return (
-        f"UPDATE applications SET status = '{Status.ACCEPTED.value}' "
-        f"WHERE student_id = %s AND offer_id = %s AND status = '{Status.WAITING.value}' "
-        "RETURNING student_id;"
+        f"UPDATE applications a SET status = '{Status.ACCEPTED.value}' "
+        "FROM students s, offers o "
+        "WHERE s.id = a.student_id AND o.id = a.offer_id "
+        f"AND a.student_id = %s AND a.offer_id = %s AND a.status = '{Status.WAITING.value}' "
+        "RETURNING a.student_id, s.email, o.field;"
     )
 
 
+@prepared
 def reject_students_query() -> LiteralString:
+    # Returns the emails and field for the notification
     return (
-        f"UPDATE applications SET status = '{Status.REJECTED.value}' "
-        f"WHERE student_id <> %s AND offer_id = %s AND status = '{Status.WAITING.value}' "
-        "RETURNING student_id;"
+        f"UPDATE applications a SET status = '{Status.REJECTED.value}' "
+        "FROM students s, offers o "
+        "WHERE s.id = a.student_id AND o.id = a.offer_id "
+        f"AND a.student_id <> %s AND a.offer_id = %s AND a.status = '{Status.WAITING.value}' "
+        "RETURNING a.student_id, s.email, o.field;"
     )
 
 
-def select_applications_query() -> LiteralString:
-    return (
+@prepared
+def select_applications_query(
+    student_id: int,
+    after_offer_id: Optional[int],
+    limit: int,
+) -> tuple[LiteralString, list]:
+    # Keyset pagination on the primary key (student_id, offer_id)
+    query = (
         "SELECT "
             "o.field, o.salary, o.num_weeks, "
             "a.status, a.student_id, a.offer_id "
         "FROM offers o "
         "JOIN applications a ON o.id = a.offer_id "
-        "WHERE a.student_id = %s;"
+        "WHERE a.student_id = %s "
     )
+    params: list = [student_id]
+
+    if after_offer_id is not None:
+        query += "AND a.offer_id > %s "
+        params.append(after_offer_id)
+
+    query += "ORDER BY a.offer_id LIMIT %s;"
+    params.append(limit)
+
+    return query, params
 
 
+@prepared
 def insert_student_query() -> LiteralString:
     return (
         "INSERT INTO students "
@@ -40,6 +73,7 @@ def insert_student_query() -> LiteralString:
     )
 
 
+@prepared
 def update_student_query() -> LiteralString:
     return (
         "UPDATE students SET "
@@ -49,6 +83,7 @@ def update_student_query() -> LiteralString:
     )
 
 
+@prepared
 def insert_company_query() -> LiteralString:
     return (
         "INSERT INTO companies "
@@ -57,15 +92,31 @@ def insert_company_query() -> LiteralString:
     )
 
 
-def select_company_offers_query() -> LiteralString:
-    return (
+@prepared
+def select_company_offers_query(
+    company_id: int,
+    after_id: Optional[int],
+    limit: int,
+) -> tuple[LiteralString, list]:
+    query = (
         "SELECT o.id, o.salary, o.num_weeks, o.field, o.deadline, o.requirements, o.responsibilities, o.company_id, r.name as region "
         "FROM offers as o "
         "JOIN regions as r ON o.region_id = r.id "
-        "WHERE o.company_id = %s;"
+        "WHERE o.company_id = %s "
     )
+    params: list = [company_id]
+
+    if after_id is not None:
+        query += "AND o.id < %s "
+        params.append(after_id)
 
+    query += "ORDER BY o.id DESC LIMIT %s;"
+    params.append(limit)
 
+    return query, params
+
+
+@prepared
 def update_company_query() -> LiteralString:
     return (
         "UPDATE companies SET "
@@ -74,29 +125,80 @@ def update_company_query() -> LiteralString:
     )
 
 
+@prepared
 def insert_offer_query() -> LiteralString:
     return (
         "INSERT INTO offers "
         "(salary, num_weeks, field, deadline, requirements, responsibilities, company_id, region_id) "
-        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"
-    )
-
-
-def select_offers_query(field: str | None) -> LiteralString:
-    query = (
-        "SELECT o.id, o.salary, o.num_weeks, o.field, o.deadline, r.name as region, c.name AS company_name "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s) "
+        "RETURNING id"
+    )
+
+
+@prepared
+def select_offers_query(
+    field: Optional[str],
+    search: Optional[str],
+    min_num_weeks: int,
+    max_num_weeks: int,
+    min_salary: int,
+    max_salary: int,
+    region_id: int,
+    after: Optional[list],
+    limit: int,
+) -> tuple[LiteralString, list]:
+    # Newest offers first, or most relevant first when searching.
+    # 'after' is the sort key of the last offer of the previous page.
+    query = "SELECT o.id, o.salary, o.num_weeks, o.field, o.deadline, r.name as region, c.name AS company_name "
+    params: list = []
+
+    if search is not None:
+        # Ranks are compared as float8, the type the cursor sends back.
+        # Comparing the float4 rank with a float8 parameter would
+        # treat rows tied with the last rank as past the cursor.
+        query += f", ts_rank_cd({OFFER_SEARCH_DOCUMENT}, q)::float8 AS rank "
+
+    query += (
         "FROM offers AS o "
         "JOIN companies AS c ON o.company_id = c.id "
         "JOIN regions AS r ON o.region_id = r.id "
+    )
+
+    if search is not None:
+        query += "CROSS JOIN websearch_to_tsquery('simple', %s) AS q "
+        params.append(search)
+
+    query += (
         "WHERE o.num_weeks >= %s AND o.num_weeks <= %s "
         "AND o.salary >= %s AND o.salary <= %s "
         "AND (r.id = %s OR r.name = 'Global')"
     )
+    params.extend([min_num_weeks, max_num_weeks, min_salary, max_salary, region_id])
+
     if field is not None:
-        query += " AND o.field LIKE %s"
-    return query
+        # Case-insensitive substring match, served by the trigram index
+        query += " AND o.field ILIKE %s"
+        params.append(f"%{field}%")
+
+    if search is None:
+        if after is not None:
+            query += " AND o.id < %s"
+            params.extend(after)
+        query += " ORDER BY o.id DESC"
+    else:
+        query += f" AND {OFFER_SEARCH_DOCUMENT} @@ q"
+        if after is not None:
+            query += f" AND (ts_rank_cd({OFFER_SEARCH_DOCUMENT}, q)::float8, o.id) < (%s, %s)"
+            params.extend(after)
+        query += " ORDER BY rank DESC, o.id DESC"
+
+    query += " LIMIT %s"
+    params.append(limit)
+
+    return query, params
 
 
+@prepared
 def select_offer_query() -> LiteralString:
     return (
         "SELECT o.id, o.salary, o.num_weeks, o.field, o.deadline, o.requirements, o.responsibilities, o.company_id, r.name as region "
@@ -106,15 +208,20 @@ def select_offer_query() -> LiteralString:
     )
 
 
+@prepared
 def update_offer_query() -> LiteralString:
     return (
-        "UPDATE offers SET "
-        "salary=%s, num_weeks=%s, field=%s, deadline=%s, requirements=%s, responsibilities=%s, region_id=%s "
-        "WHERE id=%s "
-        "RETURNING *;"
+        "WITH target AS (SELECT company_id FROM offers WHERE id = %s), "
+        "written AS ("
+            "UPDATE offers SET "
+            "salary=%s, num_weeks=%s, field=%s, deadline=%s, requirements=%s, responsibilities=%s, region_id=%s "
+            "WHERE id = %s AND company_id = %s"
+        ") "
+        "SELECT company_id = %s AS is_owner FROM target;"
     )
 
 
+@prepared
 def insert_experience_query() -> LiteralString:
     return (
         "INSERT INTO experiences "
@@ -123,15 +230,20 @@ def insert_experience_query() -> LiteralString:
     )
 
 
+@prepared
 def update_experience_query() -> LiteralString:
     return (
-        "UPDATE experiences SET "
-        "from_date=%s, to_date=%s, company=%s, position=%s, description=%s "
-        "WHERE id=%s "
-        "RETURNING *;" # ? Do we need this query to return anything?
+        "WITH target AS (SELECT student_id FROM experiences WHERE id = %s), "
+        "written AS ("
+            "UPDATE experiences SET "
+            "from_date=%s, to_date=%s, company=%s, position=%s, description=%s "
+            "WHERE id = %s AND student_id = %s"
+        ") "
+        "SELECT student_id = %s AS is_owner FROM target;"
     )
 
 
+@prepared
 def delete_application_query() -> LiteralString:
     return (
         "DELETE FROM applications "
@@ -139,11 +251,15 @@ def delete_application_query() -> LiteralString:
     )
 
 
+@prepared
 def update_applications_waiting_query() -> LiteralString:
+    # Returns the emails and field for the notification
     return (
-        f"UPDATE applications SET status = '{Status.WAITING.value}' "
-        "WHERE student_id <> %s AND offer_id = %s "
-        "RETURNING student_id;"
+        f"UPDATE applications a SET status = '{Status.WAITING.value}' "
+        "FROM students s, offers o "
+        "WHERE s.id = a.student_id AND o.id = a.offer_id "
+        "AND a.student_id <> %s AND a.offer_id = %s "
+        "RETURNING a.student_id, s.email, o.field;"
     )
 
 
@@ -155,6 +271,8 @@ def select_applicants_query(
     min_credits: int,
     max_credits: int,
     subjects: list[tuple[str, int]],
+    after_student_id: Optional[int],
+    limit: int,
 ) -> tuple[LiteralString, list]:
     query = (
         "SELECT "
@@ -173,46 +291,73 @@ def select_applicants_query(
         query += " AND s.university LIKE %s"
         params.append(f"%{university}%")
     
-    if not subjects:
-        return query, params
-        
-    subjects_query, params = select_student_ids_by_subjects_query(subjects, params)
-    query += f" AND s.id IN ({subjects_query})"
+    # One index probe per applicant and required subject,
+    # instead of aggregating the subjects of all students
+    for name, min_grade in subjects:
+        query += (
+            " AND EXISTS ("
+                "SELECT 1 FROM subjects sub "
+                "WHERE sub.student_id = s.id AND sub.name = %s AND sub.grade >= %s"
+            ")"
+        )
+        params.extend([name, min_grade])
+
+    # Keyset pagination on the (offer_id, student_id) index
+    if after_student_id is not None:
+        query += " AND a.student_id > %s"
+        params.append(after_student_id)
+
+    query += " ORDER BY a.student_id LIMIT %s"
+    params.append(limit)
     
     return query, params
 
 
-def select_student_ids_by_subjects_query(subjects: list[tuple], params: list) -> tuple[LiteralString, list]:
-    query = (
-        "SELECT DISTINCT(student_id) "
-        "FROM subjects "
-        "GROUP BY student_id HAVING "
-    )
-    for index, subject in enumerate(subjects):
-        query += "COUNT(DISTINCT CASE WHEN name = %s AND grade >= %s THEN 1 END) > 0"
-        if index != len(subjects) - 1:
-            query += " AND "
-
-        params.extend(subject)
-
-    return query, params
-
-
+@prepared
 def insert_subject_query() -> LiteralString:
     return "INSERT INTO subjects (student_id, name, grade) VALUES (%s, %s, %s);"
 
 
+@prepared
 def select_offer_company_id_query() -> LiteralString:
     return "SELECT company_id FROM offers WHERE id = %s"
 
 
+@prepared
 def delete_student_query() -> LiteralString:
     return "DELETE FROM students WHERE id = %s"
 
 
-def select_student_with_motivational_letter_query() -> LiteralString:
+@prepared
+def select_student_profile_query() -> LiteralString:
+    # Experiences, subjects and reports are aggregated as JSON arrays
     return (
-        "SELECT s.*, ml.*, r.name as region_name "
+        "SELECT s.*, ml.*, r.name as region_name, "
+            "("
+                "SELECT COALESCE(json_agg(e ORDER BY e.id), '[]') "
+                "FROM experiences e "
+                "WHERE e.student_id = s.id"
+            ") AS experiences, "
+            "("
+                "SELECT COALESCE(json_agg(sub ORDER BY sub.name), '[]') "
+                "FROM subjects sub "
+                "WHERE sub.student_id = s.id"
+            ") AS subjects, "
+            "("
+                "SELECT COALESCE(json_agg(json_build_object("
+                    "'overall_grade', sr.overall_grade, "
+                    "'technical_grade', sr.technical_grade, "
+                    "'communication_grade', sr.communication_grade, "
+                    "'comment', sr.comment, "
+                    "'num_weeks', o.num_weeks, "
+                    "'field', o.field, "
+                    "'company_name', c.name"
+                ")), '[]') "
+                "FROM student_reports sr "
+                "JOIN offers o ON sr.offer_id = o.id "
+                "JOIN companies c ON o.company_id = c.id "
+                "WHERE sr.student_id = s.id"
+            ") AS reports "
         "FROM students s "
         "LEFT JOIN motivational_letters ml "
         "ON s.id = ml.student_id " 
@@ -221,88 +366,67 @@ def select_student_with_motivational_letter_query() -> LiteralString:
     )
 
 
-def select_student_experiences_query() -> LiteralString:
-    return "SELECT * FROM experiences WHERE student_id = %s;"
-
-
-def select_student_subjects_query() -> LiteralString:
-    return "SELECT * FROM subjects WHERE student_id = %s;"
-
-
+@prepared
 def select_company_query() -> LiteralString:
     return "SELECT * FROM companies WHERE id = %s;"
 
 
+@prepared
 def delete_company_query() -> LiteralString:
     return "DELETE FROM companies WHERE id = %s"
 
 
+@prepared
 def update_offer_company_id_null_query() -> LiteralString:
-    return "UPDATE offers SET company_id = NULL WHERE id = %s"
-
-
-def select_experience_student_id_query() -> LiteralString:
-    return "SELECT student_id FROM experiences WHERE id = %s"
+    return (
+        "WITH target AS (SELECT company_id FROM offers WHERE id = %s), "
+        "written AS (UPDATE offers SET company_id = NULL WHERE id = %s AND company_id = %s) "
+        "SELECT company_id = %s AS is_owner FROM target;"
+    )
 
 
+@prepared
 def delete_experience_query() -> LiteralString:
-    return "DELETE FROM experiences WHERE id = %s"
+    return (
+        "WITH target AS (SELECT student_id FROM experiences WHERE id = %s), "
+        "written AS (DELETE FROM experiences WHERE id = %s AND student_id = %s) "
+        "SELECT student_id = %s AS is_owner FROM target;"
+    )
 
 
+@prepared
 def insert_application_query() -> LiteralString:
     return "INSERT INTO applications (student_id, offer_id, status) VALUES (%s, %s, %s)"
 
 
+@prepared
 def select_application_status_query() -> LiteralString:
     return "SELECT status FROM applications WHERE student_id=%s AND offer_id=%s;"
 
 
-def select_application_email_and_field_query() -> LiteralString:
-    return (
-        "SELECT students.email, offers.field "
-        "FROM applications "
-        "JOIN offers ON applications.offer_id = offers.id "
-        "JOIN students ON applications.student_id = students.id "
-        "WHERE applications.student_id = %s AND applications.offer_id = %s"
-    )
-
-
-def select_applications_emails_and_fields_query() -> LiteralString:
-    return (
-        "SELECT students.email, offers.field "
-        "FROM applications "
-        "JOIN offers ON applications.offer_id = offers.id "
-        "JOIN students ON applications.student_id = students.id "
-        "WHERE applications.student_id = ANY(%s) AND applications.offer_id = %s"
-    )
-
-
-def select_offer_email_and_field_query() -> LiteralString:
-    return (
-        "SELECT companies.email, offers.field "
-        "FROM offers "
-        "JOIN companies "
-        "ON companies.id = offers.company_id "
-        "WHERE offers.id = %s"
-    )
-
-
-def select_subject_student_id_query() -> LiteralString:
-    return "SELECT student_id FROM subjects WHERE student_id = %s and name = %s;"
-
-
+@prepared
 def update_subject_query() -> LiteralString:
     return (
-        "UPDATE subjects "
-        "SET grade = %s "
-        "WHERE student_id = %s and name = %s;"
+        "WITH target AS (SELECT student_id FROM subjects WHERE student_id = %s AND name = %s), "
+        "written AS ("
+            "UPDATE subjects "
+            "SET grade = %s "
+            "WHERE student_id = %s AND name = %s AND student_id = %s"
+        ") "
+        "SELECT student_id = %s AS is_owner FROM target;"
     )
 
 
+@prepared
 def delete_subject_query() -> LiteralString:
-    return "DELETE FROM subjects WHERE student_id = %s AND name = %s"
+    return (
+        "WITH target AS (SELECT student_id FROM subjects WHERE student_id = %s AND name = %s), "
+        "written AS (DELETE FROM subjects WHERE student_id = %s AND name = %s AND student_id = %s) "
+        "SELECT student_id = %s AS is_owner FROM target;"
+    )
 
 
+@prepared
 def insert_motivational_letter_query() -> LiteralString:
     return (
         "INSERT INTO motivational_letters "
@@ -311,10 +435,12 @@ def insert_motivational_letter_query() -> LiteralString:
     )
 
 
+@prepared
 def select_motivational_letter_student_id_query() -> LiteralString:
     return "SELECT student_id FROM motivational_letters WHERE student_id = %s;"
 
 
+@prepared
 def update_motivational_letter_query() -> LiteralString:
     return (
         "UPDATE motivational_letters SET "
@@ -324,40 +450,73 @@ def update_motivational_letter_query() -> LiteralString:
     )
 
 
+@prepared
 def delete_motivational_letter_query() -> LiteralString:
     return "DELETE FROM motivational_letters WHERE student_id = %s;"
 
 
+@prepared
 def insert_student_report_query() -> LiteralString:
     return (
-        "INSERT INTO student_reports "
-        "(overall_grade, technical_grade, communication_grade, comment, student_id, offer_id) "
-        "VALUES (%s, %s, %s, %s, %s, %s);"
+        "WITH target AS (SELECT company_id FROM offers WHERE id = %s), "
+        "written AS ("
+            "INSERT INTO student_reports "
+            "(overall_grade, technical_grade, communication_grade, comment, student_id, offer_id) "
+            "SELECT %s, %s, %s, %s, %s, %s FROM target WHERE company_id = %s"
+        ") "
+        "SELECT company_id = %s AS is_owner FROM target;"
     )
 
 
+@prepared
 def update_student_report_query() -> LiteralString:
     return (
-        "UPDATE student_reports SET "
-        "overall_grade = %s, "
-        "technical_grade = %s, "
-        "communication_grade = %s, "
-        "comment = %s "
-        "WHERE student_id = %s AND offer_id = %s"
+        "WITH target AS (SELECT company_id FROM offers WHERE id = %s), "
+        "written AS ("
+            "UPDATE student_reports SET "
+            "overall_grade = %s, "
+            "technical_grade = %s, "
+            "communication_grade = %s, "
+            "comment = %s "
+            "WHERE student_id = %s AND offer_id = %s "
+            "AND EXISTS (SELECT 1 FROM target WHERE company_id = %s)"
+        ") "
+        "SELECT company_id = %s AS is_owner FROM target;"
     )
 
 
+@prepared
 def delete_student_report_query() -> LiteralString:
-    return "DELETE FROM student_reports WHERE student_id = %s AND offer_id = %s;"
-
-
-def update_application_status_query(new_status: Status) -> LiteralString:
     return (
-        f"UPDATE applications SET status = '{new_status.value}' "
-        "WHERE student_id = %s AND offer_id = %s;"
+        "WITH target AS (SELECT company_id FROM offers WHERE id = %s), "
+        "written AS ("
+            "DELETE FROM student_reports "
+            "WHERE student_id = %s AND offer_id = %s "
+            "AND EXISTS (SELECT 1 FROM target WHERE company_id = %s)"
+        ") "
+        "SELECT company_id = %s AS is_owner FROM target;"
     )
 
 
+@prepared
+def update_application_status_query(required_status: Status, new_status: Status) -> LiteralString:
+    return (
+        "WITH target AS ("
+            "SELECT o.company_id, a.status "
+            "FROM offers o "
+            "LEFT JOIN applications a ON a.offer_id = o.id AND a.student_id = %s "
+            "WHERE o.id = %s"
+        "), "
+        "written AS ("
+            f"UPDATE applications SET status = '{new_status.value}' "
+            f"WHERE student_id = %s AND offer_id = %s AND status = '{required_status.value}' "
+            "AND EXISTS (SELECT 1 FROM target WHERE company_id = %s)"
+        ") "
+        "SELECT company_id = %s AS is_owner, status FROM target;"
+    )
+
+
+@prepared
 def select_student_report_query() -> LiteralString:
     return (
         "SELECT * "
@@ -366,17 +525,7 @@ def select_student_report_query() -> LiteralString:
     )
 
 
-def select_student_reports_query() -> LiteralString:
-    return (
-        "SELECT sr.overall_grade, sr.technical_grade, sr.communication_grade, sr.comment, "
-        "o.num_weeks, o.field, c.name as company_name "
-        "FROM student_reports sr "
-        "JOIN offers o ON sr.offer_id = o.id "
-        "JOIN companies c ON o.company_id = c.id "
-        "WHERE sr.student_id = %s;"
-    )
-
-
+@prepared
 def select_company_reports_query() -> LiteralString:
     return (
         "SELECT "
@@ -391,6 +540,7 @@ def select_company_reports_query() -> LiteralString:
     )
 
 
+@prepared
 def update_company_report_query() -> LiteralString:
     return (
         "UPDATE company_reports SET "
@@ -402,6 +552,7 @@ def update_company_report_query() -> LiteralString:
     )
 
 
+@prepared
 def insert_company_report_query():
     return (
         "INSERT INTO company_reports "
@@ -410,30 +561,192 @@ def insert_company_report_query():
     )
 
 
+@prepared
 def delete_company_report_query() -> LiteralString:
     return "DELETE FROM company_reports WHERE student_id = %s AND offer_id = %s"
 
 
+@prepared
 def select_company_report_query() -> LiteralString:
     return "SELECT * FROM company_reports WHERE student_id = %s AND offer_id = %s"
 
 
+@prepared
 def update_profile_picture_path_query(user_type: UserType) -> LiteralString:
+    # The variants of the new picture are generated later
     if user_type == UserType.STUDENT:
-        return "UPDATE students SET profile_picture_path = %s WHERE id = %s;"
+        return (
+            "UPDATE students SET profile_picture_path = %s, "
+            "profile_picture_thumbnail_path = NULL, profile_picture_medium_path = NULL "
+            "WHERE id = %s;"
+        )
     elif user_type == UserType.COMPANY:
-        return "UPDATE companies SET profile_picture_path = %s WHERE id = %s;"
+        return (
+            "UPDATE companies SET profile_picture_path = %s, "
+            "profile_picture_thumbnail_path = NULL, profile_picture_medium_path = NULL "
+            "WHERE id = %s;"
+        )
     
 
+@prepared
 def delete_profile_picture_path_query(user_type: UserType) -> LiteralString:
     if user_type == UserType.STUDENT:
-        return "UPDATE students SET profile_picture_path = NULL WHERE id = %s;"
+        return (
+            "UPDATE students SET profile_picture_path = NULL, "
+            "profile_picture_thumbnail_path = NULL, profile_picture_medium_path = NULL "
+            "WHERE id = %s;"
+        )
     elif user_type == UserType.COMPANY:
-        return "UPDATE companies SET profile_picture_path = NULL WHERE id = %s;"
+        return (
+            "UPDATE companies SET profile_picture_path = NULL, "
+            "profile_picture_thumbnail_path = NULL, profile_picture_medium_path = NULL "
+            "WHERE id = %s;"
+        )
+
+
+@prepared
+def update_profile_picture_variants_query(user_type: UserType) -> LiteralString:
+    # Only if the picture was not replaced in the meantime
+    if user_type == UserType.STUDENT:
+        return (
+            "UPDATE students SET profile_picture_thumbnail_path = %s, profile_picture_medium_path = %s "
+            "WHERE id = %s AND profile_picture_path = %s;"
+        )
+    elif user_type == UserType.COMPANY:
+        return (
+            "UPDATE companies SET profile_picture_thumbnail_path = %s, profile_picture_medium_path = %s "
+            "WHERE id = %s AND profile_picture_path = %s;"
+        )
     
 
+@prepared
 def select_user_profile_picture_query(user_type: UserType) -> LiteralString:
     if user_type == UserType.STUDENT:
         return "SELECT profile_picture_path FROM students WHERE id = %s;"
     elif user_type == UserType.COMPANY:
-        return "SELECT profile_picture_path FROM companies WHERE id = %s;"
\ No newline at end of file
+        return "SELECT profile_picture_path FROM companies WHERE id = %s;"
+
+
+@prepared
+def select_user_by_email_query(user_type: UserType) -> LiteralString:
+    if user_type == UserType.STUDENT:
+        return "SELECT * FROM students WHERE email = %s;"
+    elif user_type == UserType.COMPANY:
+        return "SELECT * FROM companies WHERE email = %s;"
+
+@prepared
+def insert_job_query() -> LiteralString:
+    # A pending job with the same dedupe key absorbs the new one,
+    # and runs at the earlier of the two times
+    return (
+        "INSERT INTO jobs (name, args, run_at, dedupe_key) "
+        "VALUES (%s, %s, now() + make_interval(secs => %s), %s) "
+        "ON CONFLICT (dedupe_key) WHERE status = 'PENDING' "
+        "DO UPDATE SET run_at = LEAST(jobs.run_at, EXCLUDED.run_at)"
+    )
+
+
+@prepared
+def claim_jobs_query() -> LiteralString:
+    # Due pending jobs, and running jobs whose worker let the lock
+    # expire (e.g. it crashed). SKIP LOCKED lets workers claim
+    # disjoint batches concurrently.
+    return (
+        "UPDATE jobs SET "
+            "status = 'RUNNING', "
+            "attempts = attempts + 1, "
+            "locked_until = now() + make_interval(secs => %s) "
+        "WHERE id IN ("
+            "SELECT id FROM jobs "
+            "WHERE (status = 'PENDING' AND run_at <= now()) "
+            "OR (status = 'RUNNING' AND locked_until < now() AND attempts < max_attempts) "
+            "ORDER BY run_at "
+            "LIMIT %s "
+            "FOR UPDATE SKIP LOCKED"
+        ") "
+        "RETURNING id, name, args, attempts, max_attempts;"
+    )
+
+
+@prepared
+def delete_job_query() -> LiteralString:
+    # 'attempts' fences off workers whose job was claimed again after their lock expired
+    return "DELETE FROM jobs WHERE id = %s AND attempts = %s AND status = 'RUNNING'"
+
+
+@prepared
+def retry_job_query() -> LiteralString:
+    return (
+        "UPDATE jobs SET "
+            "status = CASE WHEN attempts >= max_attempts THEN 'FAILED' ELSE 'PENDING' END, "
+            "run_at = now() + make_interval(secs => %s), "
+            "locked_until = NULL, "
+            "last_error = %s, "
+            # A new job with the same key may have been enqueued while this one ran
+            "dedupe_key = NULL "
+        "WHERE id = %s AND attempts = %s AND status = 'RUNNING'"
+    )
+
+
+@prepared
+def fail_expired_jobs_query() -> LiteralString:
+    return (
+        "UPDATE jobs SET status = 'FAILED', locked_until = NULL, last_error = 'Lock expired' "
+        "WHERE status = 'RUNNING' AND locked_until < now() AND attempts >= max_attempts"
+    )
+
+
+@prepared
+def insert_applicant_event_query() -> LiteralString:
+    # The counts are taken before the insert
+    return (
+        "WITH inserted AS ("
+            "INSERT INTO applicant_events (company_id, offer_id, is_new_applicant) "
+            "SELECT company_id, id, %s FROM offers WHERE id = %s AND company_id IS NOT NULL "
+            "RETURNING company_id"
+        ") "
+        "SELECT "
+            "i.company_id, "
+            "("
+                "SELECT count(*) FROM applicant_events e "
+                "WHERE e.company_id = i.company_id AND e.created_at > now() - make_interval(secs => %s)"
+            ") AS recent_events, "
+            "("
+                "SELECT count(*) FROM applicant_events e "
+                "WHERE e.company_id = i.company_id AND e.sent_at IS NULL"
+            ") AS pending_events "
+        "FROM inserted i;"
+    )
+
+
+@prepared
+def flush_applicant_events_query() -> LiteralString:
+    return (
+        "WITH flushed AS ("
+            "UPDATE applicant_events SET sent_at = now() "
+            "WHERE id IN ("
+                "SELECT id FROM applicant_events "
+                "WHERE company_id = %s AND sent_at IS NULL "
+                "ORDER BY id LIMIT %s "
+                "FOR UPDATE SKIP LOCKED"
+            ") "
+            "RETURNING offer_id, is_new_applicant"
+        ") "
+        "SELECT "
+            "c.email, o.field, "
+            "count(*) FILTER (WHERE f.is_new_applicant) AS new_applicants, "
+            "count(*) FILTER (WHERE NOT f.is_new_applicant) AS cancellations "
+        "FROM flushed f "
+        "JOIN offers o ON o.id = f.offer_id "
+        "JOIN companies c ON c.id = o.company_id "
+        "GROUP BY o.id, o.field, c.email "
+        "ORDER BY o.id;"
+    )
+
+
+@prepared
+def delete_sent_applicant_events_query() -> LiteralString:
+    return (
+        "DELETE FROM applicant_events "
+        "WHERE company_id = %s AND sent_at < now() - make_interval(secs => %s)"
+    )
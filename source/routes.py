@@ -1,10 +1,4 @@
 from typing import Annotated, Optional
-from source.notifications import (
-    notify_company_applicants_change, 
-    notify_student_application_status_change,
-    notify_students_application_status_change, 
-    send_email_profile_created,
-)
 from .controllers import (
     applicants_get_controller,
     application_accept_controller,
@@ -25,6 +19,7 @@ from .controllers import (
     motivational_letter_put_controller,
     offer_delete_controller,
     offer_file_post_controller,
+    offers_bulk_post_controller,
     offer_put_controller,
     profile_picture_delete_controller,
     profile_picture_post_controller,
@@ -51,7 +46,10 @@ from .controllers import (
     student_report_put_controller,
     student_report_delete_controller,
 )
-from .security import get_current_user, Token
+from .security import get_current_user, get_current_principal, Token
+from .cache import caches_stats, clear_caches
+from .statements import registry
+from .pagination import PAGE_SIZE
 from .schemas import (
     CompanyReport,
     StudentCreate,
@@ -59,6 +57,7 @@ from .schemas import (
     CompanyCreate,
     CompanyUpdate,
     OfferCreate,
+    OfferImportResult,
     OfferRead,
     OfferUpdate,
     ExperienceCreate,
@@ -67,8 +66,8 @@ from .schemas import (
     MotivationalLetter,
     StudentReport,
 )
-from .enums import MAX_CREDITS, MAX_GPA, MIN_CREDITS, MIN_GPA, Status, Environment
-from fastapi import APIRouter, BackgroundTasks, File, Form, UploadFile, status, Depends, Request
+from .enums import MAX_CREDITS, MAX_GPA, MIN_CREDITS, MIN_GPA, Environment
+from fastapi import APIRouter, File, Form, UploadFile, status, Depends, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
@@ -84,6 +83,25 @@ async def test():
     return {"message": "This is a test message."}
 
 
+if getenv(Environment.METRICS) == Environment.TRUE:
+    # Cache keys and SQL statement names are internal, so the metrics
+    # routes are only mounted when enabled, and only for signed-in users.
+    @router.get("/metrics/caches")
+    async def caches_metrics(_ = Depends(get_current_principal)):
+        return caches_stats()
+
+    @router.get("/metrics/statements")
+    async def statements_metrics(_ = Depends(get_current_principal)):
+        return registry.stats()
+
+
+if getenv(Environment.TESTING) == Environment.TRUE:
+    @router.delete("/caches", status_code=status.HTTP_204_NO_CONTENT)
+    async def caches_delete():
+        """ The tests reset the database directly, bypassing cache invalidation. """
+        clear_caches()
+
+
 # Routes for TOKENS
 
 
@@ -96,23 +114,20 @@ async def token(user_type_param: str, form_data: OAuth2PasswordRequestForm = Dep
 
 
 @router.post("/students", status_code=status.HTTP_201_CREATED)
-async def student_post(s: StudentCreate, background_tasks: BackgroundTasks):
+async def student_post(s: StudentCreate):
     await student_post_controller(s)
-    if getenv(Environment.TESTING) == Environment.TRUE:
-        return
-    background_tasks.add_task(send_email_profile_created, s.email, s.name)
 
 
 @router.put("/students/{student_id}")
 async def student_put(
     student_id: int, s: StudentUpdate, 
-    current_user = Depends(get_current_user),
+    current_user = Depends(get_current_principal),
 ):
     await student_put_controller(student_id, s, current_user)
 
 
 @router.delete("/students/{student_id}")
-async def student_delete(student_id: int, current_user = Depends(get_current_user)):
+async def student_delete(student_id: int, current_user = Depends(get_current_principal)):
     await student_delete_controller(student_id, current_user)
 
 
@@ -138,7 +153,7 @@ async def students_home_get(request: Request, current_user = Depends(get_current
 async def student_profile_edit_get(
     request: Request, 
     student_id: int, 
-    _ = Depends(get_current_user)
+    _ = Depends(get_current_principal)
 ):
     student_profile = await student_profile_get_controller(student_id)
     return templates.TemplateResponse(
@@ -151,11 +166,8 @@ async def student_profile_edit_get(
 
 
 @router.post("/companies", status_code=status.HTTP_201_CREATED)
-async def company_post(c: CompanyCreate, background_tasks: BackgroundTasks):
+async def company_post(c: CompanyCreate):
     await company_post_controller(c)
-    if getenv(Environment.TESTING) == Environment.TRUE:
-        return
-    background_tasks.add_task(send_email_profile_created, c.email, c.name)
 
 
 @router.get("/companies/{company_id}", response_class=HTMLResponse)
@@ -168,11 +180,22 @@ async def company_get(request: Request, company_id: int, current_user = Depends(
 
 
 @router.get("/companies/{company_id}/offers", response_model=list[OfferRead])
-async def company_offers_get(request: Request, company_id: int, current_user = Depends(get_current_user)):
-    offers = await company_offers_get_controller(company_id)
+async def company_offers_get(
+    request: Request,
+    company_id: int,
+    after: str | None = None,
+    limit: int = PAGE_SIZE,
+    current_user = Depends(get_current_user),
+):
+    page = await company_offers_get_controller(company_id, after, limit)
     return templates.TemplateResponse(
        name = "offers.html",
-       context = {"request": request, "offers": offers, "current_user": current_user}
+       context = {
+           "request": request,
+           "offers": page.items,
+           "next_cursor": page.next_cursor,
+           "current_user": current_user,
+        }
     )
 
 
@@ -186,12 +209,12 @@ async def company_edit_get(request: Request, company_id: int):
 
 
 @router.put("/companies/{company_id}")
-async def company_put(company_id: int, c: CompanyUpdate, current_user = Depends(get_current_user)):
+async def company_put(company_id: int, c: CompanyUpdate, current_user = Depends(get_current_principal)):
     await company_put_controller(company_id, c, current_user)
 
 
 @router.delete("/companies/{company_id}")
-async def company_delete(company_id: int, current_user = Depends(get_current_user)):
+async def company_delete(company_id: int, current_user = Depends(get_current_principal)):
     await company_delete_controller(company_id, current_user)
 
 
@@ -209,7 +232,7 @@ async def offer_create_get(request: Request):
 
 
 @router.post("/offers", status_code=status.HTTP_201_CREATED)
-async def offer_post(offer: OfferCreate, current_user = Depends(get_current_user)):
+async def offer_post(offer: OfferCreate, current_user = Depends(get_current_principal)):
     """
     Create a new offer via form fields. 
     Companies can create offers only for themselves.
@@ -219,43 +242,69 @@ async def offer_post(offer: OfferCreate, current_user = Depends(get_current_user
 
 @router.post("/offers/file", status_code=status.HTTP_201_CREATED, tags=["testing"])
 async def offer_file_post(
-    offer_file_bytes: Annotated[bytes, File()], 
+    offer_file_bytes: UploadFile,
     company_id: Annotated[int, Form()],
-    current_user = Depends(get_current_user),
+    current_user = Depends(get_current_principal),
 ):
     """
-    Create a new offer via an uploaded file.
+    Create a new offer via an uploaded PDF, text or Markdown file.
     Only companies can create offers - for themselves.
     """
     await offer_file_post_controller(offer_file_bytes, company_id, current_user)
 
 
+@router.post("/offers/bulk", tags=["testing"])
+async def offers_bulk_post(
+    offers_file_bytes: Annotated[bytes, File()],
+    company_id: Annotated[int, Form()],
+    current_user = Depends(get_current_principal),
+) -> list[OfferImportResult]:
+    """
+    Create offers from a ZIP archive of offer files, or from a CSV
+    file with the columns: salary, num_weeks, field, deadline,
+    region, requirements, responsibilities.
+    Returns the result of each file (or row) - the created offer,
+    or why it was skipped. Only companies can create offers - for themselves.
+    """
+    return await offers_bulk_post_controller(offers_file_bytes, company_id, current_user)
+
+
 @router.get("/offers", response_class=HTMLResponse)
 async def offers_get(
     request: Request,
     field: str | None = None,
+    search: str | None = None,
     min_num_weeks: int = 0,
     max_num_weeks: int = 1000,
     min_salary: int = 0,
     max_salary: int = 1_000_000_000,
+    after: str | None = None,
+    limit: int = PAGE_SIZE,
     current_user = Depends(get_current_user)
 ):
     """ 
-    Returns all offers that satisfy the given query parameters 
+    Returns all offers that satisfy the given query parameters.
+    The 'search' parameter is a full-text search over the field,
+    requirements and responsibilities, ordered by relevance.
+    Results are paginated - 'after' is the cursor of the next page.
     """
-    offers = await offers_get_controller(
+    page = await offers_get_controller(
         field, 
+        search,
         min_num_weeks, 
         max_num_weeks, 
         min_salary, 
         max_salary,
+        after,
+        limit,
         current_user,
     )
     return templates.TemplateResponse(
         name = "offers.html", 
         context = {
             "request": request, 
-            "offers": offers, 
+            "offers": page.items, 
+            "next_cursor": page.next_cursor,
             "current_user": current_user,
         },
     )
@@ -284,7 +333,7 @@ async def offer_edit_get(request: Request, offer_id: int):
 
 
 @router.put("/offers/{offer_id}")
-async def offer_put(offer_id: int, o: OfferUpdate, current_user = Depends(get_current_user)):
+async def offer_put(offer_id: int, o: OfferUpdate, current_user = Depends(get_current_principal)):
     """
     Update a given offer. Only offer-owners are authorized.
     """
@@ -292,7 +341,7 @@ async def offer_put(offer_id: int, o: OfferUpdate, current_user = Depends(get_cu
 
 
 @router.delete("/offers/{offer_id}")
-async def offer_delete(offer_id: int, current_user = Depends(get_current_user)):
+async def offer_delete(offer_id: int, current_user = Depends(get_current_principal)):
     """
     Delete a given offer. Only offer-owners are authorized.
     """
@@ -303,7 +352,7 @@ async def offer_delete(offer_id: int, current_user = Depends(get_current_user)):
 
 
 @router.post("/experiences", status_code=status.HTTP_201_CREATED)
-async def experience_post(e: ExperienceCreate, current_user = Depends(get_current_user)):
+async def experience_post(e: ExperienceCreate, current_user = Depends(get_current_principal)):
     """ 
     Create a new experience item. Students can 
     only create experience items for themselves. 
@@ -312,7 +361,7 @@ async def experience_post(e: ExperienceCreate, current_user = Depends(get_curren
 
 
 @router.put("/experiences/{experience_id}")
-async def experience_patch(experience_id: int, s: ExperienceUpdate, current_user = Depends(get_current_user)):
+async def experience_patch(experience_id: int, s: ExperienceUpdate, current_user = Depends(get_current_principal)):
     """
     Update a given experience item. Only student-owners of the experience are allowed.
     """
@@ -320,7 +369,7 @@ async def experience_patch(experience_id: int, s: ExperienceUpdate, current_user
 
 
 @router.delete("/experiences/{experience_id}")
-async def experience_delete(experience_id: int, current_user = Depends(get_current_user)):
+async def experience_delete(experience_id: int, current_user = Depends(get_current_principal)):
     """
     Delete a given experience item. Only student-owners of the experience are allowed.
     """
@@ -331,7 +380,7 @@ async def experience_delete(experience_id: int, current_user = Depends(get_curre
 
 
 @router.post("/subjects", status_code=status.HTTP_201_CREATED)
-async def subject_post(s: Subject, current_user = Depends(get_current_user)):
+async def subject_post(s: Subject, current_user = Depends(get_current_principal)):
     """
     Create a new subject entry for the currently logged in student.
     """
@@ -339,7 +388,7 @@ async def subject_post(s: Subject, current_user = Depends(get_current_user)):
 
 
 @router.put("/subjects/{student_id}/{name}")
-async def subject_patch(student_id: int, name: str, subject: Subject, current_user = Depends(get_current_user)):
+async def subject_patch(student_id: int, name: str, subject: Subject, current_user = Depends(get_current_principal)):
     """
     Update a given subject entry. Only student-owners of the experience are authorized.
     """
@@ -347,7 +396,7 @@ async def subject_patch(student_id: int, name: str, subject: Subject, current_us
 
 
 @router.delete("/subjects/{student_id}/{name}")
-async def subject_delete(student_id: int, name: str, current_user = Depends(get_current_user)):
+async def subject_delete(student_id: int, name: str, current_user = Depends(get_current_principal)):
     """
     Delete a subject entry. Only the student owner is authorized.
     """
@@ -361,20 +410,13 @@ async def subject_delete(student_id: int, name: str, current_user = Depends(get_
 async def application_post(
     student_id: int, 
     offer_id: int, 
-    background_tasks: BackgroundTasks,
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_principal)
 ):
     """
     Add an application from the student for the given offer. Students 
     will be authorized to create applications for themselves only.
     """
     await application_post_controller(student_id, offer_id, current_user)
-    
-    if getenv(Environment.TESTING) == Environment.TRUE:
-        return
-    
-    is_new_applicant = True
-    background_tasks.add_task(notify_company_applicants_change, offer_id, is_new_applicant)
 
 
 @router.get(
@@ -382,15 +424,25 @@ async def application_post(
     response_class=HTMLResponse,
     tags=["applications"],
 )
-async def applications_get(request: Request, student_id: int, current_user = Depends(get_current_user)):
+async def applications_get(
+    request: Request,
+    student_id: int,
+    after: str | None = None,
+    limit: int = PAGE_SIZE,
+    current_user = Depends(get_current_principal),
+):
     """
     Get all applications of a given student. Only the 
     student-owner can access his applications.
     """
-    applications = await applications_get_controller(student_id, current_user)
+    page = await applications_get_controller(student_id, after, limit, current_user)
     return templates.TemplateResponse(
         name = "applications.html", 
-        context = {"request": request, "applications": applications}, 
+        context = {
+            "request": request,
+            "applications": page.items,
+            "next_cursor": page.next_cursor,
+        }, 
         headers = {"Content-Type": "text/html"},
     )
 
@@ -399,64 +451,28 @@ async def applications_get(request: Request, student_id: int, current_user = Dep
 async def application_accept(
     student_id: int, 
     offer_id: int,
-    background_tasks: BackgroundTasks,
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_principal)
 ):
     """
     If a student has status - waiting for a given application,
     set his his status to - accepted. Change all other applications
     to status - rejected.
     """
-    results = await application_accept_controller(student_id, offer_id, current_user)
-
-    if getenv(Environment.TESTING) == Environment.TRUE:
-        return
-    
-    background_tasks.add_task(
-        notify_student_application_status_change, 
-        results["accepted_student_id"], 
-        offer_id, 
-        Status.ACCEPTED
-    )
-    
-    background_tasks.add_task(
-        notify_students_application_status_change,
-        results["rejected_student_ids"],
-        offer_id,
-        Status.REJECTED,
-    )
+    await application_accept_controller(student_id, offer_id, current_user)
 
 
 @router.delete("/applications/cancel/{student_id}/{offer_id}")
 async def application_cancel(
     student_id: int, 
     offer_id: int,
-    background_tasks: BackgroundTasks,
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_principal)
 ):
     """
     If a student is still waiting for his application, simply delete his application.
     If the student's application has been accepted, then delete his application and
     reset all other applications (for the same offer) to status - waiting.
     """
-    updated_student_ids = await application_cancel_controller(student_id, offer_id, current_user)
-
-    if getenv(Environment.TESTING) == Environment.TRUE:
-        return
-    
-    is_new_applicant = False
-    background_tasks.add_task(
-        notify_company_applicants_change, 
-        offer_id, 
-        is_new_applicant
-    )
-    
-    background_tasks.add_task(
-        notify_students_application_status_change, 
-        updated_student_ids,
-        offer_id,
-        Status.WAITING,
-    )
+    await application_cancel_controller(student_id, offer_id, current_user)
 
 
 @router.get("/applications/applicants/{offer_id}")
@@ -469,13 +485,15 @@ async def applicants_get(
     min_credits: int = MIN_CREDITS,
     max_credits: int = MAX_CREDITS,
     subjects: Optional[str] = None,
-    current_user = Depends(get_current_user)
+    after: Optional[str] = None,
+    limit: int = PAGE_SIZE,
+    current_user = Depends(get_current_principal)
 ):
     """
     Get all student-applicants that have applied for the given offer.
     Return a subset of applicants if filter parameters are provided.
     """
-    students = await applicants_get_controller(
+    page = await applicants_get_controller(
         offer_id, 
         university,
         min_gpa,
@@ -483,11 +501,18 @@ async def applicants_get(
         min_credits,
         max_credits,
         subjects,
+        after,
+        limit,
         current_user,
     )
     return templates.TemplateResponse(
         name = "applicants.html",
-        context = {"request": request, "students": students, "offer_id": offer_id},
+        context = {
+            "request": request,
+            "students": page.items,
+            "next_cursor": page.next_cursor,
+            "offer_id": offer_id,
+        },
         headers = {"Content-Type": "text/html"}
     )
 
@@ -496,7 +521,7 @@ async def applicants_get(
 async def start_offer(
     student_id: int, 
     offer_id: int, 
-    current_user = Depends(get_current_user),
+    current_user = Depends(get_current_principal),
 ):
     await start_offer_controller(student_id, offer_id, current_user)
 
@@ -505,7 +530,7 @@ async def start_offer(
 async def complete_offer(
     student_id: int, 
     offer_id: int, 
-    current_user = Depends(get_current_user),
+    current_user = Depends(get_current_principal),
 ):
     await complete_offer_controller(student_id, offer_id, current_user)
     
@@ -542,17 +567,17 @@ async def log_in_get(request: Request):
 
 
 @router.post("/students/motivational-letter", status_code=status.HTTP_201_CREATED)
-async def motivational_letter_post(motivational_letter: MotivationalLetter, current_user = Depends(get_current_user)):
+async def motivational_letter_post(motivational_letter: MotivationalLetter, current_user = Depends(get_current_principal)):
     await motivational_letter_post_controller(motivational_letter, current_user)
 
 
 @router.put("/students/motivational-letter/{student_id}")
-async def motivational_letter_put(motivational_letter: MotivationalLetter, current_user = Depends(get_current_user)):
+async def motivational_letter_put(motivational_letter: MotivationalLetter, current_user = Depends(get_current_principal)):
     await motivational_letter_put_controller(motivational_letter, current_user)
 
 
 @router.delete("/students/motivational-letter/{student_id}")
-async def motivational_letter_delete(student_id: int, current_user = Depends(get_current_user)):
+async def motivational_letter_delete(student_id: int, current_user = Depends(get_current_principal)):
     await motivational_letter_delete_controller(student_id, current_user)
 
 
@@ -562,7 +587,7 @@ async def motivational_letter_delete(student_id: int, current_user = Depends(get
 @router.post("/student-reports", status_code=status.HTTP_201_CREATED)
 async def student_report_post(
     student_report: StudentReport, 
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_principal)
 ):
     await student_report_post_controller(student_report, current_user)
 
@@ -570,7 +595,7 @@ async def student_report_post(
 @router.put("/student-reports")
 async def student_report_put(
     student_report: StudentReport, 
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_principal)
 ):
     await student_report_put_controller(student_report, current_user)
 
@@ -579,7 +604,7 @@ async def student_report_put(
 async def student_report_delete(
     student_id: int, 
     offer_id: int, 
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_principal)
 ):
     await student_report_delete_controller(student_id, offer_id, current_user)
 
@@ -616,17 +641,17 @@ async def student_report_get(request: Request, student_id: int, offer_id: int, c
 
 
 @router.post("/company-reports", status_code=status.HTTP_201_CREATED)
-async def company_report_post(company_report: CompanyReport, current_user = Depends(get_current_user)):
+async def company_report_post(company_report: CompanyReport, current_user = Depends(get_current_principal)):
     await company_report_post_controller(company_report, current_user)
 
 
 @router.put("/company-reports", status_code=status.HTTP_201_CREATED)
-async def company_report_put(company_report: CompanyReport, current_user = Depends(get_current_user)):
+async def company_report_put(company_report: CompanyReport, current_user = Depends(get_current_principal)):
     await company_report_put_controller(company_report, current_user)
 
 
 @router.delete("/company-reports/{student_id}/{offer_id}")
-async def company_report_delete(student_id: int, offer_id: int, current_user = Depends(get_current_user)):
+async def company_report_delete(student_id: int, offer_id: int, current_user = Depends(get_current_principal)):
     await company_report_delete_controller(student_id, offer_id, current_user)
 
 
@@ -653,15 +678,15 @@ async def company_report_edit_get(student_id: int, offer_id: int, request: Reque
 
 
 @router.post("/profile-picture", status_code=status.HTTP_201_CREATED)
-async def profile_picture_post(picture: UploadFile, current_user = Depends(get_current_user)):
+async def profile_picture_post(picture: UploadFile, current_user = Depends(get_current_principal)):
     await profile_picture_post_controller(picture, current_user)
 
 
 @router.put("/profile-picture")
-async def profile_picture_put(picture: UploadFile, current_user = Depends(get_current_user)):
+async def profile_picture_put(picture: UploadFile, current_user = Depends(get_current_principal)):
     await profile_picture_put_controller(picture, current_user)
 
 
 @router.delete("/profile-picture")
-async def profile_picture_delete(current_user = Depends(get_current_user)):
+async def profile_picture_delete(current_user = Depends(get_current_principal)):
     await profile_picture_delete_controller(current_user)
\ No newline at end of file
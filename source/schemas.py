@@ -1,5 +1,5 @@
-from typing import Optional
-from .enums import Status
+from typing import Generic, Optional, TypeVar
+from .enums import Status, UserType
 from pydantic import BaseModel
 from datetime import date
 
@@ -44,6 +44,8 @@ class StudentRead(StudentBase):
     region_name: str
     motivational_letter: MotivationalLetterRead
     profile_picture_path: Optional  [str]
+    profile_picture_thumbnail_path: Optional[str] = None
+    profile_picture_medium_path: Optional[str] = None
 
 
 class StudentUpdate(StudentBase):
@@ -97,6 +99,8 @@ class CompanyCreate(CompanyBase):
 class CompanyRead(CompanyBase):
     id: int
     profile_picture_path: Optional[str]
+    profile_picture_thumbnail_path: Optional[str] = None
+    profile_picture_medium_path: Optional[str] = None
 
 
 class CompanyUpdate(CompanyBase):
@@ -112,6 +116,27 @@ class CompanyProfile(CompanyRead):
     reports: list[CompanyReportDisplay]
 
 
+# PRINCIPAL SCHEMAS
+
+
+class Principal(BaseModel):
+    """
+    The authenticated user, reduced to what is
+    needed for authorization checks. Can be built
+    from the JWT claims alone, without a DB query.
+    """
+    id: int
+    email: str
+    type: UserType
+    region_id: Optional[int] = None
+
+    @classmethod
+    def from_user(cls, user: StudentInDB | CompanyInDB) -> "Principal":
+        if isinstance(user, StudentInDB):
+            return cls(id=user.id, email=user.email, type=UserType.STUDENT, region_id=user.region_id)
+        return cls(id=user.id, email=user.email, type=UserType.COMPANY)
+
+
 # OFFER SCHEMAS
 
 
@@ -147,6 +172,7 @@ class OfferBriefRead(BaseModel):
     deadline: date
     company_name: str
     region: str
+    rank: Optional[float] = None
 
 
 class OfferApplication(BaseModel):
@@ -158,6 +184,12 @@ class OfferApplication(BaseModel):
     offer_id: int
 
 
+class OfferImportResult(BaseModel):
+    file: str
+    offer_id: Optional[int] = None
+    error: Optional[str] = None
+
+
 # EXPERIENCE SCHEMAS
 
 
@@ -250,4 +282,15 @@ class StudentProfileUpdate(StudentUpdate):
 
 class ApplicantRead(StudentBase):
     id: int
-    status: str
\ No newline at end of file
+    status: str
+
+
+# PAGINATION SCHEMAS
+
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    items: list[T]
+    next_cursor: Optional[str] = None
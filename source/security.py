@@ -1,12 +1,15 @@
-from .enums import UserType
+from .enums import UserType, Environment, Tables
+from .cache import LRUCache
+from .invalidation import register_invalidator
 from .database import async_pool
-from .utils import pwd_context
-from .schemas import StudentInDB, CompanyInDB
+from .queries import select_user_by_email_query
+from .passwords import verify_password
+from .schemas import StudentInDB, CompanyInDB, Principal
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from pydantic import BaseModel
 from fastapi.security import OAuth2PasswordBearer
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, Request, status, Depends
 from psycopg.rows import class_row
 from dotenv import load_dotenv
 from os import getenv
@@ -18,6 +21,21 @@ SECRET_KEY = getenv("SECRET_KEY", "")
 ALGORITHM = "HS256"
 TOKEN_EXPIRE_MINUTES = 30
 
+"""
+Opt-in. Embeds the user id and region id in the JWT token,
+so that 'get_current_principal' does not query the DB for
+read-only requests. Writes still check that the user exists.
+"""
+SELF_CONTAINED_TOKENS = getenv(Environment.SELF_CONTAINED_TOKENS) == Environment.TRUE
+
+""" Requests that may be authorized from the token claims alone """
+READ_ONLY_METHODS = ("GET", "HEAD", "OPTIONS")
+
+""" Authenticated users are cached per email, to avoid a DB query on every request """
+PRINCIPAL_CACHE_SIZE = 1024
+PRINCIPAL_CACHE_TTL_SECONDS = 60
+principal_cache = LRUCache("principals", PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL_SECONDS)
+
 """
 Used as a dependency to extract the JWT token 
 from the 'Authorization' header. Will supply the 
@@ -43,6 +61,8 @@ class TokenData(BaseModel):
     sub: str | None = None
     exp: datetime | None = None
     type: str
+    id: int | None = None
+    region_id: int | None = None
 
 
 def create_token(data: TokenData, expires_delta: timedelta) -> str:
@@ -52,26 +72,53 @@ def create_token(data: TokenData, expires_delta: timedelta) -> str:
     """
     expiration_time = datetime.utcnow() + expires_delta
     data.exp = expiration_time
-    data_dict = data.model_dump()
+    data_dict = data.model_dump(exclude_none=True)
     encoded_jwt = jwt.encode(data_dict, SECRET_KEY, ALGORITHM)
     return encoded_jwt
 
 
 async def get_user_by_email(email: str, user_type: UserType) -> StudentInDB | CompanyInDB | None:
     if user_type == UserType.STUDENT:
-        table_name = "students"
         schema = StudentInDB
     elif user_type == UserType.COMPANY:
-        table_name = "companies"
         schema = CompanyInDB
 
     pool = async_pool()
     
     async with pool.connection() as conn, conn.cursor(row_factory=class_row(schema)) as cur:
-        sql = f"SELECT * FROM {table_name} WHERE email = %s"
+        sql = select_user_by_email_query(user_type)
         await cur.execute(sql, [email])
         user_in_db = await cur.fetchone()
+
+    if user_in_db is not None:
+        principal_cache.set((user_type, email), user_in_db)
+
+    return user_in_db
+
+
+async def get_cached_user_by_email(email: str, user_type: UserType) -> StudentInDB | CompanyInDB | None:
+    """
+    Same as 'get_user_by_email', but returns the cached
+    user if present. Only used for already authenticated
+    requests - logging in always reads from the DB.
+    """
+    user_in_db = principal_cache.get((user_type, email))
+    if user_in_db is not None:
         return user_in_db
+    return await get_user_by_email(email, user_type)
+
+
+def invalidate_cached_user(email: str, user_type: UserType) -> None:
+    """
+    Must be called whenever a user row is updated or
+    deleted, so that stale users are not authenticated.
+    """
+    principal_cache.invalidate((user_type, email))
+
+
+""" Users written by other workers, notified by email """
+register_invalidator(Tables.STUDENTS, lambda email: invalidate_cached_user(email, UserType.STUDENT))
+register_invalidator(Tables.COMPANIES, lambda email: invalidate_cached_user(email, UserType.COMPANY))
 
 
 async def authenticate_user(email: str, password: str, user_type: UserType) -> StudentInDB | CompanyInDB | None:
@@ -85,7 +132,7 @@ async def authenticate_user(email: str, password: str, user_type: UserType) -> S
     
     if not user_in_db:
         return None
-    if not pwd_context.verify(password, user_in_db.hashed_password):
+    if not await verify_password(password, user_in_db.hashed_password):
         return None
 
     return user_in_db
@@ -108,8 +155,14 @@ async def get_token(email: str, password: str, user_type: UserType) -> Token:
 
     token_expiration_delta = timedelta(minutes=TOKEN_EXPIRE_MINUTES)
 
+    token_data = TokenData(sub=email, type=user_type.value)
+
+    if SELF_CONTAINED_TOKENS:
+        token_data.id = user_in_db.id
+        token_data.region_id = getattr(user_in_db, "region_id", None)
+
     token = create_token(
-        data=TokenData(sub=email, type=user_type.value),
+        data=token_data,
         expires_delta=token_expiration_delta,
     )
 
@@ -123,6 +176,21 @@ CREDENTIALS_EXCEPTION = HTTPException(
 )
 
 
+def decode_token(token: str) -> dict:
+    """
+    Helper function. Checks token validity and returns
+    the token payload. Raises exception otherwise.
+    """
+    try:
+        payload: dict = jwt.decode(token, SECRET_KEY, [ALGORITHM])
+        if payload.get("sub") is None or payload.get("type") is None:
+            raise CREDENTIALS_EXCEPTION
+    except JWTError:
+        raise CREDENTIALS_EXCEPTION
+
+    return payload
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> StudentInDB | CompanyInDB:
     """
     Used as a dependency. Requires a valid JWT token
@@ -131,33 +199,89 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> StudentInDB |
     user associated with the token. Raises exception
     otherwise.
     """
-    try:
-        payload: dict = jwt.decode(token, SECRET_KEY, [ALGORITHM])
-        email: str | None = payload.get("sub")
-        user_type = payload.get("type")
-        if email is None or user_type is None:
-            raise CREDENTIALS_EXCEPTION
-    except JWTError:
+    payload = decode_token(token)
+    user_type = UserType(payload["type"])
+    user_in_db = await get_cached_user_by_email(payload["sub"], user_type)
+
+    if user_in_db is None:
         raise CREDENTIALS_EXCEPTION
 
-    user_type = UserType(user_type)
-    user_in_db = await get_user_by_email(email, user_type)
+    return user_in_db
+
+
+async def get_current_principal(request: Request, token: str = Depends(oauth2_scheme)) -> Principal:
+    """
+    Used as a dependency, instead of 'get_current_user', by
+    routes that only need the id and type of the user. If
+    the token carries the user id, read-only requests do not
+    query the DB. Writes always load the (cached) user, so a
+    deleted user's token is rejected and the region is current.
+    """
+    payload = decode_token(token)
+    user_type = UserType(payload["type"])
+
+    if payload.get("id") is not None and request.method in READ_ONLY_METHODS:
+        return Principal(
+            id=payload["id"],
+            email=payload["sub"],
+            type=user_type,
+            region_id=payload.get("region_id"),
+        )
+
+    user_in_db = await get_cached_user_by_email(payload["sub"], user_type)
 
     if user_in_db is None:
         raise CREDENTIALS_EXCEPTION
 
-    return user_in_db
+    return Principal.from_user(user_in_db)
+
+
+""" The user type that every user schema corresponds to """
+SCHEMA_USER_TYPES = {
+    StudentInDB: UserType.STUDENT,
+    CompanyInDB: UserType.COMPANY,
+}
 
 
-def authorize_user(user_id: int, current_user: StudentInDB | CompanyInDB, Schema) -> None:
+def is_user_type(current_user: StudentInDB | CompanyInDB | Principal, Schema) -> bool:
+    if isinstance(current_user, Principal):
+        return current_user.type == SCHEMA_USER_TYPES[Schema]
+    return type(current_user) is Schema
+
+
+def authorize_user(user_id: int, current_user: StudentInDB | CompanyInDB | Principal, Schema) -> None:
     """ 
     Checks if the given user-id matches the provided user 
     and if the user if of correct type. If not, raises a 403 exception. 
     """
     is_invalid_user = current_user.id != user_id
-    is_invalid_user_type = type(current_user) is not Schema
+    is_invalid_user_type = not is_user_type(current_user, Schema)
     if is_invalid_user_type or is_invalid_user:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not authorize user",
-        )
\ No newline at end of file
+        )
+
+
+def owner_id_of(current_user: StudentInDB | CompanyInDB | Principal, Schema) -> int | None:
+    """
+    The id to match against the owner of a row in a
+    guarded write. None (matches no owner) if the user
+    is not of the correct type.
+    """
+    return current_user.id if is_user_type(current_user, Schema) else None
+
+
+def authorize_owned_write(record: dict | None, not_found_detail: str | None = None) -> None:
+    """
+    Checks the result of a guarded write. Raises a 404 exception
+    if the target row does not exist, or a 403 exception if it
+    is not owned by the user (in which case nothing was written).
+    """
+    if record is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail=not_found_detail)
+    if not record["is_owner"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not authorize user",
+        )
@@ -0,0 +1,111 @@
+from collections import Counter
+from functools import wraps
+from psycopg import AsyncConnection, AsyncCursor
+
+
+class Statement(str):
+    """
+    The SQL text returned by a registered query function,
+    tagged with the name of the function that built it.
+    """
+    name: str
+
+    def __new__(cls, text: str, name: str) -> "Statement":
+        statement = super().__new__(cls, text)
+        statement.name = name
+        return statement
+
+
+class StatementRegistry:
+    """
+    Keeps track of the named query functions. Their statements
+    are prepared server-side on the first execution on every
+    connection, instead of after psycopg's default threshold.
+    Executions that reuse a statement already prepared on their
+    connection are counted separately from the ones that prepare it.
+    """
+
+    def __init__(self) -> None:
+        self.functions: dict[str, object] = {}
+        self.executions: Counter[str] = Counter()
+        self.prepares: Counter[str] = Counter()
+        self.reuses: Counter[str] = Counter()
+
+    def register(self, function):
+        name = function.__name__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            result = function(*args, **kwargs)
+            # Query builders return the query together with its parameters
+            if isinstance(result, tuple):
+                query, params = result
+                return Statement(query, name), params
+            return Statement(result, name)
+
+        self.functions[name] = wrapper
+        return wrapper
+
+    def record(self, statement: Statement, prepared: bool | None) -> None:
+        """ 'prepared' is None for executions that were not prepared at all """
+        self.executions[statement.name] += 1
+        if prepared is True:
+            self.prepares[statement.name] += 1
+        elif prepared is False:
+            self.reuses[statement.name] += 1
+
+    def stats(self) -> dict:
+        num_prepares = sum(self.prepares.values())
+        num_reuses = sum(self.reuses.values())
+        num_prepared_executions = num_prepares + num_reuses
+        return {
+            "registered": len(self.functions),
+            "executions": dict(self.executions.most_common()),
+            "prepares": dict(self.prepares.most_common()),
+            "reuses": dict(self.reuses.most_common()),
+            "reuse_ratio": num_reuses / num_prepared_executions if num_prepared_executions else 0.0,
+        }
+
+
+registry = StatementRegistry()
+
+""" Decorator for query functions whose statements should be prepared """
+prepared = registry.register
+
+
+class PreparingCursor(AsyncCursor):
+    """
+    Cursor that prepares registered statements
+    and counts their executions. Other queries
+    are executed as usual.
+    """
+
+    async def execute(self, query, params=None, *, prepare=None, binary=None):
+        if not isinstance(query, Statement):
+            return await super().execute(query, params, prepare=prepare, binary=binary)
+
+        if prepare is None:
+            prepare = True
+        # psycopg names each statement it prepares from a per-connection
+        # counter, so the counter only moves when the statement was not
+        # prepared on this connection yet (or was evicted or discarded).
+        # The counter is private - without it only executions are counted.
+        prepare_manager = getattr(self.connection, "_prepared", None)
+        prepared_idx = getattr(prepare_manager, "_prepared_idx", None)
+        try:
+            return await super().execute(query, params, prepare=prepare, binary=binary)
+        finally:
+            if prepare and prepared_idx is not None:
+                registry.record(query, prepare_manager._prepared_idx != prepared_idx)
+            else:
+                registry.record(query, None)
+
+
+""" Extra room in the per-connection prepared statement cache, for parameterized statement variants """
+PREPARED_MAX_MARGIN = 50
+
+
+async def configure_connection(connection: AsyncConnection) -> None:
+    """ Called by the pool for every new connection """
+    connection.cursor_factory = PreparingCursor
+    connection.prepared_max = len(registry.functions) + PREPARED_MAX_MARGIN
@@ -0,0 +1,97 @@
+"""
+Resized variants of the profile pictures, in WebP, so that pages do
+not load the full uploaded pictures. They are generated by a job (see
+source/jobs.py) after each upload, in a process pool of the worker.
+Until then - or if generating them fails - pages show the original.
+"""
+import os
+from .database import async_pool
+from .enums import Environment, UserType
+from .executors import BoundedExecutor, PROCESS
+from .jobs import job
+from .queries import update_profile_picture_variants_query
+from PIL import Image, ImageOps, UnidentifiedImageError
+from functools import lru_cache
+
+
+""" Name of each variant, with its size in pixels (pictures are cropped to a square) """
+PICTURE_VARIANTS = {
+    "thumbnail": 96,
+    "medium": 320,
+}
+PICTURE_VARIANT_FORMAT = "WEBP"
+PICTURE_VARIANT_QUALITY = 80
+""" Larger pictures are rejected by Pillow, as possible decompression bombs """
+PICTURE_MAX_PIXELS = 40_000_000
+
+
+@lru_cache()
+def picture_executor() -> BoundedExecutor:
+    return BoundedExecutor(
+        name="pictures",
+        kind=os.getenv(Environment.PICTURE_EXECUTOR, PROCESS),
+        max_workers=int(os.getenv(Environment.PICTURE_WORKERS, "2")),
+        max_queued=int(os.getenv(Environment.PICTURE_MAX_QUEUED, "32")),
+    )
+
+
+def picture_variant_path(picture_path: str, variant: str) -> str:
+    base_path, _ = os.path.splitext(picture_path)
+    return f"{base_path}_{variant}.webp"
+
+
+def picture_variant_paths(picture_path: str) -> dict[str, str]:
+    return {variant: picture_variant_path(picture_path, variant) for variant in PICTURE_VARIANTS}
+
+
+def create_picture_variants(picture_path: str) -> dict[str, str]:
+    """ Runs in the worker process """
+    Image.MAX_IMAGE_PIXELS = PICTURE_MAX_PIXELS
+    variant_paths = picture_variant_paths(picture_path)
+
+    with Image.open(picture_path) as picture:
+        picture = ImageOps.exif_transpose(picture)
+        picture = picture.convert("RGBA" if picture.mode in ("RGBA", "LA", "P") else "RGB")
+
+        for variant, size in PICTURE_VARIANTS.items():
+            variant_picture = ImageOps.fit(picture, (size, size), Image.Resampling.LANCZOS)
+            variant_path = variant_paths[variant]
+            temporary_path = f"{variant_path}.tmp"
+            variant_picture.save(temporary_path, PICTURE_VARIANT_FORMAT, quality=PICTURE_VARIANT_QUALITY)
+            os.replace(temporary_path, variant_path)
+
+    return variant_paths
+
+
+def delete_picture_variants(picture_path: str) -> None:
+    for variant_path in picture_variant_paths(picture_path).values():
+        try:
+            os.remove(variant_path)
+        except FileNotFoundError:
+            pass
+
+
+@job
+async def generate_profile_picture_variants(user_type: UserType | str, user_id: int, picture_path: str):
+    if not os.path.isfile(picture_path):
+        # The picture was replaced or deleted before the job ran
+        return
+
+    try:
+        variant_paths = await picture_executor().run(create_picture_variants, picture_path)
+    except (UnidentifiedImageError, Image.DecompressionBombError) as e:
+        # Retrying would not help - the pages keep showing the original
+        print(f"Could not create variants of {picture_path}: {e}")
+        return
+
+    async with async_pool().connection() as conn:
+        query = update_profile_picture_variants_query(UserType(user_type))
+        cur = await conn.execute(query, [
+            variant_paths["thumbnail"],
+            variant_paths["medium"],
+            user_id,
+            picture_path,
+        ])
+
+    if cur.rowcount == 0:
+        delete_picture_variants(picture_path)
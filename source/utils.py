@@ -1,6 +1,6 @@
 from passlib.context import CryptContext
 from .enums import UserType
-from .schemas import StudentInDB, CompanyInDB
+from .schemas import StudentInDB, CompanyInDB, Principal
 
 
 def extract_subjects_from(subjects_string: str) -> list[tuple[str, int]]:
@@ -18,7 +18,9 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 def extract_user_type(current_user) -> UserType:
-    if isinstance(current_user, StudentInDB):
+    if isinstance(current_user, Principal):
+        user_type = current_user.type
+    elif isinstance(current_user, StudentInDB):
         user_type = UserType.STUDENT
     elif isinstance(current_user, CompanyInDB):
         user_type = UserType.COMPANY
@@ -0,0 +1,45 @@
+"""
+Runs the background jobs enqueued by the application (see source/jobs.py).
+Any number of workers can run at once, on any machine with DB access.
+
+    py -m source.worker
+"""
+import os
+import asyncio as aio
+from .database import async_pool
+from .enums import Environment
+from .jobs import run_due_jobs
+from .mail import mail_transport
+from .thumbnails import picture_executor
+from . import notifications  # registers the notification jobs
+from dotenv import load_dotenv
+
+
+if os.name == "nt":
+    aio.set_event_loop_policy(aio.WindowsSelectorEventLoopPolicy())
+
+
+async def run_worker(batch_size: int, poll_seconds: float) -> None:
+    while True:
+        num_jobs = await run_due_jobs(batch_size)
+        # Keep going while there is a backlog, otherwise wait for new jobs
+        if num_jobs < batch_size:
+            await aio.sleep(poll_seconds)
+
+
+async def main() -> None:
+    load_dotenv()
+    batch_size = int(os.getenv(Environment.JOB_BATCH_SIZE, "10"))
+    poll_seconds = float(os.getenv(Environment.JOB_POLL_SECONDS, "1"))
+
+    db_pool = async_pool()
+    try:
+        await run_worker(batch_size, poll_seconds)
+    finally:
+        await db_pool.close()
+        await mail_transport().close()
+        picture_executor().shutdown()
+
+
+if __name__ == "__main__":
+    aio.run(main())
@@ -0,0 +1,57 @@
+"""
+Builds PDF files with the given text on each page, for
+tests and benchmarks of the offer file parsing.
+"""
+from io import BytesIO
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+
+def escape_pdf_text(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def page_content(text: str) -> bytes:
+    lines = [f"({escape_pdf_text(line)}) Tj T*" for line in text.split("\n")]
+    return ("BT /F1 11 Tf 14 TL 50 800 Td " + " ".join(lines) + " ET").encode("latin-1")
+
+
+def build_pdf(page_texts: list[str]) -> bytes:
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+
+    for text in page_texts:
+        page = writer.add_blank_page(width=595, height=842)
+        content = DecodedStreamObject()
+        content.set_data(page_content(text))
+        page[NameObject("/Contents")] = writer._add_object(content)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font}),
+        })
+
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+OFFER_PAGE = (
+    "Salary: 2000\n"
+    "Weeks: 12\n"
+    "Field: Software Engineering\n"
+    "Deadline: 2025-01-31\n"
+    "Region: Europe\n"
+    "Requirements:\n"
+    "Python and SQL\n"
+    "Responsibilities:\n"
+    "Building web applications"
+)
+
+
+def build_offer_pdf(num_appendix_pages: int = 0) -> bytes:
+    """ An offer on the first page, followed by pages of other text """
+    appendix = ["Appendix\n" + "Company policies and benefits. " * 20] * num_appendix_pages
+    return build_pdf([OFFER_PAGE] + appendix)
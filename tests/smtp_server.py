@@ -0,0 +1,97 @@
+from dataclasses import dataclass, field
+import asyncio
+import threading
+
+
+@dataclass
+class ReceivedMessage:
+    sender: str
+    recipients: list[str]
+    data: str
+
+
+@dataclass
+class StandInSMTPServer:
+    """
+    Minimal SMTP server (EHLO, AUTH PLAIN, MAIL, RCPT, DATA, NOOP,
+    RSET, QUIT) for testing the mail transport. Runs on its own event
+    loop in a background thread. 'connect_delay' simulates the cost of
+    a TLS handshake and login, 'drop_after' closes every connection
+    after that many messages.
+    """
+    host: str = "127.0.0.1"
+    port: int = 0
+    connect_delay: float = 0.0
+    drop_after: int | None = None
+    messages: list[ReceivedMessage] = field(default_factory=list)
+    connections: int = 0
+
+    def start(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._started = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def stop(self) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port)
+        )
+        self.port = server.sockets[0].getsockname()[1]
+        self._started.set()
+        self._loop.run_forever()
+        server.close()
+        self._loop.run_until_complete(server.wait_closed())
+        self._loop.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        await asyncio.sleep(self.connect_delay)
+
+        async def reply(line: str) -> None:
+            writer.write(f"{line}\r\n".encode())
+            await writer.drain()
+
+        await reply("220 stand-in ESMTP")
+        sender, recipients, num_messages = "", [], 0
+
+        while line := await reader.readline():
+            command = line.decode().strip()
+            verb = command[:4].upper()
+
+            if verb == "EHLO":
+                await reply("250-stand-in\r\n250-AUTH PLAIN\r\n250 OK")
+            elif verb == "HELO":
+                await reply("250 stand-in")
+            elif verb == "AUTH":
+                await reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                sender, recipients = command.partition(":")[2].strip("<> "), []
+                await reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.partition(":")[2].strip("<> "))
+                await reply("250 OK")
+            elif verb == "DATA":
+                await reply("354 End data with <CR><LF>.<CR><LF>")
+                data_lines = []
+                while (data_line := await reader.readline()) not in (b".\r\n", b""):
+                    data_lines.append(data_line.decode())
+                self.messages.append(ReceivedMessage(sender, recipients, "".join(data_lines)))
+                num_messages += 1
+                await reply("250 OK")
+                if self.drop_after is not None and num_messages >= self.drop_after:
+                    break
+            elif verb in ("NOOP", "RSET"):
+                await reply("250 OK")
+            elif verb == "QUIT":
+                await reply("221 Bye")
+                break
+            else:
+                await reply("502 Command not implemented")
+
+        writer.close()
@@ -1,6 +1,7 @@
 from httpx import AsyncClient
 from fastapi import status
 import pytest
+import psycopg as pg
 from ..source.enums import Status
 from .test_utils import (
     create_offer,
@@ -49,6 +50,72 @@ async def test_application_post(insert_student: StudentTest, insert_offers: dict
         assert str(offer.salary) in response.text
 
 
+@pytest.mark.asyncio
+async def test_application_post_enqueues_notification(
+    db_connection: pg.Connection,
+    insert_student: StudentTest, 
+    insert_offers: dict,
+):
+    student = insert_student
+    offers: list[OfferTest] = insert_offers["offers"]
+    offer = offers[0]
+    async with AsyncClient(base_url=BASE_URL) as client:
+        token_header = await student_token_header(client, student)
+        response = await client.post(
+            url=f"/applications/apply/{student.id}/{offer.id}",
+            headers=token_header,
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    jobs = db_connection.execute("SELECT name, args, status FROM jobs").fetchall()
+    db_connection.commit()
+    assert jobs == [("send_company_digest", [offer.company_id], "PENDING")]
+
+
+@pytest.mark.asyncio
+async def test_application_posts_share_one_digest(
+    db_connection: pg.Connection,
+    insert_student: StudentTest, 
+    insert_offers: dict,
+):
+    student = insert_student
+    offers: list[OfferTest] = insert_offers["offers"]
+    async with AsyncClient(base_url=BASE_URL) as client:
+        token_header = await student_token_header(client, student)
+        for offer in offers:
+            response = await client.post(
+                url=f"/applications/apply/{student.id}/{offer.id}",
+                headers=token_header,
+            )
+            assert response.status_code == status.HTTP_200_OK
+
+    jobs = db_connection.execute("SELECT name FROM jobs").fetchall()
+    num_events, = db_connection.execute("SELECT count(*) FROM applicant_events WHERE sent_at IS NULL").fetchone()
+    db_connection.commit()
+    assert jobs == [("send_company_digest",)]
+    assert num_events == len(offers)
+
+
+@pytest.mark.asyncio
+async def test_application_post_conflict_enqueues_nothing(
+    db_connection: pg.Connection,
+    insert_student_applications: dict,
+):
+    student: StudentTest = insert_student_applications["student"]
+    application: ApplicationTest = insert_student_applications["applications"][0]
+    async with AsyncClient(base_url=BASE_URL) as client:
+        token_header = await student_token_header(client, student)
+        response = await client.post(
+            url=f"/applications/apply/{student.id}/{application.offer_id}",
+            headers=token_header,
+        )
+        assert response.status_code == status.HTTP_409_CONFLICT
+
+    jobs = db_connection.execute("SELECT name FROM jobs").fetchall()
+    db_connection.commit()
+    assert jobs == []
+
+
 # test application post incorrect
 @pytest.mark.asyncio
 async def test_application_post_invalid_offer_id(insert_student: StudentTest, insert_company: CompanyTest):
@@ -163,6 +230,37 @@ async def test_application_accept(insert_offer_applications):
     assert len(rejected_applications) == len(updated_applications) - len(accepted_applications)
 
 
+@pytest.mark.asyncio
+async def test_application_accept_enqueues_notifications(
+    db_connection: pg.Connection,
+    insert_offer_applications: dict,
+):
+    db_data = insert_offer_applications
+    students: list[StudentTest] = db_data["students"]
+    first_student = students[0]
+    offer: OfferTest = db_data["offer"]
+    company: CompanyTest = db_data["company"]
+
+    async with AsyncClient(base_url=BASE_URL) as client:
+        token_header = await company_token_header(client, company)
+        response = await client.patch(
+            url=f"/applications/accept/{first_student.id}/{offer.id}",
+            headers=token_header
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    # the jobs carry the emails and field, so they do not query them again
+    jobs = dict(db_connection.execute("SELECT name, args FROM jobs").fetchall())
+    db_connection.commit()
+    assert jobs["notify_student_application_status_change"] == [
+        first_student.email, offer.field, Status.ACCEPTED.value,
+    ]
+    rejected_emails, offer_field, new_status = jobs["notify_students_application_status_change"]
+    assert sorted(rejected_emails) == sorted(student.email for student in students[1:])
+    assert offer_field == offer.field
+    assert new_status == Status.REJECTED.value
+
+
 @pytest.mark.asyncio
 async def test_application_cancel(insert_offer_applications):
     db_data = insert_offer_applications
@@ -0,0 +1,86 @@
+import pytest
+import psycopg as pg
+from ..source.enums import Environment
+from ..source.mail import mail_transport
+from ..source.notifications import send_company_digest
+from .smtp_server import StandInSMTPServer
+from .test_jobs import scoped_pool
+from .test_utils import (
+    insert_company,
+    insert_offers,
+    db_connection,
+    reset_database,
+    CompanyTest,
+    OfferTest,
+)
+
+
+@pytest.fixture(scope="function")
+def smtp_server(monkeypatch: pytest.MonkeyPatch):
+    server = StandInSMTPServer()
+    server.start()
+    monkeypatch.setenv(Environment.SMTP_HOST, server.host)
+    monkeypatch.setenv(Environment.SMTP_PORT, str(server.port))
+    monkeypatch.setenv(Environment.SMTP_SSL, Environment.FALSE)
+    mail_transport.cache_clear()
+    yield server
+    mail_transport.cache_clear()
+    server.stop()
+
+
+def insert_events(db_connection: pg.Connection, offer: OfferTest, events: list[bool]) -> None:
+    for is_new_applicant in events:
+        db_connection.execute(
+            "INSERT INTO applicant_events (company_id, offer_id, is_new_applicant) VALUES (%s, %s, %s)",
+            [offer.company_id, offer.id, is_new_applicant],
+        )
+    db_connection.commit()
+
+
+async def send_digest(company_id: int) -> None:
+    async with scoped_pool():
+        await send_company_digest(company_id)
+        await mail_transport().close()
+
+
+@pytest.mark.asyncio
+async def test_digest_summarizes_events(
+    db_connection: pg.Connection,
+    insert_offers: dict,
+    smtp_server: StandInSMTPServer,
+):
+    company: CompanyTest = insert_offers["company"]
+    offers: list[OfferTest] = insert_offers["offers"]
+    insert_events(db_connection, offers[0], [True, True, False])
+    insert_events(db_connection, offers[1], [True])
+
+    await send_digest(company.id)
+
+    assert len(smtp_server.messages) == 1
+    message = smtp_server.messages[0]
+    assert message.recipients == [company.email]
+    assert "Applicant Activity Summary" in message.data
+    assert f"'{offers[0].field}': 2 new applicant(s), 1 cancellation(s)" in message.data
+    assert f"'{offers[1].field}': 1 new applicant(s), 0 cancellation(s)" in message.data
+
+    num_pending, = db_connection.execute("SELECT count(*) FROM applicant_events WHERE sent_at IS NULL").fetchone()
+    db_connection.commit()
+    assert num_pending == 0
+
+
+@pytest.mark.asyncio
+async def test_digest_single_event_sends_plain_email(
+    db_connection: pg.Connection,
+    insert_offers: dict,
+    smtp_server: StandInSMTPServer,
+):
+    company: CompanyTest = insert_offers["company"]
+    offer: OfferTest = insert_offers["offers"][0]
+    insert_events(db_connection, offer, [True])
+
+    await send_digest(company.id)
+    # nothing left to send
+    await send_digest(company.id)
+
+    assert len(smtp_server.messages) == 1
+    assert "New Applicant" in smtp_server.messages[0].data
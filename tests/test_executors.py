@@ -0,0 +1,61 @@
+import os
+import asyncio
+import threading
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import HTTPException, status
+from ..source.executors import BoundedExecutor, PROCESS, THREAD
+
+
+def crash_worker():
+    os._exit(1)
+
+
+def add(a: int, b: int) -> int:
+    return a + b
+
+
+@pytest.mark.asyncio
+async def test_bounded_executor_replaces_broken_pool():
+    executor = BoundedExecutor(name="test", kind=PROCESS, max_workers=1, max_queued=1)
+    try:
+        with pytest.raises(BrokenProcessPool):
+            await executor.run(crash_worker)
+
+        # the next calls run in a new pool
+        assert await executor.run(add, 1, 2) == 3
+        assert executor.stats()["restarts"] == 1
+        assert executor.stats()["in_flight"] == 0
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_bounded_executor_cancelled_call_keeps_slot():
+    executor = BoundedExecutor(name="test", kind=THREAD, max_workers=1, max_queued=0)
+    started = threading.Event()
+    release = threading.Event()
+
+    def block():
+        started.set()
+        release.wait()
+
+    try:
+        task = asyncio.create_task(executor.run(block))
+        await asyncio.to_thread(started.wait)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        # the call still occupies the only worker
+        assert executor.stats()["in_flight"] == 1
+        with pytest.raises(HTTPException) as e:
+            await executor.run(add, 1, 2)
+        assert e.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+        release.set()
+        await asyncio.to_thread(executor._executor.shutdown, wait=True)
+        assert executor.stats()["in_flight"] == 0
+    finally:
+        release.set()
+        executor.shutdown()
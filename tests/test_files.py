@@ -0,0 +1,280 @@
+import os
+import re
+import time
+import pytest
+from hypothesis import given, settings, strategies as st
+from pypdf import PdfReader
+from ..source import files
+from ..source.cache import DiskCache, LRUCache, clear_caches
+from ..source.enums import OfferFileType
+from .offer_pdfs import build_offer_pdf, OFFER_PAGE
+from ..source.files import (
+    convert_to_region_id,
+    cpu_time_limit,
+    detect_offer_file_type,
+    extract_pdf_offer,
+    extract_text_offer_info,
+    iter_page_texts,
+    read_offer_text,
+    OfferFileError,
+    OfferFileFieldError,
+    OfferFileTimeoutError,
+    OfferFileUnreadableError,
+)
+
+
+OFFER_TEXT = (
+    "Salary: 2000\n"
+    "Weeks: 12\n"
+    "Field: Software Engineering\n"
+    "Deadline: 2025-01-31\n"
+    "Region: Europe\n"
+    "Requirements: \n"
+    "Python and SQL\n"
+    "Responsibilities: \n"
+    "Building web applications"
+)
+
+
+def test_extract_text_offer_info():
+    offer_info = extract_text_offer_info(OFFER_TEXT)
+    assert offer_info["salary"] == 2000
+    assert offer_info["num_weeks"] == 12
+    assert offer_info["field"] == "Software Engineering"
+    assert offer_info["deadline"] == "2025-01-31"
+    assert offer_info["requirements"] == "Python and SQL"
+    assert offer_info["responsibilities"] == "Building web applications"
+
+
+def test_extract_text_offer_info_missing_value():
+    text = OFFER_TEXT.replace("Salary: 2000\n", "")
+    with pytest.raises(OfferFileFieldError, match="Could not extract salary from file"):
+        extract_text_offer_info(text)
+
+
+def test_extract_pdf_offer_unreadable():
+    with pytest.raises(OfferFileUnreadableError):
+        extract_pdf_offer(b"This is not a PDF file", max_pages=10, cpu_seconds=5)
+
+
+def test_cpu_time_limit():
+    start = time.monotonic()
+    with pytest.raises(OfferFileTimeoutError):
+        with cpu_time_limit(0.2):
+            while True:
+                pass
+    assert time.monotonic() - start < 5
+
+
+def test_read_offer_text_stops_after_responsibilities_page():
+    pages_read = []
+
+    def page_texts():
+        for index, text in enumerate([OFFER_PAGE, "Appendix", "Appendix"]):
+            pages_read.append(index)
+            yield text
+
+    text = read_offer_text(page_texts())
+    assert text == OFFER_PAGE
+    assert pages_read == [0]
+
+
+def test_read_offer_text_offer_split_between_pages():
+    first_page, second_page = OFFER_PAGE.split("Responsibilities")
+    pages_read = []
+
+    def page_texts():
+        for index, text in enumerate([first_page, "Responsibilities" + second_page, "Appendix"]):
+            pages_read.append(index)
+            yield text
+
+    text = read_offer_text(page_texts())
+    assert text == OFFER_PAGE
+    assert pages_read == [0, 1]
+
+
+def test_read_offer_text_incomplete_offer_reads_all_pages():
+    offer_page = OFFER_PAGE.replace("Region: Europe\n", "")
+    text = read_offer_text(iter([offer_page, "Appendix\n", "Region: Europe\n"]))
+    assert text == offer_page + "Appendix\nRegion: Europe\n"
+
+
+def test_read_offer_text_sample_file():
+    with open("files/Offer - Test.pdf", "rb") as reader:
+        page_text = next(iter_page_texts(PdfReader(reader)))
+
+    # the sample file ends with the responsibilities, without any marker
+    text = read_offer_text(iter([page_text, "Appendix"]))
+    assert text == page_text
+    assert extract_text_offer_info(text)["responsibilities"].endswith("neque cursus nec.")
+
+
+def test_extract_pdf_offer():
+    offer_info = extract_pdf_offer(build_offer_pdf(num_appendix_pages=5), max_pages=10, cpu_seconds=5)
+    # the extracted page text ends with a line break
+    assert offer_info == extract_text_offer_info(OFFER_PAGE + "\n")
+    assert offer_info["responsibilities"] == "Building web applications\n"
+
+
+def test_disk_cache_persists(tmp_path):
+    cache = DiskCache("test_disk", str(tmp_path), max_bytes=1024)
+    cache.set("key", {"salary": 2000})
+
+    # a new process reads the same directory
+    cache = DiskCache("test_disk", str(tmp_path), max_bytes=1024)
+    assert cache.get("key") == {"salary": 2000}
+    assert cache.get("missing") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_disk_cache_survives_clear_caches(tmp_path):
+    disk_cache = DiskCache("test_disk", str(tmp_path), max_bytes=1024)
+    memory_cache = LRUCache("test_memory", max_size=10)
+    disk_cache.set("key", {"salary": 2000})
+    memory_cache.set("key", {"salary": 2000})
+
+    # the invalidation listener clears the caches on every (re)connect
+    clear_caches()
+    assert disk_cache.get("key") == {"salary": 2000}
+    assert memory_cache.get("key") is None
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache("test_disk", str(tmp_path), max_bytes=250)
+    for index in range(3):
+        cache.set(f"key{index}", "x" * 100)
+        # modification times can be coarse
+        os.utime(tmp_path / f"key{index}.json", (index, index))
+
+    cache.set("key3", "x" * 100)
+    assert cache.get("key0") is None
+    assert cache.get("key1") is None
+    assert cache.get("key2") is not None
+    assert cache.get("key3") is not None
+    assert cache.stats()["evictions"] == 2
+
+
+@pytest.mark.asyncio
+async def test_extract_file_offer_cached(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    memory_cache = LRUCache("test_offer_files", max_size=10)
+    disk_cache = DiskCache("test_offer_files_disk", str(tmp_path), max_bytes=1024 * 1024)
+    monkeypatch.setattr(files, "offer_file_cache", memory_cache)
+    monkeypatch.setattr(files, "offer_file_disk_cache", disk_cache)
+    offer_file_bytes = build_offer_pdf()
+
+    offer_info = await files.extract_file_offer(offer_file_bytes)
+    assert await files.extract_file_offer(offer_file_bytes) == offer_info
+    assert memory_cache.stats()["hits"] == 1
+
+    # after a restart, the file is read from the disk instead of parsed
+    memory_cache.clear()
+    monkeypatch.setattr(files, "parse_file_offer", None)
+    assert await files.extract_file_offer(offer_file_bytes) == offer_info
+    assert disk_cache.stats()["hits"] == 1
+
+
+def test_detect_offer_file_type():
+    assert detect_offer_file_type(build_offer_pdf()) == OfferFileType.PDF
+    assert detect_offer_file_type(OFFER_PAGE.encode(), "text/plain") == OfferFileType.TEXT
+    assert detect_offer_file_type(OFFER_PAGE.encode(), "text/markdown; charset=utf-8") == OfferFileType.MARKDOWN
+    assert detect_offer_file_type(OFFER_PAGE.encode(), None, "Offer.md") == OfferFileType.MARKDOWN
+    with pytest.raises(OfferFileUnreadableError):
+        detect_offer_file_type(OFFER_PAGE.encode(), "application/pdf")
+    with pytest.raises(OfferFileUnreadableError):
+        detect_offer_file_type(b"\xff\xd8\xff\xe0 JPEG")
+
+
+@pytest.mark.asyncio
+async def test_extract_file_offer_text():
+    with open("files/Offer - Test.txt", "rb") as reader:
+        offer_file_bytes = reader.read()
+
+    offer_info = await files.extract_file_offer(offer_file_bytes, "text/plain", "Offer - Test.txt")
+    assert offer_info["salary"] == 1000
+    assert offer_info["num_weeks"] == 52
+    assert offer_info["field"] == "Mechanical Automation"
+    assert offer_info["deadline"] == "2024-11-01"
+
+
+@pytest.mark.asyncio
+async def test_extract_file_offer_markdown():
+    markdown = (
+        "# Offer\n\n"
+        "- **Salary:** 2000\n"
+        "- **Weeks:** 12\n"
+        "- **Field:** Software Engineering\n"
+        "- **Deadline:** 2025-01-31\n"
+        "- **Region:** Europe\n\n"
+        "## Requirements:\n"
+        "Python and SQL\n"
+        "## Responsibilities:\n"
+        "Building web applications"
+    )
+    offer_info = await files.extract_file_offer(markdown.encode(), "text/markdown", "Offer.md")
+    assert offer_info == extract_text_offer_info(OFFER_TEXT)
+
+
+def reference_extract_text_offer_info(text: str) -> dict:
+    """ The parser before the single scan, with a search per field """
+    salary_match = re.search(r"Salary:\s*(\d+)", text)
+    weeks_match = re.search(r"Weeks:\s*(\d+)", text)
+    field_match = re.search(r"Field:\s*([A-Za-z\s]+)\n", text)
+    deadline_match = re.search(r"Deadline:\s*(\d{4}-\d{2}-\d{2})", text)
+    region_match = re.search(r"Region:\s*([A-Za-z]+)", text)
+    requirements_match = re.search(r"Requirements:\s+([\s\S]+?)\nResponsibilities", text)
+    responsibilities_match = re.search(r"Responsibilities:\s+([\s\S]+)$", text)
+
+    if not salary_match:
+        raise OfferFileFieldError("Could not extract salary from file")
+    if not weeks_match:
+        raise OfferFileFieldError("Could not extract weeks from file text.")
+    if not field_match:
+        raise OfferFileFieldError("Could not extract field from file text.")
+    if not deadline_match:
+        raise OfferFileFieldError("Could not extract deadline from file text.")
+    if not region_match:
+        raise OfferFileFieldError("Could not extract region from file text.")
+    if not requirements_match:
+        raise OfferFileFieldError("Could not extract requirements from file text.")
+    if not responsibilities_match:
+        raise OfferFileFieldError("Could not extract responsibilities from file text.")
+
+    return {
+        "salary": int(salary_match.group(1)),
+        "num_weeks": int(weeks_match.group(1)),
+        "field": field_match.group(1),
+        "deadline": deadline_match.group(1),
+        "requirements": requirements_match.group(1),
+        "responsibilities": responsibilities_match.group(1),
+        "region_id": convert_to_region_id(region_match.group(1)),
+    }
+
+
+def parse_result(parser, text: str) -> dict | str:
+    try:
+        return parser(text)
+    except OfferFileError as e:
+        return e.message
+
+
+""" Pieces of offer texts, so that generated texts often contain (broken) fields """
+offer_text_pieces = st.sampled_from([
+    "Salary:", "Weeks:", "Field:", "Deadline:", "Region:", "Requirements:", "Responsibilities:",
+    "\nResponsibilities", "Europe", "Asia", "Mars", "2025-01-31", "2000", "12",
+    "Software Engineering", " ", "  ", "\n", "\n\n", "\t", "\u00a0", "x", ":", "-",
+])
+offer_texts = st.lists(st.one_of(offer_text_pieces, st.text(max_size=5)), max_size=40).map("".join)
+
+
+@settings(max_examples=1000, deadline=None)
+@given(offer_texts)
+def test_extract_text_offer_info_matches_reference(text: str):
+    assert parse_result(extract_text_offer_info, text) == parse_result(reference_extract_text_offer_info, text)
+
+
+@settings(max_examples=300, deadline=None)
+@given(st.permutations(OFFER_TEXT.split("\n")), offer_texts)
+def test_extract_text_offer_info_matches_reference_reordered(lines: list[str], noise: str):
+    text = "\n".join(lines) + noise
+    assert parse_result(extract_text_offer_info, text) == parse_result(reference_extract_text_offer_info, text)
@@ -0,0 +1,309 @@
+import pytest
+import psycopg as pg
+from ..source.enums import Region, Status, UserType
+from ..source.queries import (
+    accept_student_query,
+    delete_application_query,
+    delete_company_report_query,
+    delete_experience_query,
+    delete_student_report_query,
+    delete_subject_query,
+    reject_students_query,
+    select_applicants_query,
+    select_application_status_query,
+    select_applications_query,
+    select_company_offers_query,
+    select_company_report_query,
+    select_company_reports_query,
+    select_offer_company_id_query,
+    select_offer_query,
+    select_offers_query,
+    select_student_profile_query,
+    select_student_report_query,
+    select_user_by_email_query,
+    update_application_status_query,
+    update_applications_waiting_query,
+    update_company_report_query,
+    update_experience_query,
+    update_offer_company_id_null_query,
+    update_offer_query,
+    update_student_report_query,
+    update_subject_query,
+)
+from .test_utils import (
+    create_indexes,
+    db_connection,
+    reset_database,
+)
+
+
+pytestmark = pytest.mark.usefixtures("create_indexes")
+
+
+NUM_COMPANIES = 1_000
+NUM_OFFERS = 50_000
+NUM_STUDENTS = 20_000
+APPLICATIONS_PER_STUDENT = 5
+SUBJECTS_PER_STUDENT = 3
+
+""" Tables seeded with enough rows for a sequential scan to be a planning failure """
+LARGE_TABLES = {
+    "students",
+    "companies",
+    "offers",
+    "applications",
+    "experiences",
+    "subjects",
+    "student_reports",
+    "company_reports",
+}
+
+
+def numbered(table: str) -> str:
+    """ The rows of a seeded table numbered from 1, whatever ids the sequence assigned """
+    return f"(SELECT id, row_number() OVER (ORDER BY id) AS n FROM {table})"
+
+
+def seed_large_dataset(db_connection: pg.Connection) -> dict:
+    """
+    Inserts the rows without committing them. Returns ids
+    of seeded rows, to be used as the query parameters.
+    """
+    db_connection.execute(
+        "INSERT INTO companies "
+        "(email, hashed_password, name, field, num_employees, year_founded, website) "
+        "SELECT 'company_' || i || '@test.com', 'hash', 'Company ' || i, 'Field', 10, 2000, 'www.test.com' "
+        "FROM generate_series(1, %s) AS i",
+        [NUM_COMPANIES],
+    )
+    db_connection.execute(
+        "INSERT INTO offers "
+        "(salary, num_weeks, field, deadline, requirements, responsibilities, company_id, region_id) "
+        "SELECT (i * 7919) %% 100000, 1 + (i %% 52), 'Field ' || i, '2024-10-01', "
+        "'Requirements', 'Responsibilities', c.id, i %% 4 "
+        f"FROM generate_series(1, %s) AS i JOIN {numbered('companies')} AS c ON c.n = 1 + (i %% %s)",
+        [NUM_OFFERS, NUM_COMPANIES],
+    )
+    db_connection.execute(
+        "INSERT INTO students "
+        "(email, hashed_password, name, university, major, credits, gpa, date_of_birth, region_id) "
+        "SELECT 'student_' || i || '@test.com', 'hash', 'Student ' || i, 'University', 'Major', "
+        "i %% 300, (i %% 100) / 10.0, '2000-01-01', i %% 4 "
+        "FROM generate_series(1, %s) AS i",
+        [NUM_STUDENTS],
+    )
+    db_connection.execute(
+        "INSERT INTO applications (student_id, offer_id, status) "
+        "SELECT s.id, o.id, %s "
+        f"FROM {numbered('students')} AS s "
+        "CROSS JOIN generate_series(1, %s) AS k "
+        f"JOIN {numbered('offers')} AS o ON o.n = 1 + ((s.n * 13 + k * 9973) %% %s)",
+        [Status.WAITING.value, APPLICATIONS_PER_STUDENT, NUM_OFFERS],
+    )
+    db_connection.execute(
+        "INSERT INTO experiences (from_date, to_date, company, position, description, student_id) "
+        "SELECT '2021-01-01', '2021-12-31', 'Company', 'Position', 'Description', s.id "
+        f"FROM generate_series(1, %s) AS i JOIN {numbered('students')} AS s ON s.n = 1 + (i %% %s)",
+        [2 * NUM_STUDENTS, NUM_STUDENTS],
+    )
+    db_connection.execute(
+        "INSERT INTO subjects (student_id, name, grade) "
+        "SELECT s.id, 'Subject ' || k, 5 + ((s.n + k) %% 6) "
+        f"FROM {numbered('students')} AS s CROSS JOIN generate_series(1, %s) AS k",
+        [SUBJECTS_PER_STUDENT],
+    )
+    for table in ("student_reports", "company_reports"):
+        grades = (
+            "overall_grade, technical_grade, communication_grade"
+            if table == "student_reports" else
+            "mentorship_grade, work_environment_grade, benefits_grade"
+        )
+        db_connection.execute(
+            f"INSERT INTO {table} ({grades}, comment, student_id, offer_id) "
+            "SELECT 5, 5, 5, 'Comment', s.id, o.id "
+            f"FROM {numbered('students')} AS s "
+            f"JOIN {numbered('offers')} AS o ON o.n = 1 + ((s.n * 13 + 9973) %% %s)",
+            [NUM_OFFERS],
+        )
+
+    # ANALYZE can run in the transaction, so the plans see the seeded rows
+    for table in LARGE_TABLES:
+        db_connection.execute(f"ANALYZE {table}")
+
+    ids = {}
+    for table in ("companies", "offers", "students", "experiences"):
+        ids[table], = db_connection.execute(f"SELECT min(id) FROM {table}").fetchone()
+    # A company with offers, and an offer that a student applied to
+    ids["company_offer"], = db_connection.execute(
+        "SELECT id FROM offers WHERE company_id = %s ORDER BY id DESC LIMIT 1", [ids["companies"]]
+    ).fetchone()
+    ids["application_offer"], = db_connection.execute(
+        "SELECT min(offer_id) FROM applications WHERE student_id = %s", [ids["students"]]
+    ).fetchone()
+    ids["middle_offer"], = db_connection.execute(
+        "SELECT id FROM offers ORDER BY id OFFSET %s LIMIT 1", [NUM_OFFERS // 2]
+    ).fetchone()
+    ids["middle_student"], = db_connection.execute(
+        "SELECT id FROM students ORDER BY id OFFSET %s LIMIT 1", [NUM_STUDENTS // 2]
+    ).fetchone()
+    return ids
+
+
+@pytest.fixture(scope="function")
+def large_dataset(db_connection: pg.Connection):
+    """ The seeded rows are never committed, so they never reach the other tests """
+    try:
+        yield seed_large_dataset(db_connection)
+    finally:
+        db_connection.rollback()
+
+
+def sequential_scans(plan: dict) -> list[str]:
+    scans = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in LARGE_TABLES:
+        scans.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        scans.extend(sequential_scans(child))
+    return scans
+
+
+def query_cases(ids: dict) -> list[tuple[str, str, list]]:
+    company_id = ids["companies"]
+    student_id = ids["students"]
+    offer_id = ids["offers"]
+    experience_id = ids["experiences"]
+    application_offer_id = ids["application_offer"]
+
+    applicants_query, applicants_params = select_applicants_query(
+        offer_id=offer_id, university=None, min_gpa=0, max_gpa=10,
+        min_credits=0, max_credits=300, subjects=[],
+        after_student_id=None, limit=51,
+    )
+    next_applicants_query, next_applicants_params = select_applicants_query(
+        offer_id=offer_id, university=None, min_gpa=0, max_gpa=10,
+        min_credits=0, max_credits=300, subjects=[],
+        after_student_id=ids["middle_student"], limit=51,
+    )
+    subjects_query, subjects_params = select_applicants_query(
+        offer_id=offer_id, university=None, min_gpa=0, max_gpa=10,
+        min_credits=0, max_credits=300, subjects=[("Subject 1", 7), ("Subject 2", 6)],
+        after_student_id=None, limit=51,
+    )
+    offers_query, offers_params = select_offers_query(
+        None, None, 10, 12, 5000, 5010, Region.EUROPE.value, None, 51,
+    )
+    next_offers_query, next_offers_params = select_offers_query(
+        None, None, 0, 1000, 0, 1_000_000, Region.EUROPE.value, [ids["middle_offer"]], 51,
+    )
+    field_query, field_params = select_offers_query(
+        "Field 123", None, 0, 1000, 0, 1_000_000, Region.EUROPE.value, None, 51,
+    )
+    search_query, search_params = select_offers_query(
+        None, "123", 0, 1000, 0, 1_000_000, Region.EUROPE.value, None, 51,
+    )
+    next_search_query, next_search_params = select_offers_query(
+        None, "123", 0, 1000, 0, 1_000_000, Region.EUROPE.value, [0.1, ids["middle_offer"]], 51,
+    )
+    company_offers_query, company_offers_params = select_company_offers_query(company_id, None, 51)
+    next_company_offers_query, next_company_offers_params = select_company_offers_query(
+        company_id, ids["company_offer"], 51,
+    )
+    applications_query, applications_params = select_applications_query(student_id, None, 51)
+    next_applications_query, next_applications_params = select_applications_query(
+        student_id, application_offer_id, 51,
+    )
+    return [
+        ("select_offers_query", offers_query, offers_params),
+        ("select_offers_query (next page)", next_offers_query, next_offers_params),
+        ("select_offers_query (field)", field_query, field_params),
+        ("select_offers_query (search)", search_query, search_params),
+        ("select_offers_query (search, next page)", next_search_query, next_search_params),
+        ("select_offer_query", select_offer_query(), [offer_id]),
+        ("select_offer_company_id_query", select_offer_company_id_query(), [offer_id]),
+        ("select_company_offers_query", company_offers_query, company_offers_params),
+        ("select_company_offers_query (next page)", next_company_offers_query, next_company_offers_params),
+        ("select_company_reports_query", select_company_reports_query(), [company_id]),
+        ("select_applications_query", applications_query, applications_params),
+        ("select_applications_query (next page)", next_applications_query, next_applications_params),
+        ("select_applicants_query", applicants_query, applicants_params),
+        ("select_applicants_query (next page)", next_applicants_query, next_applicants_params),
+        ("select_applicants_query (subjects)", subjects_query, subjects_params),
+        ("select_student_profile_query", select_student_profile_query(), [student_id]),
+        ("select_user_by_email_query", select_user_by_email_query(UserType.STUDENT), ["student_1@test.com"]),
+        ("select_application_status_query", select_application_status_query(), [student_id, application_offer_id]),
+        ("select_student_report_query", select_student_report_query(), [student_id, offer_id]),
+        ("select_company_report_query", select_company_report_query(), [student_id, offer_id]),
+        ("accept_student_query", accept_student_query(), [student_id, application_offer_id]),
+        ("reject_students_query", reject_students_query(), [student_id, application_offer_id]),
+        ("update_applications_waiting_query", update_applications_waiting_query(), [student_id, application_offer_id]),
+        ("delete_application_query", delete_application_query(), [student_id, application_offer_id]),
+        (
+            "update_application_status_query",
+            update_application_status_query(Status.ACCEPTED, Status.ONGOING),
+            [student_id, application_offer_id, student_id, application_offer_id, company_id, company_id],
+        ),
+        (
+            "update_offer_query",
+            update_offer_query(),
+            [
+                offer_id, 1000, 10, "Field", "2024-10-01", "Requirements", "Responsibilities",
+                0, offer_id, company_id, company_id,
+            ],
+        ),
+        (
+            "update_offer_company_id_null_query",
+            update_offer_company_id_null_query(),
+            [offer_id, offer_id, company_id, company_id],
+        ),
+        (
+            "update_student_report_query",
+            update_student_report_query(),
+            [offer_id, 5, 5, 5, "Comment", student_id, offer_id, company_id, company_id],
+        ),
+        (
+            "delete_student_report_query",
+            delete_student_report_query(),
+            [offer_id, student_id, offer_id, company_id, company_id],
+        ),
+        (
+            "update_company_report_query",
+            update_company_report_query(),
+            [5, 5, 5, "Comment", student_id, offer_id],
+        ),
+        ("delete_company_report_query", delete_company_report_query(), [student_id, offer_id]),
+        (
+            "update_subject_query",
+            update_subject_query(),
+            [student_id, "Subject 1", 8, student_id, "Subject 1", student_id, student_id],
+        ),
+        (
+            "delete_subject_query",
+            delete_subject_query(),
+            [student_id, "Subject 1", student_id, "Subject 1", student_id, student_id],
+        ),
+        (
+            "update_experience_query",
+            update_experience_query(),
+            [
+                experience_id, "2021-01-01", "2021-12-31", "Company", "Position", "Description",
+                experience_id, student_id, student_id,
+            ],
+        ),
+        (
+            "delete_experience_query",
+            delete_experience_query(),
+            [experience_id, experience_id, student_id, student_id],
+        ),
+    ]
+
+
+def test_queries_use_indexes(db_connection: pg.Connection, large_dataset: dict):
+    failures = []
+    for name, query, params in query_cases(large_dataset):
+        record = db_connection.execute(f"EXPLAIN (FORMAT JSON) {query}", params).fetchone()
+        plan = record[0][0]["Plan"]
+        scans = sequential_scans(plan)
+        if scans:
+            failures.append(f"{name}: sequential scan on {', '.join(scans)}")
+
+    assert failures == []
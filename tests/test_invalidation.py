@@ -0,0 +1,59 @@
+import asyncio
+import json
+import pytest
+from types import SimpleNamespace
+from psycopg import InterfaceError
+from ..source import invalidation
+
+
+class NotifyingConnection:
+    """ Delivers the payloads, then fails as if the connection broke """
+
+    def __init__(self, payloads: list[str]) -> None:
+        self.payloads = payloads
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def execute(self, query: str):
+        pass
+
+    async def notifies(self):
+        for payload in self.payloads:
+            yield SimpleNamespace(payload=payload)
+        raise InterfaceError("the connection is lost")
+
+
+@pytest.mark.asyncio
+async def test_listener_survives_failing_invalidations(monkeypatch: pytest.MonkeyPatch):
+    invalidated = []
+
+    def invalidate_offer(offer_id):
+        invalidated.append(int(offer_id))
+
+    payloads = [
+        json.dumps({"topic": "test_offers", "key": "not an id"}),
+        json.dumps({"topic": "test_offers", "key": "1"}),
+    ]
+    connects = []
+
+    async def connect(conninfo, autocommit):
+        connects.append(conninfo)
+        if len(connects) > 2:
+            raise asyncio.CancelledError()
+        return NotifyingConnection(payloads)
+
+    monkeypatch.setattr(invalidation, "_invalidators", {"test_offers": [invalidate_offer]})
+    monkeypatch.setattr(invalidation, "async_pool", lambda: SimpleNamespace(conninfo="test"))
+    monkeypatch.setattr(invalidation.AsyncConnection, "connect", connect)
+    monkeypatch.setattr(invalidation, "RECONNECT_DELAY_SECONDS", 0)
+
+    with pytest.raises(asyncio.CancelledError):
+        await invalidation.listen_for_invalidations()
+
+    # the bad payload did not stop the listener, nor did the broken connection
+    assert invalidated == [1, 1]
+    assert len(connects) == 3
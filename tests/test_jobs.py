@@ -0,0 +1,108 @@
+import pytest
+import psycopg as pg
+from contextlib import asynccontextmanager
+from ..source.database import async_pool
+from ..source.jobs import job, enqueue, run_due_jobs, RETRY_BASE_SECONDS
+from .test_utils import (
+    db_connection,
+    reset_database,
+)
+
+
+completed_jobs = []
+
+
+@job
+async def record_job(value: str) -> None:
+    completed_jobs.append(value)
+
+
+@job
+async def failing_job() -> None:
+    raise RuntimeError("Job failed")
+
+
+@asynccontextmanager
+async def scoped_pool():
+    # The pool is bound to the event loop of the test
+    pool = async_pool()
+    try:
+        yield pool
+    finally:
+        await pool.close()
+        async_pool.cache_clear()
+
+
+async def enqueue_job(function, *args) -> None:
+    async with scoped_pool() as pool, pool.connection() as conn:
+        await enqueue(conn, function, *args)
+
+
+async def run_jobs() -> int:
+    async with scoped_pool():
+        return await run_due_jobs(batch_size=10)
+
+
+@pytest.mark.asyncio
+async def test_job_runs_and_is_deleted(db_connection: pg.Connection):
+    await enqueue_job(record_job, "value")
+    num_jobs = await run_jobs()
+
+    assert num_jobs == 1
+    assert completed_jobs[-1] == "value"
+    jobs = db_connection.execute("SELECT id FROM jobs").fetchall()
+    db_connection.commit()
+    assert jobs == []
+
+
+@pytest.mark.asyncio
+async def test_failed_job_is_retried_later(db_connection: pg.Connection):
+    await enqueue_job(failing_job)
+    num_jobs = await run_jobs()
+
+    assert num_jobs == 1
+    status, attempts, last_error, delay = db_connection.execute(
+        "SELECT status, attempts, last_error, run_at - now() FROM jobs"
+    ).fetchone()
+    db_connection.commit()
+    assert status == "PENDING"
+    assert attempts == 1
+    assert "Job failed" in last_error
+    assert delay.total_seconds() > RETRY_BASE_SECONDS / 2
+
+    # not due yet
+    assert await run_jobs() == 0
+
+
+@pytest.mark.asyncio
+async def test_job_fails_after_max_attempts(db_connection: pg.Connection):
+    await enqueue_job(failing_job)
+    db_connection.execute("UPDATE jobs SET max_attempts = 1")
+    db_connection.commit()
+    await run_jobs()
+
+    status, = db_connection.execute("SELECT status FROM jobs").fetchone()
+    db_connection.commit()
+    assert status == "FAILED"
+
+
+@pytest.mark.asyncio
+async def test_expired_job_is_claimed_again(db_connection: pg.Connection):
+    # as if the worker running it had crashed
+    await enqueue_job(record_job, "expired")
+    db_connection.execute(
+        "UPDATE jobs SET status = 'RUNNING', attempts = 1, locked_until = now() - interval '1 second'"
+    )
+    db_connection.commit()
+
+    assert await run_jobs() == 1
+    assert completed_jobs[-1] == "expired"
+
+
+@pytest.mark.asyncio
+async def test_enqueue_unregistered_function():
+    async def not_a_job() -> None:
+        pass
+
+    with pytest.raises(ValueError):
+        await enqueue(None, not_a_job)  # type: ignore
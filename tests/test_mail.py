@@ -0,0 +1,90 @@
+import asyncio
+import time
+import pytest
+from ..source.mail import MailTransport, RateLimiter
+from .smtp_server import StandInSMTPServer
+
+
+@pytest.fixture(scope="function")
+def smtp_server():
+    server = StandInSMTPServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+def create_transport(server: StandInSMTPServer, max_connections: int = 2, max_rate: float | None = None) -> MailTransport:
+    return MailTransport(
+        host=server.host,
+        port=server.port,
+        use_ssl=False,
+        username="sender@test.com",
+        password="password",
+        max_connections=max_connections,
+        max_rate=max_rate,
+    )
+
+
+@pytest.mark.asyncio
+async def test_mail_transport_reuses_connections(smtp_server: StandInSMTPServer):
+    transport = create_transport(smtp_server, max_connections=2)
+    await asyncio.gather(*[
+        transport.send(f"student{i}@test.com", "Subject", f"Body {i}")
+        for i in range(10)
+    ])
+    await transport.close()
+
+    assert len(smtp_server.messages) == 10
+    assert smtp_server.connections <= 2
+    assert transport.stats()["sent"] == 10
+    assert smtp_server.messages[0].sender == "sender@test.com"
+
+
+@pytest.mark.asyncio
+async def test_mail_transport_multiple_recipients(smtp_server: StandInSMTPServer):
+    transport = create_transport(smtp_server)
+    await transport.send(["student1@test.com", "student2@test.com"], "Subject", "Body")
+    await transport.close()
+
+    assert smtp_server.messages[0].recipients == ["student1@test.com", "student2@test.com"]
+    assert "Subject: Subject" in smtp_server.messages[0].data
+
+
+@pytest.mark.asyncio
+async def test_mail_transport_reconnects(smtp_server: StandInSMTPServer):
+    smtp_server.drop_after = 1
+    transport = create_transport(smtp_server, max_connections=1)
+    for i in range(3):
+        await transport.send("student@test.com", "Subject", f"Body {i}")
+    await transport.close()
+
+    assert len(smtp_server.messages) == 3
+    assert transport.stats()["connects"] == 3
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter():
+    rate_limiter = RateLimiter(rate=20, burst=1)
+    start = time.monotonic()
+    for _ in range(5):
+        await rate_limiter.acquire()
+
+    # the first acquisition uses the burst, the other four wait 1/20 s each
+    assert time.monotonic() - start >= 0.15
+
+
+@pytest.mark.asyncio
+async def test_mail_transport_drops_connection_after_failed_send(smtp_server: StandInSMTPServer):
+    transport = create_transport(smtp_server, max_connections=1)
+    await transport.send("student@test.com", "Subject", "Body 1")
+
+    # smtplib only sends ASCII messages
+    with pytest.raises(UnicodeEncodeError):
+        await transport.send("student@test.com", "Subject", "Body č")
+    assert transport.stats()["idle_connections"] == 0
+
+    await transport.send("student@test.com", "Subject", "Body 2")
+    await transport.close()
+
+    assert ["Body 2" in message.data for message in smtp_server.messages] == [False, True]
+    assert transport.stats()["connects"] == 2
@@ -1,7 +1,17 @@
 from dataclasses import asdict
+from html import unescape
 from fastapi import status
 from httpx import AsyncClient
 import pytest
+import psycopg as pg
+import asyncio
+import re
+import zipfile
+from io import BytesIO
+from ..source import controllers
+from ..source.files import OFFER_FILE_MAX_BYTES
+from ..source.schemas import OfferRead
+from .offer_pdfs import build_offer_pdf
 from .test_utils import (
     StudentTest,
     create_offer,
@@ -12,6 +22,7 @@ from .test_utils import (
     insert_company,
     insert_student,
     company_token,
+    create_triggers,
     db_connection,
     reset_database,
     CompanyTest,
@@ -61,6 +72,130 @@ async def test_offer_post_incorrect_field(insert_company: CompanyTest):
         assert "detail" in response.text
 
 
+@pytest.mark.asyncio
+async def test_offer_file_post_unreadable(insert_company: CompanyTest):
+    company = insert_company
+    async with AsyncClient(base_url=BASE_URL) as client:
+        token_header = await company_token_header(client, company)
+        response = await client.post(
+            url="/offers/file",
+            headers=token_header,
+            files={"offer_file_bytes": ("offer.pdf", b"This is not a PDF file")},
+            data={"company_id": str(company.id)},
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "Could not read offer file" in response.text
+
+
+@pytest.mark.asyncio
+async def test_offer_file_post_text(db_connection: pg.Connection, insert_company: CompanyTest):
+    company = insert_company
+    with open("files/Offer - Test.txt", "rb") as reader:
+        offer_file_bytes = reader.read()
+
+    async with AsyncClient(base_url=BASE_URL) as client:
+        token_header = await company_token_header(client, company)
+        response = await client.post(
+            url="/offers/file",
+            headers=token_header,
+            files={"offer_file_bytes": ("Offer - Test.txt", offer_file_bytes, "text/plain")},
+            data={"company_id": str(company.id)},
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+
+    record = db_connection.execute("SELECT field, salary, company_id FROM offers").fetchone()
+    db_connection.commit()
+    assert record == ("Mechanical Automation", 1000, company.id)
+
+
+@pytest.mark.asyncio
+async def test_offer_file_post_too_large(insert_company: CompanyTest):
+    company = insert_company
+    async with AsyncClient(base_url=BASE_URL) as client:
+        token_header = await company_token_header(client, company)
+        response = await client.post(
+            url="/offers/file",
+            headers=token_header,
+            files={"offer_file_bytes": ("offer.pdf", b"0" * (OFFER_FILE_MAX_BYTES + 1))},
+            data={"company_id": str(company.id)},
+        )
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+@pytest.mark.asyncio
+async def test_offers_bulk_post_archive(db_connection: pg.Connection, insert_company: CompanyTest):
+    company = insert_company
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w") as archive_file:
+        archive_file.writestr("offers/Offer 1.pdf", build_offer_pdf())
+        archive_file.writestr("offers/Offer 2.pdf", build_offer_pdf(num_appendix_pages=2))
+        archive_file.writestr("offers/notes.docx", "Not an offer")
+
+    async with AsyncClient(base_url=BASE_URL) as client:
+        token_header = await company_token_header(client, company)
+        response = await client.post(
+            url="/offers/bulk",
+            headers=token_header,
+            files={"offers_file_bytes": ("offers.zip", archive.getvalue())},
+            data={"company_id": str(company.id)},
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    results = {result["file"]: result for result in response.json()}
+    assert results["offers/notes.docx"]["offer_id"] is None
+    assert "not a PDF" in results["offers/notes.docx"]["error"]
+    offer_ids = [results[name]["offer_id"] for name in ["offers/Offer 1.pdf", "offers/Offer 2.pdf"]]
+    assert all(offer_id is not None for offer_id in offer_ids)
+
+    records = db_connection.execute(
+        "SELECT id, field, company_id FROM offers ORDER BY id"
+    ).fetchall()
+    db_connection.commit()
+    assert records == [(offer_id, "Software Engineering", company.id) for offer_id in sorted(offer_ids)]
+
+
+@pytest.mark.asyncio
+async def test_offers_bulk_post_csv(db_connection: pg.Connection, insert_company: CompanyTest):
+    company = insert_company
+    csv_text = (
+        "salary,num_weeks,field,deadline,region,requirements,responsibilities\n"
+        "2000,12,Data Science,2025-01-31,Europe,Python,Analysis\n"
+        "a lot,12,Data Science,2025-01-31,Europe,Python,Analysis\n"
+        "2000,12,Data Science,2025-01-31,Mars,Python,Analysis\n"
+    )
+    async with AsyncClient(base_url=BASE_URL) as client:
+        token_header = await company_token_header(client, company)
+        response = await client.post(
+            url="/offers/bulk",
+            headers=token_header,
+            files={"offers_file_bytes": ("offers.csv", csv_text.encode())},
+            data={"company_id": str(company.id)},
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    results = response.json()
+    assert [result["file"] for result in results] == ["row 2", "row 3", "row 4"]
+    assert results[0]["offer_id"] is not None and results[0]["error"] is None
+    assert results[1]["offer_id"] is None and "whole numbers" in results[1]["error"]
+    assert results[2]["offer_id"] is None and "Invalid region" in results[2]["error"]
+
+    num_offers, = db_connection.execute("SELECT count(*) FROM offers").fetchone()
+    db_connection.commit()
+    assert num_offers == 1
+
+
+@pytest.mark.asyncio
+async def test_offers_bulk_post_unauthorized(insert_company: CompanyTest):
+    company = insert_company
+    async with AsyncClient(base_url=BASE_URL) as client:
+        response = await client.post(
+            url="/offers/bulk",
+            files={"offers_file_bytes": ("offers.csv", b"salary")},
+            data={"company_id": str(company.id)},
+        )
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
 @pytest.mark.asyncio
 async def test_offer_post_unauthorized(insert_company: CompanyTest):
     company = insert_company
@@ -112,6 +247,161 @@ async def test_offers_get_filtered(insert_offers: dict, insert_student: StudentT
         assert offers[2].field not in response.text
 
 
+@pytest.mark.asyncio
+async def test_offers_get_field_case_insensitive(insert_offers: dict, insert_student: StudentTest):
+    offers: list[OfferTest] = insert_offers["offers"]
+    student = insert_student
+    async with AsyncClient(base_url=BASE_URL) as client:
+        token_header = await student_token_header(client, student)
+        response = await client.get(
+            url=f"/offers?field={offers[0].field.lower()}",
+            headers=token_header,
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert offers[0].field in response.text
+        assert offers[1].field not in response.text
+        assert offers[2].field not in response.text
+
+
+@pytest.mark.asyncio
+async def test_offers_get_search(insert_offers: dict, insert_student: StudentTest):
+    offers: list[OfferTest] = insert_offers["offers"]
+    student = insert_student
+    async with AsyncClient(base_url=BASE_URL) as client:
+        token_header = await student_token_header(client, student)
+        response = await client.get(
+            url="/offers",
+            params={"search": "field 2"},
+            headers=token_header,
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert offers[0].field not in response.text
+        assert offers[1].field in response.text
+        assert offers[2].field not in response.text
+
+
+@pytest.mark.asyncio
+async def test_offers_get_paginated(insert_offers: dict, insert_student: StudentTest):
+    offers: list[OfferTest] = insert_offers["offers"]
+    student = insert_student
+    async with AsyncClient(base_url=BASE_URL) as client:
+        token_header = await student_token_header(client, student)
+        response = await client.get(
+            url="/offers",
+            params={"limit": 2},
+            headers=token_header,
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert offers[0].field not in response.text
+        assert offers[1].field in response.text
+        assert offers[2].field in response.text
+
+        next_page_url = re.search(r'data-url="([^"]+)"', response.text)
+        assert next_page_url is not None
+
+        response = await client.get(
+            url=unescape(next_page_url.group(1)),
+            headers=token_header,
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert offers[0].field in response.text
+        assert offers[1].field not in response.text
+        assert offers[2].field not in response.text
+        assert "next-page-btn" not in response.text
+
+
+@pytest.mark.asyncio
+async def test_offers_get_search_paginated_tied_ranks(
+    db_connection: pg.Connection,
+    insert_company: CompanyTest,
+    insert_student: StudentTest,
+):
+    company = insert_company
+    student = insert_student
+    # Same document length and one match each, so every offer has the same rank
+    offers = [
+        create_offer(company.id, offer_id=offer_id, field=f"Tied Offer {offer_id:02}")
+        for offer_id in range(1, 8)
+    ]
+    with db_connection.cursor() as cur:
+        cur.executemany(
+            "INSERT INTO offers "
+            "(id, salary, num_weeks, field, deadline, requirements, responsibilities, company_id, region_id) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            [
+                (o.id, o.salary, o.num_weeks, o.field, o.deadline, o.requirements, o.responsibilities, o.company_id, o.region_id)
+                for o in offers
+            ],
+        )
+    db_connection.commit()
+
+    seen_fields: list[str] = []
+    async with AsyncClient(base_url=BASE_URL) as client:
+        token_header = await student_token_header(client, student)
+        url = "/offers"
+        params: dict | None = {"search": "tied", "limit": 2}
+        while True:
+            response = await client.get(url=url, params=params, headers=token_header)
+            assert response.status_code == status.HTTP_200_OK
+            page_fields = [o.field for o in offers if o.field in response.text]
+            assert 0 < len(page_fields) <= 2
+            seen_fields.extend(page_fields)
+
+            next_page_url = re.search(r'data-url="([^"]+)"', response.text)
+            if next_page_url is None:
+                break
+            url, params = unescape(next_page_url.group(1)), None
+
+    # Every offer appears exactly once across the pages
+    assert sorted(seen_fields) == sorted(o.field for o in offers)
+    assert len(seen_fields) == len(offers)
+
+
+@pytest.mark.asyncio
+async def test_offers_get_invalid_cursor(insert_offers: dict, insert_student: StudentTest):
+    student = insert_student
+    async with AsyncClient(base_url=BASE_URL) as client:
+        token_header = await student_token_header(client, student)
+        response = await client.get(
+            url="/offers",
+            params={"after": "not-a-cursor"},
+            headers=token_header,
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_offers_get_cached_until_offer_write(insert_offers: dict, insert_student: StudentTest):
+    company: CompanyTest = insert_offers["company"]
+    offers: list[OfferTest] = insert_offers["offers"]
+    first_offer = offers[0]
+    student = insert_student
+    async with AsyncClient(base_url=BASE_URL) as client:
+        student_header = await student_token_header(client, student)
+
+        # the same filters are normalized to the same cache entry
+        for field in ("Test Field", "test field"):
+            response = await client.get(url="/offers", params={"field": field}, headers=student_header)
+            assert response.status_code == status.HTTP_200_OK
+            assert first_offer.field in response.text
+
+        response = await client.get("/metrics/caches", headers=student_header)
+        assert response.json()["offer_searches"]["hits"] >= 1
+
+        first_offer.field = "Test Field Updated"
+        company_header = await company_token_header(client, company)
+        response = await client.put(
+            url=f"/offers/{first_offer.id}",
+            headers=company_header,
+            json=asdict(first_offer),
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+        response = await client.get(url="/offers", params={"field": "Test Field"}, headers=student_header)
+        assert response.status_code == status.HTTP_200_OK
+        assert first_offer.field in response.text
+
+
 @pytest.mark.asyncio
 async def test_offer_get(insert_offers: dict, insert_student: StudentTest):
     offers: list[OfferTest] = insert_offers["offers"]
@@ -203,6 +493,112 @@ async def test_offer_put(insert_offers: dict):
         assert first_offer.field in response.text
 
 
+@pytest.mark.asyncio
+async def test_offer_put_invalidates_cache(insert_offers: dict):
+    company: CompanyTest = insert_offers["company"]
+    offers: list[OfferTest] = insert_offers["offers"]
+    first_offer = offers[0]
+    old_field = first_offer.field
+    async with AsyncClient(base_url=BASE_URL) as client:
+        token_header = await company_token_header(client, company)
+
+        # the second read is served from the offer cache
+        for _ in range(2):
+            response = await client.get(url=f"/offers/{first_offer.id}", headers=token_header)
+            assert response.status_code == status.HTTP_200_OK
+            assert old_field in response.text
+
+        response = await client.get("/metrics/caches", headers=token_header)
+        assert response.json()["offers"]["hits"] >= 1
+
+        first_offer.field = "This field is updated!"
+        response = await client.put(
+            url=f"/offers/{first_offer.id}",
+            headers=token_header,
+            json=asdict(first_offer),
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+        response = await client.get(url=f"/offers/{first_offer.id}", headers=token_header)
+        assert response.status_code == status.HTTP_200_OK
+        assert first_offer.field in response.text
+        assert old_field not in response.text
+
+
+@pytest.mark.asyncio
+async def test_offer_cache_invalidated_by_notification(
+    create_triggers: None,
+    db_connection: pg.Connection, 
+    insert_offers: dict, 
+    insert_student: StudentTest,
+):
+    offers: list[OfferTest] = insert_offers["offers"]
+    first_offer = offers[0]
+    student = insert_student
+    async with AsyncClient(base_url=BASE_URL) as client:
+        token_header = await student_token_header(client, student)
+        response = await client.get(url=f"/offers/{first_offer.id}", headers=token_header)
+        assert first_offer.field in response.text
+
+        # a write that did not go through this server, as if from another worker
+        db_connection.execute(
+            "UPDATE offers SET field = %s WHERE id = %s",
+            ["Updated Elsewhere", first_offer.id],
+        )
+        db_connection.commit()
+
+        for _ in range(20):
+            response = await client.get(url=f"/offers/{first_offer.id}", headers=token_header)
+            if "Updated Elsewhere" in response.text:
+                break
+            await asyncio.sleep(0.1)
+
+        assert "Updated Elsewhere" in response.text
+
+
+@pytest.mark.asyncio
+async def test_offer_get_not_cached_when_written_during_read(monkeypatch: pytest.MonkeyPatch):
+    offer = OfferRead(
+        id=1, salary=2000, num_weeks=20, field="Old Field", deadline="2024-10-01",
+        requirements="Test Requirements", responsibilities="Test Responsibilities",
+        company_id=1, region="Global",
+    )
+
+    class WrittenDuringReadCursor:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            pass
+
+        async def execute(self, query, params):
+            # another request updates the offer after this one read the old row
+            controllers.invalidate_offer(offer.id)
+
+        async def fetchone(self):
+            return offer
+
+    class Connection:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            pass
+
+        def cursor(self, row_factory):
+            return WrittenDuringReadCursor()
+
+    class Pool:
+        def connection(self):
+            return Connection()
+
+    monkeypatch.setattr(controllers, "async_pool", lambda: Pool())
+    controllers.offer_cache.clear()
+
+    assert await controllers.offer_get_controller(offer.id) == offer
+    assert controllers.offer_cache.get(offer.id) is None
+
+
 @pytest.mark.asyncio
 async def test_offer_put_incorrect_field(insert_offers: dict):
     company: CompanyTest = insert_offers["company"]
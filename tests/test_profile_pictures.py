@@ -0,0 +1,38 @@
+import pytest
+from fastapi import status
+from httpx import ASGITransport, AsyncClient
+from ..source.main import app
+from ..source.profile_pictures import PROFILE_PICTURE_MAX_BYTES
+
+
+BOUNDARY = "picture-boundary"
+CHUNK_BYTES = 64 * 1024
+
+
+@pytest.mark.asyncio
+async def test_chunked_profile_picture_upload_stops_at_limit():
+    picture = b"0" * (4 * PROFILE_PICTURE_MAX_BYTES)
+    body = (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="picture"; filename="picture.jpg"\r\n'
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + picture + f"\r\n--{BOUNDARY}--\r\n".encode()
+    num_sent_chunks = 0
+
+    async def chunks():
+        # Without a declared length, the body is sent with chunked encoding
+        nonlocal num_sent_chunks
+        for start in range(0, len(body), CHUNK_BYTES):
+            num_sent_chunks += 1
+            yield body[start:start + CHUNK_BYTES]
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post(
+            url="/profile-picture",
+            content=chunks(),
+            headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"},
+        )
+
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    # the upload is aborted once over the limit, not received in full
+    assert num_sent_chunks * CHUNK_BYTES < 2 * PROFILE_PICTURE_MAX_BYTES
@@ -0,0 +1,67 @@
+import pytest
+from datetime import timedelta
+from fastapi import HTTPException, Request, status
+from ..source import security
+from ..source.enums import UserType
+from ..source.schemas import Principal, StudentInDB
+from ..source.security import TokenData, create_token, get_current_principal
+
+
+def self_contained_token(user_id: int = 1, region_id: int = 1) -> str:
+    token_data = TokenData(sub="student@test.com", type=UserType.STUDENT.value, id=user_id, region_id=region_id)
+    return create_token(token_data, timedelta(minutes=5))
+
+
+def request_with_method(method: str) -> Request:
+    return Request({"type": "http", "method": method, "headers": []})
+
+
+@pytest.fixture(scope="function")
+def deleted_user(monkeypatch: pytest.MonkeyPatch) -> list:
+    """ The user no longer exists. Records the lookups. """
+    lookups = []
+
+    async def get_cached_user_by_email(email: str, user_type: UserType):
+        lookups.append((email, user_type))
+        return None
+
+    monkeypatch.setattr(security, "get_cached_user_by_email", get_cached_user_by_email)
+    return lookups
+
+
+@pytest.mark.asyncio
+async def test_self_contained_token_read(deleted_user: list):
+    principal = await get_current_principal(request_with_method("GET"), self_contained_token())
+
+    # reads are authorized from the claims alone
+    assert principal == Principal(id=1, email="student@test.com", type=UserType.STUDENT, region_id=1)
+    assert deleted_user == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("method", ["POST", "PUT", "PATCH", "DELETE"])
+async def test_self_contained_token_write_after_user_deleted(deleted_user: list, method: str):
+    # the token was issued before the user was deleted
+    token = self_contained_token()
+    with pytest.raises(HTTPException) as e:
+        await get_current_principal(request_with_method(method), token)
+
+    assert e.value.status_code == status.HTTP_401_UNAUTHORIZED
+    assert deleted_user == [("student@test.com", UserType.STUDENT)]
+
+
+@pytest.mark.asyncio
+async def test_self_contained_token_write_uses_current_user(monkeypatch: pytest.MonkeyPatch):
+    # the student moved to another region after the token was issued
+    student = StudentInDB(
+        id=1, email="student@test.com", hashed_password="hash", name="Test Name",
+        date_of_birth="2000-01-01", university="Test University", major="Test Major",
+        credits=150, gpa=8.5, region_id=2,
+    )
+
+    async def get_cached_user_by_email(email: str, user_type: UserType):
+        return student
+
+    monkeypatch.setattr(security, "get_cached_user_by_email", get_cached_user_by_email)
+    principal = await get_current_principal(request_with_method("PUT"), self_contained_token(region_id=1))
+    assert principal.region_id == 2
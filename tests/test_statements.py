@@ -0,0 +1,70 @@
+import pytest
+from types import SimpleNamespace
+from psycopg import AsyncCursor
+from ..source import statements
+from ..source.statements import PreparingCursor, StatementRegistry
+
+
+class FakeConnection:
+    """ Prepares every statement once, like psycopg's prepare manager """
+
+    def __init__(self, has_prepare_manager: bool = True) -> None:
+        self.statements: set[str] = set()
+        if has_prepare_manager:
+            self._prepared = SimpleNamespace(_prepared_idx=0)
+
+
+async def fake_execute(cursor: PreparingCursor, query, params=None, *, prepare=None, binary=None):
+    connection = cursor.connection
+    if prepare and query not in connection.statements:
+        connection.statements.add(query)
+        if hasattr(connection, "_prepared"):
+            connection._prepared._prepared_idx += 1
+    return cursor
+
+
+def preparing_cursor(connection: FakeConnection) -> PreparingCursor:
+    cursor = PreparingCursor.__new__(PreparingCursor)
+    cursor._conn = connection
+    return cursor
+
+
+@pytest.fixture(scope="function")
+def registry(monkeypatch: pytest.MonkeyPatch) -> StatementRegistry:
+    registry = StatementRegistry()
+    monkeypatch.setattr(statements, "registry", registry)
+    monkeypatch.setattr(AsyncCursor, "execute", fake_execute)
+    return registry
+
+
+@pytest.mark.asyncio
+async def test_prepares_and_reuses(registry: StatementRegistry):
+    @registry.register
+    def select_offer_query():
+        return "SELECT * FROM offers WHERE id = %s"
+
+    cursor = preparing_cursor(FakeConnection())
+    for _ in range(3):
+        await cursor.execute(select_offer_query(), [1])
+
+    stats = registry.stats()
+    assert stats["executions"] == {"select_offer_query": 3}
+    assert stats["prepares"] == {"select_offer_query": 1}
+    assert stats["reuses"] == {"select_offer_query": 2}
+
+
+@pytest.mark.asyncio
+async def test_without_prepare_manager_counts_executions(registry: StatementRegistry):
+    @registry.register
+    def select_offer_query():
+        return "SELECT * FROM offers WHERE id = %s"
+
+    # the private counter is missing in another psycopg version
+    cursor = preparing_cursor(FakeConnection(has_prepare_manager=False))
+    for _ in range(3):
+        await cursor.execute(select_offer_query(), [1])
+
+    stats = registry.stats()
+    assert stats["executions"] == {"select_offer_query": 3}
+    assert stats["prepares"] == {}
+    assert stats["reuses"] == {}
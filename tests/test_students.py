@@ -1,6 +1,7 @@
 from dataclasses import asdict
 from httpx import AsyncClient
 from fastapi import status
+from ..source.profile_pictures import PROFILE_IMAGES_FOLDER, PROFILE_PICTURE_MAX_BYTES
 from .test_utils import (
     BASE_URL, 
     db_connection,
@@ -12,6 +13,8 @@ from .test_utils import (
     StudentTest
 )
 import pytest
+import psycopg as pg
+import os
 
 
 @pytest.mark.asyncio
@@ -179,3 +182,113 @@ async def test_student_delete(insert_student: StudentTest):
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
         assert response.json() == {"detail": "Could not validate credentials"}
 
+
+
+@pytest.mark.asyncio
+async def test_student_update_email_invalidates_token(insert_student: StudentTest):
+    student = insert_student
+    async with AsyncClient(base_url=BASE_URL) as client:
+        token = await student_token(client, student)
+
+        # warm up the authenticated-user cache
+        response = await client.get(
+            url=f"/students/profile/{student.id}",
+            headers=create_token_header(token),
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+        # change the email of the student
+        student.email = "updated.student@test.com"
+        response = await client.put(
+            url=f"/students/{student.id}",
+            headers=create_token_header(token),
+            json=asdict(student)
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+        # the old token must not be served from the cache
+        response = await client.get(
+            url=f"/students/profile/{student.id}",
+            headers=create_token_header(token),
+        )
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_caches_metrics(insert_student: StudentTest):
+    student = insert_student
+    async with AsyncClient(base_url=BASE_URL) as client:
+        token = await student_token(client, student)
+        response = await client.get("/metrics/caches", headers=create_token_header(token))
+        assert response.status_code == status.HTTP_200_OK
+        metrics = response.json()
+        assert "principals" in metrics
+        assert "hits" in metrics["principals"]
+        assert "misses" in metrics["principals"]
+
+
+@pytest.mark.asyncio
+async def test_statements_metrics(insert_student: StudentTest):
+    student = insert_student
+    async with AsyncClient(base_url=BASE_URL) as client:
+        token = await student_token(client, student)
+        response = await client.get("/metrics/statements", headers=create_token_header(token))
+        assert response.status_code == status.HTTP_200_OK
+        metrics = response.json()
+        assert metrics["registered"] > 0
+        executions = metrics["executions"]["select_user_by_email_query"]
+        assert executions > 0
+        # Every execution either prepared the statement or reused it
+        prepares = metrics["prepares"].get("select_user_by_email_query", 0)
+        reuses = metrics["reuses"].get("select_user_by_email_query", 0)
+        assert prepares > 0
+        assert prepares + reuses == executions
+        assert 0 <= metrics["reuse_ratio"] <= 1
+
+
+@pytest.mark.asyncio
+async def test_metrics_unauthorized():
+    async with AsyncClient(base_url=BASE_URL) as client:
+        for url in ("/metrics/caches", "/metrics/statements"):
+            response = await client.get(url)
+            assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_profile_picture_post(db_connection: pg.Connection, insert_student: StudentTest):
+    student = insert_student
+    async with AsyncClient(base_url=BASE_URL) as client:
+        token = await student_token(client, student)
+        response = await client.post(
+            url="/profile-picture",
+            headers=create_token_header(token),
+            files={"picture": ("picture.jpg", b"\xff\xd8\xff\xe0" + b"0" * 1024)},
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+
+        # the variants are generated in the background
+        picture_path, = db_connection.execute(
+            "SELECT profile_picture_path FROM students WHERE id = %s", [student.id]
+        ).fetchone()
+        jobs = db_connection.execute("SELECT name, args FROM jobs").fetchall()
+        db_connection.commit()
+        assert jobs == [("generate_profile_picture_variants", ["student", student.id, picture_path])]
+
+        response = await client.delete(url="/profile-picture", headers=create_token_header(token))
+        assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.asyncio
+async def test_profile_picture_post_too_large(insert_student: StudentTest):
+    student = insert_student
+    async with AsyncClient(base_url=BASE_URL) as client:
+        token = await student_token(client, student)
+        response = await client.post(
+            url="/profile-picture",
+            headers=create_token_header(token),
+            files={"picture": ("picture.jpg", b"0" * (PROFILE_PICTURE_MAX_BYTES + 1))},
+        )
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+    # nothing is left behind in the images folder
+    assert not any(name.endswith(".tmp") for name in os.listdir(PROFILE_IMAGES_FOLDER))
@@ -0,0 +1,40 @@
+import os
+from PIL import Image
+from ..source.thumbnails import (
+    PICTURE_VARIANTS,
+    create_picture_variants,
+    delete_picture_variants,
+    picture_variant_path,
+)
+
+
+def test_picture_variant_path():
+    assert picture_variant_path("static/img/student_1_123.jpg", "thumbnail") == "static/img/student_1_123_thumbnail.webp"
+
+
+def test_create_picture_variants(tmp_path):
+    picture_path = str(tmp_path / "student_1_123.jpg")
+    Image.new("RGB", (1200, 800), "red").save(picture_path, "JPEG")
+
+    variant_paths = create_picture_variants(picture_path)
+
+    assert set(variant_paths) == set(PICTURE_VARIANTS)
+    for variant, size in PICTURE_VARIANTS.items():
+        with Image.open(variant_paths[variant]) as variant_picture:
+            assert variant_picture.format == "WEBP"
+            assert variant_picture.size == (size, size)
+        assert os.path.getsize(variant_paths[variant]) < os.path.getsize(picture_path)
+
+    delete_picture_variants(picture_path)
+    assert not any(os.path.exists(path) for path in variant_paths.values())
+    assert os.path.exists(picture_path)
+
+
+def test_create_picture_variants_transparent(tmp_path):
+    picture_path = str(tmp_path / "company_1_123.png")
+    Image.new("RGBA", (400, 400), (0, 0, 255, 0)).save(picture_path, "PNG")
+
+    variant_paths = create_picture_variants(picture_path)
+
+    with Image.open(variant_paths["thumbnail"]) as thumbnail:
+        assert thumbnail.mode == "RGBA"
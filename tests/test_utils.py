@@ -3,7 +3,7 @@ import psycopg as pg
 from psycopg.rows import class_row
 from ..source.database import get_connection_string
 from ..source.enums import Region, Status
-from ..source.security import pwd_context
+from ..source.utils import pwd_context
 from .classes import (
     CompanyTest,
     OfferTest,
@@ -17,6 +17,7 @@ from .classes import (
     RegionTest,
 )
 from httpx import AsyncClient
+import httpx
 
 
 BASE_URL = "http://127.0.0.1:8000"
@@ -134,6 +135,8 @@ def create_token_header(token: dict) -> dict:
 
 
 def delete_db_data(db_connection: pg.Connection):
+    db_connection.execute("DELETE FROM jobs;")
+    db_connection.execute("DELETE FROM applicant_events;")
     db_connection.execute("DELETE FROM applications;")
     db_connection.execute("DELETE FROM experiences;")
     db_connection.execute("DELETE FROM motivational_letters;")
@@ -161,6 +164,35 @@ def applications_from_db(offer_id: int) -> list[ApplicationTest]:
         return applications
 
 
+def apply_sql_file(path: str, split_statements: bool = False) -> None:
+    """
+    Runs a file from SQL/ in the testing database, with autocommit.
+    CREATE INDEX CONCURRENTLY cannot run in a multi-statement query,
+    so such files are split into statements on ';'.
+    """
+    with open(path, "r", encoding="utf-8") as reader:
+        sql = reader.read()
+
+    if split_statements:
+        statements = [statement for statement in sql.split(";") if statement.strip()]
+    else:
+        statements = [sql]
+
+    with pg.connect(get_connection_string(), autocommit=True) as db_connection:
+        for statement in statements:
+            db_connection.execute(statement)
+
+
+@pytest.fixture(scope="module")
+def create_indexes():
+    apply_sql_file("SQL/indexes.sql", split_statements=True)
+
+
+@pytest.fixture(scope="module")
+def create_triggers():
+    apply_sql_file("SQL/triggers.sql")
+
+
 @pytest.fixture(scope="module")
 def db_connection():
     db_string = get_connection_string()
@@ -172,6 +204,16 @@ def db_connection():
 @pytest.fixture(scope="function", autouse=True)
 def reset_database(db_connection: pg.Connection):
     delete_db_data(db_connection)
+    clear_server_caches()
+
+
+def clear_server_caches():
+    """ The server caches are not invalidated by the direct DB resets """
+    try:
+        httpx.delete(f"{BASE_URL}/caches")
+    except httpx.ConnectError:
+        # Tests that only use the DB can run without a server
+        pass
 
 
 @pytest.fixture(scope="function")